@@ -1,15 +1,101 @@
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+FIELDS = {
+    "best sbs code": 0,
+    "best sbs description": 1,
+    "explanation": 2,
+}
+# Tolerates leading whitespace, list markers and markdown bold, e.g. "**Best SBS Code:** 12-34"
+FIELD_PATTERN = re.compile(
+    r"^[\s*#>\-]*(best sbs code|best sbs description|explanation)\s*\**\s*:\s*\**\s*(.*)$",
+    re.IGNORECASE
+)
+ITEM_PATTERN = re.compile(
+    r"^[\s*#>\-]*item(?:\s+id)?\s*\**\s*[:#]?\s*\**\s*([A-Za-z0-9_-]+)[\s*:]*$",
+    re.IGNORECASE
+)
+
+
 class AnswerParser:
+    def _parse_field(self, line: str):
+        """Return (field index, value) for an answer line, or None."""
+        match = FIELD_PATTERN.match(line)
+        if not match:
+            return None
+        return FIELDS[match.group(1).lower()], match.group(2).strip().strip("*").strip()
+
     def parse_llm_answer(self, answer: str):
-        best_code = ""
-        best_desc = ""
-        explanation = ""
+        fields = ["", "", ""]
+
+        for line in answer.split('\n'):
+            parsed = self._parse_field(line)
+            if parsed:
+                fields[parsed[0]] = parsed[1]
+
+        best_code, best_desc, explanation = fields
+        return best_code, best_desc, explanation
+
+    def parse_batch_answer(self, answer: str, item_ids: Iterable[str]) -> Dict[str, Tuple[str, str, str]]:
+        """Split a multi-item answer into {item_id: (code, description, explanation)}.
+
+        Items that are missing, unknown or lack any of the three fields are left out so
+        the caller can retry them on their own.
+        """
+        expected = {str(item_id) for item_id in item_ids}
+        records: Dict[str, list] = {}
+        current = None
 
         for line in answer.split('\n'):
-            if line.startswith("Best SBS Code:"):
-                best_code = line.replace("Best SBS Code:", "").strip()
-            elif line.startswith("Best SBS Description:"):
-                best_desc = line.replace("Best SBS Description:", "").strip()
-            elif line.startswith("Explanation:"):
-                explanation = line.replace("Explanation:", "").strip()
-
-        return best_code, best_desc, explanation
\ No newline at end of file
+            item = ITEM_PATTERN.match(line)
+            if item:
+                current = item.group(1) if item.group(1) in expected else None
+                if current is not None:
+                    records.setdefault(current, ["", "", ""])
+                continue
+            parsed = self._parse_field(line)
+            if parsed and current is not None:
+                records[current][parsed[0]] = parsed[1]
+
+        return {item_id: tuple(fields) for item_id, fields in records.items() if all(fields)}
+
+
+class StreamingAnswerParser:
+    """Reads an answer while it streams in and tells when every expected field has arrived.
+
+    A field counts once its line has ended, so a value is never cut mid-line. Without item_ids
+    the answer is complete after Best SBS Code, Best SBS Description and Explanation; with
+    them, once every listed item has all three.
+    """
+
+    def __init__(self, item_ids: Optional[Iterable[str]] = None):
+        self.item_ids = {str(item_id) for item_id in item_ids} if item_ids is not None else None
+        self.text = ""
+        self.complete = False
+        self._line_start = 0
+        self._current = None
+        self._seen: Dict[Optional[str], set] = {}
+
+    def feed(self, chunk: str) -> bool:
+        """Add streamed text; returns whether the answer is complete."""
+        self.text += chunk
+        newline = self.text.find("\n", self._line_start)
+        while newline != -1 and not self.complete:
+            self._consume(self.text[self._line_start:newline])
+            self._line_start = newline + 1
+            newline = self.text.find("\n", self._line_start)
+        return self.complete
+
+    def _consume(self, line: str) -> None:
+        if self.item_ids is not None:
+            item = ITEM_PATTERN.match(line)
+            if item:
+                self._current = item.group(1) if item.group(1) in self.item_ids else None
+                return
+            if self._current is None:
+                return
+        match = FIELD_PATTERN.match(line)
+        if match and match.group(2).strip().strip("*").strip():
+            self._seen.setdefault(self._current, set()).add(FIELDS[match.group(1).lower()])
+            expected = self.item_ids if self.item_ids is not None else [None]
+            self.complete = all(len(self._seen.get(key, ())) == len(FIELDS) for key in expected)
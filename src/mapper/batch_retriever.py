@@ -0,0 +1,103 @@
+from typing import List, Optional, Tuple
+import faiss
+import numpy as np
+import pandas as pd
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
+from bm25_index import BM25Index
+
+
+class BatchRetriever:
+    """Top-k SBS candidates for many queries at once: batched embedding, one FAISS matrix search.
+
+    Scores are similarities where higher is better. For the default Euclidean index they are
+    1 - squared_L2 / 2, which equals the cosine similarity for unit-normalized embeddings
+    such as bge's.
+
+    With a bm25_index, the top candidate_pool hits of the dense and BM25 rankings are fused
+    by reciprocal rank fusion, and scores are the fused sum of 1 / (rrf_k + rank).
+    """
+
+    def __init__(
+        self,
+        vectorstore,
+        k: int = 3,
+        embed_batch_size: int = 256,
+        bm25_index: Optional[BM25Index] = None,
+        candidate_pool: int = 20,
+        rrf_k: int = 60
+    ):
+        self.vectorstore = vectorstore
+        self.k = k
+        self.embed_batch_size = embed_batch_size
+        self.bm25_index = bm25_index
+        self.candidate_pool = max(candidate_pool, k)
+        self.rrf_k = rrf_k
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        embedding = self.vectorstore.embedding_function
+        vectors = []
+        for start in range(0, len(queries), self.embed_batch_size):
+            chunk = queries[start:start + self.embed_batch_size]
+            if isinstance(embedding, Embeddings):
+                vectors.extend(embedding.embed_documents(chunk))
+            else:
+                vectors.extend(embedding(text) for text in chunk)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(queries), -1)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _to_similarity(self, distances: np.ndarray) -> np.ndarray:
+        if self.vectorstore.distance_strategy == DistanceStrategy.EUCLIDEAN_DISTANCE:
+            return 1.0 - distances / 2.0
+        return distances
+
+    def _dense_search(self, queries: List[str], k: int) -> List[List[Tuple[str, float]]]:
+        """Return [(docstore id, similarity), ...] best first, for every query."""
+        distances, indices = self.vectorstore.index.search(self.embed_queries(queries), k)
+        scores = self._to_similarity(distances)
+        return [
+            [
+                (self.vectorstore.index_to_docstore_id[int(i)], float(score))
+                for i, score in zip(row_indices, row_scores) if i != -1
+            ]
+            for row_indices, row_scores in zip(indices, scores)
+        ]
+
+    def _fuse(self, *rankings: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        fused = {}
+        for ranking in rankings:
+            for rank, (doc_id, _) in enumerate(ranking, start=1):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank)
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:self.k]
+
+    def search(self, queries: List[str]) -> List[List[Tuple[Document, float]]]:
+        """Return [(document, score), ...] best first, for every query."""
+        if not queries:
+            return []
+        if self.bm25_index is None:
+            ranked = self._dense_search(queries, self.k)
+        else:
+            dense = self._dense_search(queries, self.candidate_pool)
+            lexical = self.bm25_index.search(queries, self.candidate_pool)
+            ranked = [self._fuse(d, l) for d, l in zip(dense, lexical)]
+
+        docstore = self.vectorstore.docstore
+        return [[(docstore.search(doc_id), score) for doc_id, score in hits] for hits in ranked]
+
+    @staticmethod
+    def to_frame(queries: List[str], results: List[List[Tuple[Document, float]]]) -> pd.DataFrame:
+        """One row per (query, rank) for inspecting what retrieval returned."""
+        return pd.DataFrame([
+            {
+                "Query": query,
+                "Rank": rank,
+                "SBS_Code": doc.metadata.get("Service Code"),
+                "SBS_Short_Description": doc.metadata.get("Short Description"),
+                "Score": score
+            }
+            for query, candidates in zip(queries, results)
+            for rank, (doc, score) in enumerate(candidates, start=1)
+        ], columns=["Query", "Rank", "SBS_Code", "SBS_Short_Description", "Score"])
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import chain
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from data_preprocessing import ServiceMatcher
+from document_convertor import DocumentConverter
+from vector_store import VectorstoreBuilder
+from batch_retriever import BatchRetriever
+from service_mapper import ServiceMapper
+from prompt import prompt_template
+from answer_parser import AnswerParser
+from result_store import CsvResultSink
+from stub_llm_server import StubLLMServer
+from synthetic_data import write_synthetic_workbooks
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of latencies in seconds, reported in milliseconds."""
+    if not latencies:
+        return {}
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def _peak_rss_mb():
+    """Process peak resident set size so far, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+class StageRecorder:
+    """Wall time, throughput, latency percentiles and peak memory per pipeline stage.
+
+    Peak Python allocations come from tracemalloc (which slows Python-heavy stages);
+    memory held by native libraries such as FAISS only shows in the process peak RSS.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the block; set record["items"] and append to record["latencies"] inside it."""
+        record = {"items": 0, "latencies": []}
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            peak_traced = None
+            if self.trace_memory:
+                peak_traced = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+            self.stages[name] = {
+                "seconds": seconds,
+                "items": record["items"],
+                "items_per_second": record["items"] / seconds if seconds else None,
+                "latency": _percentiles(record["latencies"]),
+                "peak_traced_mb": peak_traced,
+                "peak_rss_mb": _peak_rss_mb(),
+            }
+            print(f"⏱️ {name}: {record['items']} items in {seconds:.2f}s")
+
+
+class TimedServiceMapper(ServiceMapper):
+    """ServiceMapper recording the wall time of every LLM unit submitted to its workers."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unit_latencies: List[float] = []
+        self._depth = threading.local()
+
+    def _map_unit(self, llm, unit):
+        # Batch fallbacks re-enter _map_unit; only the outermost call is one submitted unit
+        depth = getattr(self._depth, "value", 0)
+        self._depth.value = depth + 1
+        start = time.perf_counter()
+        try:
+            return super()._map_unit(llm, unit)
+        finally:
+            self._depth.value = depth
+            if depth == 0:
+                self.unit_latencies.append(time.perf_counter() - start)
+
+
+def run_benchmark(args) -> dict:
+    if os.path.exists(args.work_dir):
+        shutil.rmtree(args.work_dir)
+    recorder = StageRecorder(trace_memory=not args.no_trace_memory)
+
+    with recorder.stage("synthetic_data") as record:
+        ahj_path, sbs_path = write_synthetic_workbooks(args.work_dir, args.n_sbs, args.n_ahj, seed=args.seed)
+        record["items"] = args.n_sbs + args.n_ahj
+
+    with recorder.stage("service_matcher") as record:
+        matcher = ServiceMatcher(ahj_path=ahj_path, sbs_path=sbs_path)
+        _, sbs_df = matcher.load_data()
+        matcher.preprocess_ahj()
+        exact_matches = matcher.match_services()
+        lexical_matches = matcher.match_services_lexical(exact_matches, threshold=args.lexical_threshold)
+        unique_services = matcher.find_unique_ahj_services(pd.concat([exact_matches, lexical_matches]))
+        record["items"] = len(matcher.ahj)
+
+    with recorder.stage("document_converter") as record:
+        documents = list(chain.from_iterable(DocumentConverter().iter_sbs_docs(sbs_df)))
+        record["items"] = len(documents)
+
+    with recorder.stage("vectorstore_builder") as record:
+        embeddings = None
+        if args.embeddings_model is None:
+            embeddings = DeterministicFakeEmbedding(size=args.embedding_dim)
+        builder = VectorstoreBuilder(
+            args.embeddings_model or f"fake-{args.embedding_dim}",
+            embed_batch_size=args.embed_batch_size,
+            embeddings=embeddings,
+            index_type=args.index_type
+        )
+        vectorstore = builder.create_faiss_index(documents)
+        record["items"] = len(documents)
+
+    os.environ.setdefault("FIREWORKS_NEW_API_KEY", "stub")
+    stub = StubLLMServer(latency=args.latency, latency_jitter=args.latency_jitter,
+                         error_rate=args.error_rate, seed=args.seed, token_latency=args.token_latency,
+                         tail_tokens=args.tail_tokens).start()
+    results_file = os.path.join(args.work_dir, "mapping_results.csv")
+    mapper = TimedServiceMapper(
+        vectorstore=vectorstore,
+        prompt_template=prompt_template,
+        answer_parser=AnswerParser(),
+        results_file=results_file,
+        failures_file=os.path.join(args.work_dir, "mapping_failures.csv"),
+        max_workers=args.max_workers,
+        max_retries=args.max_retries,
+        llm_base_url=stub.base_url,
+        llm_max_tokens=args.llm_max_tokens,
+        llm_stream=args.llm_stream,
+        batch_size=args.batch_size,
+        retrieval_k=args.retrieval_k
+    )
+
+    with recorder.stage("retrieval") as record:
+        queries = [query for query, _ in mapper._plan_queries(unique_services)]
+        retriever = BatchRetriever(vectorstore, k=args.retrieval_k)
+        for start in range(0, len(queries), args.retrieval_batch_size):
+            batch_start = time.perf_counter()
+            retriever.search(queries[start:start + args.retrieval_batch_size])
+            record["latencies"].append(time.perf_counter() - batch_start)
+        record["items"] = len(queries)
+
+    try:
+        # Includes ServiceMapper's own retrieval pre-pass; latencies are per LLM request
+        with recorder.stage("llm_mapping") as record:
+            mapper.map_service_codes(unique_services)
+            record["items"] = len(unique_services)
+            record["latencies"] = mapper.unit_latencies
+    finally:
+        stub.stop()
+
+    mapped = pd.read_csv(results_file)
+    with recorder.stage("result_writing") as record:
+        sink = CsvResultSink(os.path.join(args.work_dir, "result_writing.csv"),
+                             os.path.join(args.work_dir, "result_writing_failures.csv"))
+        sink.open(mapped.columns.tolist(), ["Error"])
+        for row in mapped.to_dict("records"):
+            sink.add_result(row)
+        sink.close()
+        record["items"] = len(mapped)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stub_llm": {"requests": stub.requests, "injected_errors": stub.errors,
+                     "output_tokens": stub.output_tokens, "streams_cancelled": stub.streams_cancelled},
+        "stages": recorder.stages,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the mapping pipeline offline on synthetic data.")
+    parser.add_argument("--n-sbs", type=int, default=2_000, help="Synthetic SBS catalog size.")
+    parser.add_argument("--n-ahj", type=int, default=5_000, help="Synthetic AHJ price list rows.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default="benchmark_run",
+                        help="Scratch folder for the synthetic workbooks and outputs (emptied first).")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM seconds per request.")
+    parser.add_argument("--latency-jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub requests failing with 429/500.")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Stub LLM seconds per output token.")
+    parser.add_argument("--tail-tokens", type=int, default=0,
+                        help="Reasoning tokens the stub appends after each answer.")
+    parser.add_argument("--llm-max-tokens", type=int, default=None)
+    parser.add_argument("--llm-stream", action="store_true")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--retrieval-k", type=int, default=3)
+    parser.add_argument("--retrieval-batch-size", type=int, default=1024)
+    parser.add_argument("--lexical-threshold", type=float, default=0.9)
+    parser.add_argument("--embeddings-model", default=None,
+                        help="HuggingFace model to embed with. Deterministic fake embeddings if omitted.")
+    parser.add_argument("--embedding-dim", type=int, default=384, help="Size of the fake embeddings.")
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--index-type", default="flat", help="FAISS index type (see vector_store.INDEX_TYPES).")
+    parser.add_argument("--no-trace-memory", action="store_true",
+                        help="Skip tracemalloc (faster, but no per-stage Python memory peaks).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run_benchmark(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📊 Benchmark results saved to {args.output}")
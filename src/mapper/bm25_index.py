@@ -0,0 +1,95 @@
+import re
+from typing import List, Tuple
+import numpy as np
+from scipy import sparse
+from io_utils import atomic_path
+from lexical_matcher import ABBREVIATIONS
+
+BM25_FILE = "bm25.npz"
+
+
+def tokenize(text: str) -> List[str]:
+    """Upper-cased alphanumeric tokens with common price-list abbreviations expanded."""
+    return [
+        token
+        for word in re.findall(r"[A-Z0-9]+", text.upper())
+        for token in ABBREVIATIONS.get(word, word).split()
+    ]
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over the SBS documents of a FAISS store.
+
+    Per-term document weights are precomputed into a term x document CSR matrix, so scoring
+    a batch of queries is one sparse product. Documents are identified by their docstore id.
+    """
+
+    def __init__(self, terms: np.ndarray, weights: sparse.csr_matrix, doc_ids: np.ndarray):
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.terms = terms
+        self.weights = weights
+        self.doc_ids = doc_ids
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        doc_ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+        texts = [vectorstore.docstore.search(doc_id).page_content for doc_id in doc_ids]
+
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        vectorizer = CountVectorizer(tokenizer=tokenize, lowercase=False, token_pattern=None)
+        tf = vectorizer.fit_transform(texts).tocsr().astype(np.float32)
+
+        n_docs = tf.shape[0]
+        doc_freq = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        norm = k1 * (1 - b + b * doc_len / doc_len.mean())
+
+        # tf * (k1 + 1) / (tf + k1 * (1 - b + b * |d| / avgdl)) * idf, on the nonzeros only
+        row_norm = np.repeat(norm, np.diff(tf.indptr))
+        tf.data = tf.data * (k1 + 1) / (tf.data + row_norm) * idf[tf.indices]
+
+        return cls(vectorizer.get_feature_names_out(), tf.T.tocsr(), np.asarray(doc_ids))
+
+    def save(self, path: str) -> None:
+        # np.savez appends .npz to names without it
+        with atomic_path(path, suffix=".npz") as tmp_path:
+            np.savez(
+                tmp_path,
+                terms=self.terms.astype(str),
+                doc_ids=self.doc_ids.astype(str),
+                data=self.weights.data,
+                indices=self.weights.indices,
+                indptr=self.weights.indptr,
+                shape=np.asarray(self.weights.shape)
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as saved:
+            weights = sparse.csr_matrix(
+                (saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"])
+            )
+            return cls(saved["terms"], weights, saved["doc_ids"])
+
+    def _query_matrix(self, queries: List[str]) -> sparse.csr_matrix:
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+            rows.extend([row] * len(term_ids))
+            cols.extend(term_ids)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(queries), len(self.terms))
+        )
+
+    def search(self, queries: List[str], k: int) -> List[List[Tuple[str, float]]]:
+        """Return [(docstore id, BM25 score), ...] best first, for every query."""
+        scores = (self._query_matrix(queries) @ self.weights).tocsr()
+        results = []
+        for row in range(len(queries)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            docs, row_scores = scores.indices[start:end], scores.data[start:end]
+            top = np.argsort(-row_scores, kind="stable")[:k]
+            results.append([(str(self.doc_ids[docs[i]]), float(row_scores[i])) for i in top])
+        return results
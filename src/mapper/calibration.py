@@ -0,0 +1,111 @@
+import argparse
+from typing import List
+import numpy as np
+import pandas as pd
+from excel_cache import read_excel_cached
+
+FEEDBACK_LABEL_COLUMNS = ['SERVICE_CODE', 'SBS Code (Hyphenated)', 'Comment']
+SCORE_COLUMNS = ['Retrieval_Score', 'Retrieval_Margin']
+
+
+def load_feedback_labels(feedback_paths: List[str]) -> pd.DataFrame:
+    """Reviewed SBS codes per service from the feedback workbooks; later workbooks win.
+
+    Verdict is True when the reviewed code was marked 'Correct' and False otherwise.
+    """
+    frames = [read_excel_cached(path, columns=FEEDBACK_LABEL_COLUMNS) for path in feedback_paths]
+    feedback = pd.concat(frames, ignore_index=True).dropna(subset=['SERVICE_CODE', 'SBS Code (Hyphenated)'])
+    return pd.DataFrame({
+        'SERVICE_CODE': feedback['SERVICE_CODE'].astype(str).str.strip(),
+        'Reviewed_Code': feedback['SBS Code (Hyphenated)'].astype(str).str.strip(),
+        'Verdict': feedback['Comment'].astype(str).str.strip().eq('Correct')
+    }).drop_duplicates('SERVICE_CODE', keep='last')
+
+
+def label_results(results: pd.DataFrame, labels: pd.DataFrame) -> pd.DataFrame:
+    """Attach whether each result's top retrieval candidate is right, where feedback tells.
+
+    A candidate equal to a code marked 'Correct' is right; one equal to a code marked
+    anything else is wrong. Other candidates cannot be judged and are left out.
+    """
+    results = results.dropna(subset=['Retrieval_Score']).assign(
+        SERVICE_CODE=results['Internal_Service_Code'].astype(str).str.strip(),
+        Top_Code=results['Retrieval_Top_Code'].astype(str).str.strip()
+    )
+    merged = results.merge(labels, on='SERVICE_CODE', how='inner')
+    merged['Same_Code'] = merged['Top_Code'] == merged['Reviewed_Code']
+    merged = merged[merged['Same_Code'] | merged['Verdict']]
+    return merged.assign(Top_Is_Correct=merged['Same_Code'] & merged['Verdict'])
+
+
+def read_results(path: str) -> pd.DataFrame:
+    """Mapping results with every column but the scores kept as written, e.g. code '01' stays '01'."""
+    results = pd.read_csv(path, dtype=str, keep_default_na=False, na_values={col: [""] for col in SCORE_COLUMNS})
+    return results.astype({col: float for col in SCORE_COLUMNS})
+
+
+def calibration_report(results: pd.DataFrame, labeled: pd.DataFrame, steps: int = 10) -> pd.DataFrame:
+    """Precision and coverage of the cascade over a grid of score and margin thresholds.
+
+    Thresholds are quantiles of the labeled scores and margins. Coverage is the share of
+    all scored results that would skip the LLM; precision is measured on the labeled ones.
+    """
+    def signals(frame):
+        return (frame['Retrieval_Score'].to_numpy(dtype=float),
+                frame['Retrieval_Margin'].fillna(0).to_numpy(dtype=float))
+
+    scores, margins = signals(labeled)
+    all_scores, all_margins = signals(results.dropna(subset=['Retrieval_Score']))
+    correct = labeled['Top_Is_Correct'].to_numpy(dtype=bool)
+    quantiles = np.linspace(0, 1, steps + 1)
+
+    rows = []
+    for min_score in np.unique(np.quantile(scores, quantiles)):
+        for min_margin in np.unique(np.concatenate([[0.0], np.quantile(margins, quantiles)])):
+            selected = (scores >= min_score) & (margins >= min_margin)
+            n_selected = int(selected.sum())
+            rows.append({
+                "Min_Score": float(min_score),
+                "Min_Margin": float(min_margin),
+                "Labeled_Assigned": n_selected,
+                "Precision": correct[selected].mean() if n_selected else np.nan,
+                "Coverage": ((all_scores >= min_score) & (all_margins >= min_margin)).mean()
+            })
+    return pd.DataFrame(rows).sort_values(["Precision", "Coverage"], ascending=False)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Calibrate cascade thresholds against reviewer feedback.")
+    parser.add_argument("--results-file", default="mapping_results.csv")
+    parser.add_argument("--feedback", nargs="+",
+                        default=[r"D:\CodingSystem\assets\feedback\AI-Revision (TCS-ART-MEDVISA-PUPA).xlsx"],
+                        help="Feedback workbooks with SERVICE_CODE, SBS Code (Hyphenated) and Comment.")
+    parser.add_argument("--output", default="cascade_calibration.csv")
+    parser.add_argument("--target-precision", type=float, default=0.98)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = read_results(args.results_file)
+    labeled = label_results(results, load_feedback_labels(args.feedback))
+    if labeled.empty:
+        print("⚠️ No results with retrieval scores overlap the feedback; nothing to calibrate.")
+        return
+
+    report = calibration_report(results, labeled)
+    report.to_csv(args.output, index=False)
+    print(f"📊 {len(labeled)} labeled results; top-candidate precision overall: "
+          f"{labeled['Top_Is_Correct'].mean():.3f}. Report saved to {args.output}")
+
+    meeting = report[report["Precision"] >= args.target_precision]
+    if meeting.empty:
+        print(f"⚠️ No thresholds reach precision {args.target_precision}.")
+    else:
+        best = meeting.sort_values("Coverage", ascending=False).iloc[0]
+        print(f"✅ --cascade-min-score {best['Min_Score']:.4f} --cascade-min-margin {best['Min_Margin']:.4f} "
+              f"(precision {best['Precision']:.3f}, skips the LLM for {best['Coverage']:.1%} of results)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,45 @@
 import pandas as pd
+from excel_cache import read_excel_cached
+from lexical_matcher import LexicalMatcher
+
+def normalize_text(series: pd.Series) -> pd.Series:
+    """Uppercase, trim and collapse whitespace so cosmetic differences compare equal."""
+    return (
+        series.fillna("").astype(str)
+        .str.upper()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+# Columns the mapping pipeline reads from each workbook
+AHJ_COLUMNS = [
+    'INSURANCE_COMPANY', 'SERVICE_CODE', 'SERVICE_DESCRIPTION', 'PRICE', 'SERVICE_KEY',
+    'SERVICE_CLASSIFICATION', 'SERVICE_CATEGORY'
+]
+SBS_COLUMNS = [
+    'SBS Code', 'SBS Code (Hyphenated)', 'Short Description', 'Long Description',
+    'Definition', 'Chapter Name', 'Block Name'
+]
 
 class ServiceMatcher:
-    def __init__(self, ahj_path, sbs_path):
+    def __init__(self, ahj_path, sbs_path, ahj_columns=AHJ_COLUMNS, sbs_columns=SBS_COLUMNS):
         self.ahj_path = ahj_path
         self.sbs_path = sbs_path
+        self.ahj_columns = ahj_columns
+        self.sbs_columns = sbs_columns
         self.ahj = None
         self.sbs = None
 
     def load_data(self):
-        """Load Excel files and apply basic cleaning."""
-        self.ahj = pd.read_excel(self.ahj_path)
+        """Load Excel files (through their Parquet cache) and apply basic cleaning.
+
+        Pass ahj_columns/sbs_columns=None to the constructor to load every column.
+        """
+        self.ahj = read_excel_cached(self.ahj_path, columns=self.ahj_columns)
         self.ahj = self.ahj[~self.ahj['INSURANCE_COMPANY']
                             .isin([0, 'Cash', 'Item Cash', 'OUTSIDE DOCTOR (CASH)'])]
 
-        self.sbs = pd.read_excel(self.sbs_path)
+        self.sbs = read_excel_cached(self.sbs_path, columns=self.sbs_columns)
         self.sbs['Short Description'] = self.sbs['Short Description'].str.strip().str.upper()
         self.sbs['Long Description'] = self.sbs['Long Description'].str.strip().str.upper()
 
@@ -58,6 +84,38 @@ class ServiceMatcher:
 
         return exact_services
 
+    def match_services_lexical(self, exact_services, threshold: float = 0.9):
+        """Auto-match near-exact AHJ/SBS description pairs left over after exact matching.
+
+        Descriptions are normalized (case, punctuation, spacing, abbreviations, word order)
+        and compared by character n-gram cosine similarity; pairs scoring at least the
+        threshold are returned with the same columns as exact matches plus LEXICAL_SCORE,
+        LEXICAL_THRESHOLD and MATCH_SOURCE.
+        """
+        if self.ahj is None or self.sbs is None:
+            raise ValueError("Load data first using load_data().")
+        if 'NEW_SERVICE_DESCRIPTION' not in self.ahj.columns:
+            raise ValueError("Preprocess AHJ data first using preprocess_ahj().")
+
+        remaining = self.ahj[
+            ~self.ahj['SERVICE_DESCRIPTION']
+            .isin(exact_services['SERVICE_DESCRIPTION'].unique())
+        ]
+        descriptions = pd.Series(remaining['NEW_SERVICE_DESCRIPTION'].dropna().unique())
+
+        matcher = LexicalMatcher(threshold=threshold).fit(self.sbs)
+        scores = matcher.best_matches(descriptions)
+        scores['NEW_SERVICE_DESCRIPTION'] = descriptions
+        scores = scores[scores['LEXICAL_SCORE'] >= threshold]
+
+        lexical_services = remaining.merge(scores, on='NEW_SERVICE_DESCRIPTION').merge(
+            self.sbs, left_on='sbs_row', right_index=True
+        ).drop(columns='sbs_row')
+        lexical_services['LEXICAL_THRESHOLD'] = threshold
+        lexical_services['MATCH_SOURCE'] = 'lexical'
+
+        return lexical_services
+
     def find_unique_ahj_services(self, exact_services):
         """Find AHJ services not matched in SBS."""
         if self.ahj is None:
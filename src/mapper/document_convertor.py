@@ -1,25 +1,51 @@
+from typing import Iterator, List
 from langchain.schema import Document
 import pandas as pd
+from instrumentation import METRICS
+
+# (label, SBS column) pairs making up each document, in page order
+DOCUMENT_FIELDS = [
+    ("**Service Short Description:**", "Short Description"),
+    ("Service Long Description:", "Long Description"),
+    ("Definition:", "Definition"),
+    ("Service Category:", "Block Name"),
+    ("Service Classification:", "Chapter Name"),
+    ("Service Code:", "SBS Code (Hyphenated)"),
+]
 
 class DocumentConverter:
-    def convert_sbs_to_docs(self, sbs_df: pd.DataFrame):
-        docs = []
-        for _, row in sbs_df.iterrows():
-            service_text = (
-                f"**Service Short Description:** {row.get('Short Description', 'Not Mentioned')}\n"
-                f"Service Long Description: {row.get('Long Description', 'Not Mentioned')}\n"
-                f"Definition: {row.get('Definition', 'Not Mentioned')}\n"
-                f"Service Category: {row.get('Block Name', 'Not Mentioned')}\n"
-                f"Service Classification: {row.get('Chapter Name', 'Not Mentioned')}\n"
-                f"Service Code: {row.get('SBS Code (Hyphenated)', 'Not Mentioned')}"
-            )
-            docs.append(Document(
-                page_content=service_text.strip(),
-                metadata={
-                    "Service Code": row['SBS Code (Hyphenated)'],
-                    "Short Description": row['Short Description']
-                }
-            ))
-        return docs
+    def _page_contents(self, sbs_df: pd.DataFrame) -> pd.Series:
+        """Build every row's page text column-wise instead of one f-string per row."""
+        contents = None
+        for label, col in DOCUMENT_FIELDS:
+            if col in sbs_df.columns:
+                values = sbs_df[col].astype(str)
+            else:
+                values = pd.Series("Not Mentioned", index=sbs_df.index)
+            field = label + " " + values
+            contents = field if contents is None else contents + "\n" + field
+        return contents.str.strip()
 
+    def iter_sbs_docs(self, sbs_df: pd.DataFrame, batch_size: int = 1000) -> Iterator[List[Document]]:
+        """Yield documents in batches so they can be embedded without materializing them all."""
+        for start in range(0, len(sbs_df), batch_size):
+            with METRICS.span("convert"):
+                chunk = sbs_df.iloc[start:start + batch_size]
+                batch = [
+                    Document(
+                        page_content=content,
+                        metadata={
+                            "Service Code": code,
+                            "Short Description": short_desc
+                        }
+                    )
+                    for content, code, short_desc in zip(
+                        self._page_contents(chunk).tolist(),
+                        chunk['SBS Code (Hyphenated)'].tolist(),
+                        chunk['Short Description'].tolist()
+                    )
+                ]
+            yield batch
 
+    def convert_sbs_to_docs(self, sbs_df: pd.DataFrame) -> List[Document]:
+        return [doc for batch in self.iter_sbs_docs(sbs_df) for doc in batch]
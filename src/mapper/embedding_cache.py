@@ -0,0 +1,215 @@
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from instrumentation import METRICS
+from io_utils import atomic_path
+
+
+def _normalize(text: str) -> str:
+    """Collapse whitespace; tokenizers treat any run of it alike, so the embedding is unchanged."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """Embeddings on disk keyed by a hash of (model name, normalized text).
+
+    The cache folder holds immutable segments, each a sorted int64 key array and the float32
+    vectors in the same order. Segments open memory-mapped and are searched with a binary
+    search over their keys, so a cache of millions of texts costs no Python objects per entry.
+    New vectors are buffered and written as a new segment (tmp + rename), so several
+    processes can share one folder without locks. Once there are more than max_segments,
+    a flush merges them into one segment without repeated keys. The most recently used
+    vectors are also kept in memory, up to memory_items.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_name: str,
+        memory_items: int = 10_000,
+        flush_every: int = 4096,
+        max_segments: int = 16
+    ):
+        self.model_name = model_name
+        model_hash = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+        self.cache_dir = os.path.join(cache_dir, model_hash)
+        self.memory_items = memory_items
+        self.flush_every = flush_every
+        self.max_segments = max_segments
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._pending: Dict[int, np.ndarray] = {}
+        self._segments = []
+        self._loaded = set()
+        self._load_segments()
+
+    def key(self, text: str, kind: str = "document") -> int:
+        digest = hashlib.blake2b(
+            f"{self.model_name}\x00{kind}\x00{_normalize(text)}".encode("utf-8"), digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "little", signed=True)
+
+    def _load_segments(self) -> None:
+        """Open segments written since the last call, including other processes' ones."""
+        for keys_path in sorted(glob.glob(os.path.join(self.cache_dir, "keys-*.npy"))):
+            if keys_path in self._loaded:
+                continue
+            vectors_path = keys_path.replace("keys-", "vectors-")
+            if not os.path.exists(vectors_path):
+                continue  # its vectors are still being renamed into place
+            try:
+                segment = (np.load(keys_path, mmap_mode="r"), np.load(vectors_path, mmap_mode="r"))
+            except FileNotFoundError:
+                continue  # merged away by another process's compaction
+            self._segments.append(segment)
+            self._loaded.add(keys_path)
+
+    def _remember(self, key: int, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[int]) -> List[Optional[np.ndarray]]:
+        """Cached vector per key, None where missing."""
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            missing = []
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    vector = self._pending.get(key)
+                if vector is not None:
+                    self._memory[key] = vector
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                else:
+                    missing.append(i)
+
+            lookup = np.asarray([keys[i] for i in missing], dtype=np.int64)
+            for segment_keys, segment_vectors in self._segments:
+                if not len(missing):
+                    break
+                positions = np.searchsorted(segment_keys, lookup).clip(max=len(segment_keys) - 1)
+                hit = segment_keys[positions] == lookup
+                for i, position in zip(np.asarray(missing)[hit], positions[hit]):
+                    vector = np.array(segment_vectors[position])
+                    self._remember(keys[i], vector)
+                    found[i] = vector
+                missing = [i for i, is_hit in zip(missing, hit) if not is_hit]
+                lookup = lookup[~hit]
+        return found
+
+    def put_many(self, keys: List[int], vectors: np.ndarray) -> None:
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._pending[key] = vector
+                self._remember(key, vector)
+            should_flush = len(self._pending) >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    def _write_segment(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        """Save keys (sorted, unique) and their vectors as a new segment."""
+        name = f"{time.time_ns():020d}-{os.getpid()}"
+        for prefix, array in [("vectors", vectors), ("keys", keys)]:
+            # Keys are renamed last, so a segment is only picked up once complete
+            with atomic_path(os.path.join(self.cache_dir, f"{prefix}-{name}.npy")) as tmp_path:
+                with open(tmp_path, "wb") as f:
+                    np.save(f, array)
+
+    def flush(self) -> None:
+        """Write buffered vectors as a new segment, compacting when there are too many."""
+        with self._lock:
+            if not self._pending:
+                return
+            keys = np.fromiter(self._pending.keys(), dtype=np.int64, count=len(self._pending))
+            vectors = np.stack(list(self._pending.values())).astype(np.float32)
+            order = np.argsort(keys)
+            self._write_segment(keys[order], vectors[order])
+            self._pending.clear()
+            self._load_segments()
+            should_compact = len(self._segments) > self.max_segments
+        if should_compact:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge every segment into one, keeping each key once.
+
+        The merged segment is in place before the old ones are removed, so other processes
+        never miss a vector; they pick it up on their next flush.
+        """
+        self.flush()
+        with self._lock:
+            self._load_segments()
+            if len(self._segments) < 2:
+                return
+            keys, first = np.unique(np.concatenate([keys for keys, _ in self._segments]), return_index=True)
+            vectors = np.concatenate([vectors for _, vectors in self._segments])[first]
+            self._write_segment(keys, vectors.astype(np.float32))
+
+            merged = sorted(self._loaded)
+            self._segments, self._loaded = [], set()
+            for keys_path in merged:
+                for path in [keys_path, keys_path.replace("keys-", "vectors-")]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass  # already removed by another process, or still mapped by one (Windows)
+            self._load_segments()
+            print(f"🗜️ Compacted {len(merged)} embedding cache segments into one of {len(keys)} embeddings")
+
+    def __len__(self) -> int:
+        """Number of distinct cached texts."""
+        with self._lock:
+            keys = [np.asarray(keys) for keys, _ in self._segments]
+            keys.append(np.fromiter(self._pending.keys(), dtype=np.int64, count=len(self._pending)))
+        return len(np.unique(np.concatenate(keys)))
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings that answer from an EmbeddingCache and run the model only on new texts."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def _embed(self, texts: List[str], kind: str, embed_fn) -> List[List[float]]:
+        keys = [self.cache.key(text, kind) for text in texts]
+        vectors = self.cache.get_many(keys)
+        misses = {}
+        for text, key, vector in zip(texts, keys, vectors):
+            if vector is None:
+                misses.setdefault(key, text)
+        METRICS.inc("embedding_cache_hits", len(texts) - sum(vector is None for vector in vectors))
+        METRICS.inc("embedding_cache_misses", len(misses))
+
+        if misses:
+            computed = np.asarray(embed_fn(list(misses.values())), dtype=np.float32)
+            self.cache.put_many(list(misses), computed)
+            by_key = dict(zip(misses, computed))
+            vectors = [by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return [vector.tolist() for vector in vectors]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        # Models may embed queries differently (e.g. with an instruction), so they are cached apart
+        return self._embed([text], "query", lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+
+def cache_query_embeddings(vectorstore, cache: EmbeddingCache):
+    """Route the store's query embeddings through cache; the indexed vectors are untouched."""
+    if not isinstance(vectorstore.embedding_function, CachedQueryEmbeddings):
+        vectorstore.embedding_function = CachedQueryEmbeddings(vectorstore.embedding_function, cache)
+    return vectorstore
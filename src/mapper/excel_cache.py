@@ -0,0 +1,115 @@
+import datetime
+import hashlib
+import json
+import os
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from io_utils import atomic_path
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime.date, datetime.time, pd.Timestamp)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_mixed_columns(df: pd.DataFrame) -> List[str]:
+    """JSON-encode object columns Arrow cannot store (e.g. ints mixed with strings).
+
+    Encoding keeps each value's type, so 0 and '0' stay distinct after a round trip.
+    """
+    encoded = []
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: json.dumps(v, default=_json_default), na_action="ignore")
+            encoded.append(col)
+    return encoded
+
+
+def decode_json_columns(df: pd.DataFrame, json_columns: List[str]) -> pd.DataFrame:
+    """Undo encode_mixed_columns on the columns present in df."""
+    for col in json_columns:
+        if col in df.columns:
+            df[col] = df[col].map(json.loads, na_action="ignore")
+    return df
+
+
+def _sidecar_paths(path: str, sheet_name, cache_dir: Optional[str]):
+    folder = cache_dir or os.path.dirname(os.path.abspath(path))
+    stem = f"{os.path.basename(path)}.{sheet_name}"
+    return os.path.join(folder, f"{stem}.parquet"), os.path.join(folder, f"{stem}.meta.json")
+
+
+def _is_fresh(path: str, meta_path: str, stat: os.stat_result) -> bool:
+    """Compare size/mtime first and only hash the workbook when they differ."""
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if meta["size"] != stat.st_size or meta["sha256"] != _file_sha256(path):
+        return False
+
+    # Same content, only touched: record the new mtime so the next check stays cheap
+    meta["mtime_ns"] = stat.st_mtime_ns
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return True
+
+
+def read_excel_cached(
+    path: str,
+    columns: Optional[List[str]] = None,
+    sheet_name=0,
+    cache_dir: Optional[str] = None
+) -> pd.DataFrame:
+    """Read an Excel sheet through a Parquet sidecar, converting the workbook only when it changes.
+
+    columns limits the read to those columns (ones missing from the sheet are ignored).
+    The sidecar sits next to the workbook unless cache_dir is given.
+    """
+    parquet_path, meta_path = _sidecar_paths(path, sheet_name, cache_dir)
+    stat = os.stat(path)
+
+    if not (os.path.exists(parquet_path) and _is_fresh(path, meta_path, stat)):
+        df = pd.read_excel(path, sheet_name=sheet_name)
+        try:
+            cached = df.copy()
+            json_columns = encode_mixed_columns(cached)
+            os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+            with atomic_path(parquet_path) as tmp_path:
+                cached.to_parquet(tmp_path, index=False)
+            with open(meta_path, "w") as f:
+                json.dump({
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": _file_sha256(path),
+                    "json_columns": json_columns
+                }, f)
+        except (OSError, ValueError, pa.ArrowException) as e:
+            print(f"⚠️ Could not cache {path} as Parquet ({e}); reading Excel directly.")
+            return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+    with open(meta_path) as f:
+        json_columns = json.load(f)["json_columns"]
+    available = pq.read_schema(parquet_path).names
+    if columns is not None:
+        columns = [c for c in columns if c in available]
+
+    return decode_json_columns(pd.read_parquet(parquet_path, columns=columns), json_columns)
@@ -0,0 +1,188 @@
+import json
+import os
+import time
+from typing import Iterable, List, Optional
+import pandas as pd
+from excel_cache import decode_json_columns, encode_mixed_columns, read_excel_cached
+from io_utils import atomic_path, write_text_atomic
+
+FEEDBACK_COLUMNS = [
+    'SERVICE_CODE', 'SERVICE_DESCRIPTION', 'SERVICE_KEY', 'SERVICE_CLASSIFICATION',
+    'SERVICE_CATEGORY', 'SBS Code', 'SBS Code (Hyphenated)', 'SHORT_DESCRIPTION',
+    'Long Description', 'Definition', 'Chapter Name', 'Block Name', 'Comment'
+]
+CORRECTION_COLUMNS = FEEDBACK_COLUMNS[:-1]
+OUTPUT_COLUMNS = [
+    'INSURANCE_COMPANY', 'SERVICE_CODE', 'SERVICE_DESCRIPTION', 'PRICE',
+    'SERVICE_KEY', 'SERVICE_CLASSIFICATION', 'SERVICE_CATEGORY', 'SBS Code',
+    'SBS Code (Hyphenated)', 'SHORT_DESCRIPTION', 'Long Description',
+    'Definition', 'Chapter Name', 'Block Name'
+]
+KEY = "_code"  # SERVICE_CODE as text, so 123 and '123' address the same service
+STATE_COLUMNS = [KEY] + CORRECTION_COLUMNS + ["_row_hash", "_source", "_ingested_at"]
+
+
+def _file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    return pd.util.hash_pandas_object(df[CORRECTION_COLUMNS].astype(str), index=False).astype("int64")
+
+
+class FeedbackMergeEngine:
+    """Applies reviewer feedback workbooks to the mappings incrementally.
+
+    Rows marked 'Correct' are kept per (SERVICE_CODE, workbook) in state_dir/corrections.parquet.
+    A manifest records each workbook's size and mtime, so unchanged workbooks are skipped and
+    only new or changed rows touch the state. When several workbooks correct the same code,
+    the one that changed it last wins, and a code is only dropped once no workbook still
+    marks it 'Correct'. corrections holds the winning row per code.
+    """
+
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        self.corrections_path = os.path.join(state_dir, "corrections.parquet")
+        self.manifest_path = os.path.join(state_dir, "manifest.json")
+        os.makedirs(state_dir, exist_ok=True)
+
+        self.manifest = {"files": {}, "json_columns": [], "pending_codes": [], "applied": None}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+        if os.path.exists(self.corrections_path):
+            contributions = pd.read_parquet(self.corrections_path)
+            self.contributions = decode_json_columns(contributions, self.manifest["json_columns"])
+        else:
+            self.contributions = pd.DataFrame(columns=STATE_COLUMNS).astype(
+                {"_row_hash": "int64", "_ingested_at": "float64"}
+            )
+        self.corrections = self._winners()
+
+    def _winners(self) -> pd.DataFrame:
+        """The correction per code from the workbook that changed it last."""
+        return (
+            self.contributions.sort_values("_ingested_at", kind="stable")
+            .drop_duplicates(subset=KEY, keep="last")
+            .set_index(KEY)
+        )
+
+    def _save(self) -> None:
+        stored = self.contributions.reset_index(drop=True)
+        self.manifest["json_columns"] = encode_mixed_columns(stored)
+        with atomic_path(self.corrections_path) as tmp_path:
+            stored.to_parquet(tmp_path, index=False)
+        write_text_atomic(self.manifest_path, json.dumps(self.manifest, indent=2))
+
+    def _ingest_file(self, path: str) -> set:
+        """Merge one workbook's rows into the state; returns the codes whose correction changed."""
+        feedback = read_excel_cached(path, columns=FEEDBACK_COLUMNS)
+        if 'Comment' not in feedback.columns:
+            print(f"⚠️ {os.path.basename(path)} has no Comment column; not a feedback workbook, skipped.")
+            return set()
+        correct = feedback[feedback['Comment'] == 'Correct'].copy()
+        correct['SBS Code'] = pd.to_numeric(correct['SBS Code']).astype("Int64")
+        correct[KEY] = correct['SERVICE_CODE'].astype(str)
+        correct = correct.drop_duplicates(subset=KEY, keep="last").set_index(KEY)[CORRECTION_COLUMNS]
+        correct["_row_hash"] = _row_hashes(correct).to_numpy()
+
+        # This workbook's rows replace the ones it gave before; unchanged rows keep their ingest time
+        source = os.path.abspath(path)
+        from_file = self.contributions["_source"] == source
+        previous_hash = self.contributions[from_file].set_index(KEY)["_row_hash"]
+        unchanged = previous_hash.reindex(correct.index).to_numpy() == correct["_row_hash"].to_numpy()
+        changed = correct[~unchanged].assign(_source=source, _ingested_at=time.time()).reset_index()
+        kept = self.contributions[from_file & self.contributions[KEY].isin(correct.index[unchanged])]
+        # Corrections this workbook gave before but no longer marks 'Correct' are withdrawn from it
+        withdrawn = previous_hash.index.difference(correct.index)
+
+        before = self.corrections["_row_hash"].to_dict()
+        parts = [part for part in [self.contributions[~from_file], kept, changed[STATE_COLUMNS]] if len(part)]
+        self.contributions = pd.concat(parts, ignore_index=True) if parts else self.contributions.iloc[:0]
+        self.corrections = self._winners()
+        after = self.corrections["_row_hash"].to_dict()
+
+        print(f"📥 {os.path.basename(path)}: {len(changed)} new/changed corrections, {len(withdrawn)} withdrawn.")
+        # Codes whose winning correction changed, appeared or disappeared
+        return {code for code in before.keys() | after.keys() if before.get(code) != after.get(code)}
+
+    def ingest(self, feedback_paths: Iterable[str]) -> int:
+        """Ingest every new or modified workbook; returns how many codes changed."""
+        changed = set()
+        for path in feedback_paths:
+            signature = _file_signature(path)
+            if self.manifest["files"].get(os.path.abspath(path)) == signature:
+                print(f"⏭️ {os.path.basename(path)} unchanged since last ingest.")
+                continue
+            changed |= self._ingest_file(path)
+            self.manifest["files"][os.path.abspath(path)] = signature
+
+        self.manifest["pending_codes"] = sorted(set(self.manifest["pending_codes"]) | changed)
+        self._save()
+        return len(changed)
+
+    def _merge(self, mappings: pd.DataFrame) -> pd.DataFrame:
+        """Mappings with every corrected code's SBS fields replaced by its correction."""
+        codes = mappings['SERVICE_CODE'].astype(str)
+        revised = codes.isin(self.corrections.index)
+        unrevised = mappings[~revised]
+        corrected = mappings.loc[revised, ['INSURANCE_COMPANY', 'SERVICE_CODE', 'PRICE']].assign(
+            **{KEY: codes[revised]}
+        ).merge(
+            self.corrections[CORRECTION_COLUMNS].drop(columns='SERVICE_CODE'),
+            left_on=KEY, right_index=True, how='left'
+        ).drop(columns=KEY)
+        return pd.concat([unrevised, corrected], axis=0).reindex(columns=OUTPUT_COLUMNS)
+
+    def apply(self, mappings_path: str, output_path: str, excel_path: Optional[str] = None) -> pd.DataFrame:
+        """Write the corrected mappings to Parquet (and optionally Excel).
+
+        When the mappings workbook is unchanged since the last apply to output_path, only the
+        rows of codes whose correction changed since then are rebuilt.
+        """
+        signature = {**_file_signature(mappings_path), "mappings": os.path.abspath(mappings_path),
+                     "output": os.path.abspath(output_path)}
+        mappings = read_excel_cached(mappings_path)
+        pending = set(self.manifest["pending_codes"])
+
+        if self.manifest["applied"] == signature and os.path.exists(output_path):
+            previous = pd.read_parquet(output_path)
+            previous = decode_json_columns(previous, self.manifest.get("output_json_columns", []))
+            keep = ~previous['SERVICE_CODE'].astype(str).isin(pending)
+            touched = mappings[mappings['SERVICE_CODE'].astype(str).isin(pending)]
+            result = pd.concat([previous[keep], self._merge(touched)], axis=0, ignore_index=True)
+            print(f"🔁 Patched {len(touched)} mapping rows for {len(pending)} changed codes.")
+        else:
+            result = self._merge(mappings).reset_index(drop=True)
+            print(f"🧮 Rebuilt all {len(result)} mapping rows ({len(self.corrections)} corrected codes).")
+
+        stored = result.copy()
+        self.manifest["output_json_columns"] = encode_mixed_columns(stored)
+        with atomic_path(output_path) as tmp_path:
+            stored.to_parquet(tmp_path, index=False)
+
+        if excel_path:
+            result.to_excel(excel_path, index=False)
+            print(f"📤 Exported {excel_path}")
+
+        self.manifest["applied"] = signature
+        self.manifest["pending_codes"] = []
+        self._save()
+        return result
+
+
+def find_feedback_files(paths: List[str]) -> List[str]:
+    """Expand folders into the .xlsx workbooks they contain, oldest first so newer feedback wins."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            workbooks = [
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(".xlsx") and not name.startswith("~$")
+            ]
+            files.extend(sorted(workbooks, key=os.path.getmtime))
+        else:
+            files.append(path)
+    return files
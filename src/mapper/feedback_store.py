@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+import pandas as pd
+from io_utils import atomic_path, to_python
+
+KEY_COLUMNS = ['INSURANCE_COMPANY', 'SERVICE_CODE']
+
+
+class FeedbackStore:
+    """Reviewer feedback keyed on (INSURANCE_COMPANY, SERVICE_CODE) in SQLite.
+
+    Each save is a single-row upsert in its own transaction; WAL mode and a busy
+    timeout let several reviewers save at the same time without overwriting each other.
+    """
+
+    def __init__(self, db_path: str, columns: List[str], legacy_csv: Optional[str] = None):
+        self.db_path = db_path
+        self.columns = columns
+
+        is_new = not os.path.exists(db_path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # No declared type on the key columns so int and str codes keep their type
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                " company, code, row TEXT NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (company, code))"
+            )
+
+        if is_new and legacy_csv and os.path.exists(legacy_csv):
+            legacy = pd.read_csv(legacy_csv)
+            self.upsert_many(legacy.to_dict("records"))
+            print(f"📥 Imported {len(legacy)} feedback rows from {legacy_csv}.")
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one transaction, committing on success and always closing it."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def upsert(self, row: dict) -> None:
+        """Insert or replace the feedback for the row's (INSURANCE_COMPANY, SERVICE_CODE)."""
+        self.upsert_many([row])
+
+    def upsert_many(self, rows: List[dict]) -> None:
+        """Upsert several rows in one transaction."""
+        now = time.time()
+        params = []
+        for row in rows:
+            row = {col: to_python(row.get(col, "")) for col in self.columns}
+            params.append((row[KEY_COLUMNS[0]], row[KEY_COLUMNS[1]], json.dumps(row, default=str), now))
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO feedback (company, code, row, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (company, code) DO UPDATE SET"
+                " row = excluded.row, updated_at = excluded.updated_at",
+                params
+            )
+
+    def get(self, company, code) -> Optional[dict]:
+        with self._connect() as conn:
+            found = conn.execute(
+                "SELECT row FROM feedback WHERE company = ? AND code = ?",
+                (to_python(company), to_python(code))
+            ).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def load_frame(self) -> pd.DataFrame:
+        with self._connect() as conn:
+            rows = [json.loads(row) for (row,) in conn.execute("SELECT row FROM feedback ORDER BY rowid")]
+        return pd.DataFrame(rows, columns=self.columns)
+
+    def export_csv(self, path: str) -> None:
+        """Write all feedback in the validated_mappings.csv layout (tmp + rename, so readers never see half a file)."""
+        with atomic_path(path) as tmp_path:
+            self.load_frame().to_csv(tmp_path, index=False)
+
+
+class DebouncedCsvExport:
+    """Re-exports a FeedbackStore to CSV delay seconds after a save, once per burst of saves.
+
+    Keeps validated_mappings.csv current for the tools that read it without rewriting the
+    whole file on every click.
+    """
+
+    def __init__(self, store: FeedbackStore, path: str, delay: float = 5.0):
+        self.store = store
+        self.path = path
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def schedule(self) -> None:
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._export)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _export(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.store.export_csv(self.path)
+        except OSError as e:
+            # e.g. the CSV is open in Excel on Windows; the next save tries again
+            print(f"⚠️ Could not export feedback to {self.path}: {e}")
+
+    def flush(self) -> None:
+        """Export now, cancelling a pending export."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.store.export_csv(self.path)
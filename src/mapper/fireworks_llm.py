@@ -1,43 +1,310 @@
+import asyncio
 import os
+import threading
+import weakref
 from typing import List, Optional
+import httpx
 from dotenv import load_dotenv
 from langchain.llms.base import LLM
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+from llm_cache import LLMResponseCache
+from rate_limiting import TokenBucket
+from answer_parser import StreamingAnswerParser
+from instrumentation import METRICS
+
+SYSTEM_MESSAGE = "You are an expert in medical coding and service mapping."
+DEFAULT_BASE_URL = "https://api.fireworks.ai/inference/v1"
+
+# Clients are shared by every FireworksLLM with the same connection settings so
+# concurrent calls reuse warm keep-alive connections instead of new TLS handshakes.
+_sync_clients = {}
+_async_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+class TruncatedAnswerError(Exception):
+    """The completion hit max_tokens before the answer ended."""
+
+
+class _StreamedAnswer:
+    """A streamed completion as read so far: its text, finish reason and usage."""
+
+    def __init__(self, item_ids: Optional[List[str]] = None):
+        self.parser = StreamingAnswerParser(item_ids)
+        self.finish_reason = None
+        self.usage = None
+        self.chunks = 0
+
+    def add(self, chunk) -> bool:
+        """Read one chunk; returns True once every expected answer field has arrived."""
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return False
+        choice = chunk.choices[0]
+        self.finish_reason = choice.finish_reason or self.finish_reason
+        content = choice.delta.content or ""
+        self.chunks += bool(content)
+        return self.parser.feed(content)
+
+    def record_usage(self, prompt: str) -> None:
+        """Usage as reported in the last chunk, estimated when the stream was closed before it."""
+        if self.usage is not None:
+            FireworksLLM._record_usage(self)
+            return
+        # Servers stream about one token per chunk; the prompt uses a 4-characters-per-token estimate
+        METRICS.inc("llm_usage_estimated")
+        METRICS.inc("llm_prompt_tokens", len(SYSTEM_MESSAGE + prompt) // 4)
+        METRICS.inc("llm_completion_tokens", self.chunks)
+
 
 class FireworksLLM(LLM):
     model: str
     api_key: str
-    base_url: str = "https://api.fireworks.ai/inference/v1"
+    base_url: str = DEFAULT_BASE_URL
     temperature: float = 0
     top_p: float = 0
+    response_cache: Optional[LLMResponseCache] = None
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+    max_connections: int = 32
+    max_keepalive_connections: int = 16
+    keepalive_expiry: float = 60.0
+    # Retries happen in rate_limiting.call_with_retry, which counts them; SDK retries on top
+    # would multiply attempts unseen
+    max_retries: int = 0
+    # Paces requests actually sent; cache hits never take a token
+    rate_limiter: Optional[TokenBucket] = None
+    # Output-token cap per answer (a batch prompt gets one per item); None leaves the server default
+    max_tokens: Optional[int] = None
+    # Stream answers and close the stream once the answer fields are complete
+    streaming: bool = False
 
     @property
     def _llm_type(self) -> str:
         return "fireworks"
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
+    def _client_settings(self) -> tuple:
+        return (
+            self.api_key, self.base_url, self.connect_timeout, self.read_timeout,
+            self.max_connections, self.max_keepalive_connections, self.keepalive_expiry,
+            self.max_retries
+        )
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def _get_client(self) -> OpenAI:
+        """Return the process-wide pooled client for these settings, creating it once."""
+        settings = self._client_settings()
+        with _clients_lock:
+            client = _sync_clients.get(settings)
+            if client is None:
+                client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self._timeout(),
+                    max_retries=self.max_retries,
+                    http_client=httpx.Client(limits=self._limits(), timeout=self._timeout())
+                )
+                _sync_clients[settings] = client
+            return client
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        """Return the pooled async client for these settings on the running event loop."""
+        loop = asyncio.get_running_loop()
+        settings = self._client_settings()
+        with _clients_lock:
+            loop_clients = _async_clients.setdefault(loop, {})
+            client = loop_clients.get(settings)
+            if client is None:
+                client = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self._timeout(),
+                    max_retries=self.max_retries,
+                    http_client=httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+                )
+                loop_clients[settings] = client
+            return client
+
+    def _messages(self, prompt: str) -> list:
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _max_tokens(self, item_ids: Optional[List[str]]) -> Optional[int]:
+        """The output-token cap for one request: max_tokens per answer, one answer per batch item."""
+        if not self.max_tokens:
+            return None
+        return self.max_tokens * (len(item_ids) if item_ids else 1)
+
+    def _cached(self, prompt: str, stop: Optional[List[str]], item_ids: Optional[List[str]]):
+        """Return (cache_key, cached_answer); both None when caching is disabled.
+
+        The output cap, stop sequences and streaming (whose answers end early) are part of the
+        key; left at their defaults they are omitted, so existing entries keep their keys.
+        """
+        if self.response_cache is None:
+            return None, None
+        params = {}
+        if self._max_tokens(item_ids):
+            params["max_tokens"] = self._max_tokens(item_ids)
+        if stop:
+            params["stop"] = list(stop)
+        if self.streaming:
+            params["streaming"] = True
+        cache_key = LLMResponseCache.make_key(
+            SYSTEM_MESSAGE, prompt, self.model, self.temperature, self.top_p, **params
         )
-        response = client.chat.completions.create(
+        return cache_key, self.response_cache.get(cache_key)
+
+    def _request(self, prompt: str, stop: Optional[List[str]], item_ids: Optional[List[str]]) -> dict:
+        """Keyword arguments of chat.completions.create for one prompt."""
+        request = dict(
             model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert in medical coding and service mapping."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self._messages(prompt),
             temperature=self.temperature,
             top_p=self.top_p
         )
-        return response.choices[0].message.content
+        if self.max_tokens:
+            request["max_tokens"] = self._max_tokens(item_ids)
+        if stop:
+            request["stop"] = stop
+        if self.streaming:
+            request["stream"] = True
+            request["stream_options"] = {"include_usage": True}
+        return request
+
+    @staticmethod
+    def _record_usage(response) -> None:
+        """Add the completion's token usage to the run metrics."""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            METRICS.inc("llm_prompt_tokens", usage.prompt_tokens or 0)
+            METRICS.inc("llm_completion_tokens", usage.completion_tokens or 0)
+
+    def _store(self, cache_key: Optional[str], answer: str, finish_reason: Optional[str]) -> None:
+        if finish_reason == "length":
+            # Cut by max_tokens: not cached, and raised so the caller records a failure to retry
+            METRICS.inc("llm_truncated")
+            raise TruncatedAnswerError(f"answer stopped at max_tokens: {answer!r}")
+        if cache_key is not None and answer:
+            self.response_cache.put(cache_key, answer, model=self.model)
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        item_ids: Optional[List[str]] = None,
+        **kwargs
+    ) -> str:
+        """Answer prompt; item_ids lists a batch prompt's items so a stream stops after the last one."""
+        cache_key, cached = self._cached(prompt, stop, item_ids)
+        if cached is not None:
+            METRICS.inc("llm_cache_hits")
+            return cached
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        METRICS.inc("llm_requests")
+        try:
+            with METRICS.span("llm_request"):
+                response = self._get_client().chat.completions.create(**self._request(prompt, stop, item_ids))
+                if self.streaming:
+                    streamed = _StreamedAnswer(item_ids)
+                    with response:
+                        for chunk in response:
+                            if streamed.add(chunk):
+                                # Leaving the block closes the connection, ending generation and billing
+                                METRICS.inc("llm_streams_stopped_early")
+                                break
+        except Exception:
+            METRICS.inc("llm_errors")
+            raise
+        if self.streaming:
+            streamed.record_usage(prompt)
+            answer, finish_reason = streamed.parser.text, streamed.finish_reason
+        else:
+            self._record_usage(response)
+            answer, finish_reason = response.choices[0].message.content, response.choices[0].finish_reason
+
+        self._store(cache_key, answer, finish_reason)
+        return answer
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        item_ids: Optional[List[str]] = None,
+        **kwargs
+    ) -> str:
+        cache_key, cached = self._cached(prompt, stop, item_ids)
+        if cached is not None:
+            METRICS.inc("llm_cache_hits")
+            return cached
+
+        if self.rate_limiter is not None:
+            await asyncio.to_thread(self.rate_limiter.acquire)
+        METRICS.inc("llm_requests")
+        try:
+            with METRICS.span("llm_request"):
+                response = await self._get_async_client().chat.completions.create(
+                    **self._request(prompt, stop, item_ids)
+                )
+                if self.streaming:
+                    streamed = _StreamedAnswer(item_ids)
+                    async with response:
+                        async for chunk in response:
+                            if streamed.add(chunk):
+                                METRICS.inc("llm_streams_stopped_early")
+                                break
+        except Exception:
+            METRICS.inc("llm_errors")
+            raise
+        if self.streaming:
+            streamed.record_usage(prompt)
+            answer, finish_reason = streamed.parser.text, streamed.finish_reason
+        else:
+            self._record_usage(response)
+            answer, finish_reason = response.choices[0].message.content, response.choices[0].finish_reason
+
+        self._store(cache_key, answer, finish_reason)
+        return answer
+
+def get_fireworks_llm(
+    cache_path: Optional[str] = None,
+    base_url: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    streaming: bool = False,
+    rate_limiter: Optional[TokenBucket] = None
+) -> FireworksLLM:
+    """Factory method to load API key from .env and return configured LLM.
 
-def get_fireworks_llm() -> FireworksLLM:
-    """Factory method to load API key from .env and return configured LLM."""
+    Pass cache_path to serve repeated prompts from an on-disk response cache.
+    base_url (or FIREWORKS_BASE_URL) points the client at another OpenAI-compatible
+    server, e.g. a local stub for testing. max_tokens caps each answer's output tokens and
+    streaming stops reading (and generating) once the answer fields are complete.
+    rate_limiter paces the requests sent to the server; cached answers skip it.
+    """
     load_dotenv()
     api_key = os.getenv("FIREWORKS_NEW_API_KEY")
     if not api_key:
         raise ValueError("FIREWORKS_NEW_API_KEY not found in environment variables.")
     return FireworksLLM(
         model="accounts/fireworks/models/deepseek-v3-0324",
-        api_key=api_key
-    )
\ No newline at end of file
+        api_key=api_key,
+        base_url=base_url or os.getenv("FIREWORKS_BASE_URL", DEFAULT_BASE_URL),
+        response_cache=LLMResponseCache(cache_path) if cache_path else None,
+        max_tokens=max_tokens,
+        streaming=streaming,
+        rate_limiter=rate_limiter
+    )
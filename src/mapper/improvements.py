@@ -1,4 +1,7 @@
+import argparse
 import pandas as pd
+from excel_cache import read_excel_cached
+from feedback_merge import FEEDBACK_COLUMNS, FeedbackMergeEngine, find_feedback_files
 
 class ServiceMappingsProcessor:
     def __init__(self, mappings_path: str, feedback_path: str):
@@ -6,9 +9,9 @@ class ServiceMappingsProcessor:
         self.feedback_path = feedback_path
 
     def load_data(self):
-        """Load mappings and feedback Excel files."""
-        self.mappings = pd.read_excel(self.mappings_path)
-        self.feedback = pd.read_excel(self.feedback_path)
+        """Load mappings and feedback Excel files (through their Parquet cache)."""
+        self.mappings = read_excel_cached(self.mappings_path)
+        self.feedback = read_excel_cached(self.feedback_path, columns=FEEDBACK_COLUMNS)
 
     def process_feedback(self):
         """Extract and clean correct mappings from feedback."""
@@ -21,7 +24,7 @@ class ServiceMappingsProcessor:
              'Long Description', 'Definition', 'Chapter Name', 'Block Name']
         ].drop_duplicates()
 
-        self.correct_services = list(self.correct_mappings['SERVICE_CODE'].unique())
+        self.correct_services = pd.Index(self.correct_mappings['SERVICE_CODE'].unique())
 
     def process_mappings(self):
         """Split mappings into unrevised and revised, then merge with feedback."""
@@ -40,7 +43,7 @@ class ServiceMappingsProcessor:
              'Definition', 'Chapter Name', 'Block Name']
         ]
 
-        self.mappings_after_edits = pd.concat([self.unrevised_mappings, self.revised_codes], axis=0)
+        self.mappings_after_edits = pd.concat([self.unrevised_mappings, self.match_services], axis=0)
 
     def run(self):
         """Run the full pipeline (no return, just prepare data)."""
@@ -53,13 +56,23 @@ class ServiceMappingsProcessor:
         if self.mappings_after_edits is None:
             raise ValueError("You must run the pipeline before saving.")
         self.mappings_after_edits.to_excel(output_path, index=False)
-    
 
-processor = ServiceMappingsProcessor(
-    mappings_path="D:\\CodingSystem\\assets\\ahj_sbs_mappings.xlsx",
-    feedback_path="D:\\CodingSystem\\assets\\feedback\\AI-Revision (TCS-ART-MEDVISA-PUPA).xlsx"
-)
 
-processor.run()
-processor.save_to_excel("D:\\CodingSystem\\assets\\feedback\\mappings_after_edits.xlsx")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Apply reviewer feedback workbooks to the AHJ/SBS mappings.")
+    parser.add_argument("--mappings", default="D:\\CodingSystem\\assets\\ahj_sbs_mappings.xlsx")
+    parser.add_argument("--feedback", nargs="+", default=["D:\\CodingSystem\\assets\\feedback"],
+                        help="Feedback workbooks, or folders of them; only new or modified ones are ingested.")
+    parser.add_argument("--state-dir", default="D:\\CodingSystem\\assets\\feedback\\merge_state",
+                        help="Where the corrections table and ingest manifest are kept between runs.")
+    parser.add_argument("--output", default="D:\\CodingSystem\\assets\\feedback\\mappings_after_edits.parquet")
+    parser.add_argument("--excel-output", default=None,
+                        help="Also export the result to this Excel file (slow for large mappings).")
+    return parser.parse_args()
 
+
+if __name__ == "__main__":
+    args = parse_args()
+    engine = FeedbackMergeEngine(args.state_dir)
+    engine.ingest(find_feedback_files(args.feedback))
+    engine.apply(args.mappings, args.output, excel_path=args.excel_output)
@@ -0,0 +1,93 @@
+import argparse
+import os
+import time
+from itertools import chain
+from typing import List
+import numpy as np
+import pandas as pd
+import faiss
+from data_preprocessing import ServiceMatcher
+from document_convertor import DocumentConverter
+from vector_store import DOCSTORE_FILE, INDEX_TYPES, VectorstoreBuilder, compact_index
+from mmap_docstore import DOCS_FILE
+from batch_retriever import BatchRetriever
+
+
+def _index_mb(index: faiss.Index) -> float:
+    """Serialized size, which is what a memory-mapped load shares between processes."""
+    return faiss.serialize_index(index).nbytes / (1024 * 1024)
+
+
+def _timed_search(index: faiss.Index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def index_report(flat_index: faiss.Index, queries: np.ndarray, index_types: List[str], k: int = 3) -> pd.DataFrame:
+    """Size, build time, per-query latency and recall@k of each index type against the flat index.
+
+    recall@k is the share of the flat index's top k that the index also returns in its top k.
+    """
+    exact, flat_ms = _timed_search(flat_index, queries, k)
+    flat_mb = _index_mb(flat_index)
+    rows = [{"Index_Type": "flat", "Index_MB": flat_mb, "Size_vs_Flat": 1.0,
+             "Build_Seconds": 0.0, "Query_ms": flat_ms, f"Recall_at_{k}": 1.0}]
+
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = compact_index(flat_index, index_type)
+        build_seconds = time.perf_counter() - start
+        found, query_ms = _timed_search(index, queries, k)
+        hits = [len(set(row_exact) & set(row_found)) for row_exact, row_found in zip(exact, found)]
+        index_mb = _index_mb(index)
+        rows.append({
+            "Index_Type": index_type,
+            "Index_MB": index_mb,
+            "Size_vs_Flat": index_mb / flat_mb,
+            "Build_Seconds": build_seconds,
+            "Query_ms": query_ms,
+            f"Recall_at_{k}": float(np.mean(hits)) / k,
+        })
+        print(f"📐 {index_type}: {index_mb:.1f} MB, recall@{k} {rows[-1][f'Recall_at_{k}']:.3f}")
+    return pd.DataFrame(rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare compact FAISS index types with the flat index.")
+    parser.add_argument("--ahj-path", default=r"D:\CodingSystem\assets\AHJ_PriceList.xlsx",
+                        help="Price list whose service descriptions are the test queries.")
+    parser.add_argument("--sbs-path", default=r"D:\CodingSystem\assets\SBS_Services.xlsx")
+    parser.add_argument("--index-cache-dir", default=r"D:\CodingSystem\assets\faiss_cache")
+    parser.add_argument("--embeddings-model", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--index-types", nargs="+", default=[t for t in INDEX_TYPES if t != "flat"],
+                        choices=[t for t in INDEX_TYPES if t != "flat"])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--n-queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="index_report.csv")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ahj_df, sbs_df = ServiceMatcher(ahj_path=args.ahj_path, sbs_path=args.sbs_path).load_data()
+    converter = DocumentConverter()
+    builder = VectorstoreBuilder(args.embeddings_model, cache_dir=args.index_cache_dir)
+    cache_key = builder.catalog_key(chain.from_iterable(converter.iter_sbs_docs(sbs_df)))
+    vectorstore = builder.create_faiss_index_from_batches(converter.iter_sbs_docs(sbs_df), cache_key=cache_key)
+
+    descriptions = ahj_df["SERVICE_DESCRIPTION"].dropna().astype(str).drop_duplicates()
+    descriptions = descriptions.sample(min(args.n_queries, len(descriptions)), random_state=args.seed)
+    queries = BatchRetriever(vectorstore).embed_queries(descriptions.tolist())
+
+    report = index_report(vectorstore.index, queries, args.index_types, k=args.k)
+    report.to_csv(args.output, index=False)
+    print(report.to_string(index=False))
+
+    index_dir = os.path.join(args.index_cache_dir, cache_key)
+    if os.path.exists(os.path.join(index_dir, DOCS_FILE)):
+        print(f"🗂️ Docstore: {os.path.getsize(os.path.join(index_dir, DOCSTORE_FILE)) / 2**20:.1f} MB pickled "
+              f"(a private copy per process) vs {os.path.getsize(os.path.join(index_dir, DOCS_FILE)) / 2**20:.1f} MB "
+              f"memory-mapped (shared)")
+    print(f"📊 Index report saved to {args.output}")
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+import numpy as np
+from io_utils import write_text_atomic
+
+# Fireworks serverless DeepSeek V3 list prices, USD per million tokens
+PROMPT_PRICE_PER_MILLION = 0.90
+COMPLETION_PRICE_PER_MILLION = 0.90
+# Recent durations kept per span for percentiles; count, total and max stay exact
+SPAN_WINDOW = 10_000
+
+
+class _SpanStats:
+    """Exact count, total and max of a span, plus its last SPAN_WINDOW durations."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=SPAN_WINDOW)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+
+class Metrics:
+    """Thread-safe registry of span timings, counters and gauges for one process.
+
+    Memory per span is bounded, so a resident server can record for as long as it runs:
+    p50/p95 cover the last SPAN_WINDOW durations, the other span figures all of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.spans: Dict[str, _SpanStats] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = _SpanStats()
+            stats.add(seconds)
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.spans.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            spans = {
+                name: (stats.count, stats.total, stats.max, np.fromiter(stats.recent, dtype=float))
+                for name, stats in self.spans.items()
+            }
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self.started,
+            "spans": {
+                name: {
+                    "count": count,
+                    "total_seconds": total,
+                    "p50_seconds": float(np.percentile(recent, 50)),
+                    "p95_seconds": float(np.percentile(recent, 95)),
+                    "max_seconds": max_seconds,
+                }
+                for name, (count, total, max_seconds, recent) in spans.items()
+            },
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def to_prometheus(self, snapshot: Optional[dict] = None) -> str:
+        """Render a snapshot in the Prometheus text exposition format (node_exporter textfile)."""
+        snapshot = snapshot or self.snapshot()
+        lines = ["# TYPE mapper_span_seconds summary"]
+        for name, stats in sorted(snapshot["spans"].items()):
+            lines.append(f'mapper_span_seconds{{span="{name}",quantile="0.5"}} {stats["p50_seconds"]}')
+            lines.append(f'mapper_span_seconds{{span="{name}",quantile="0.95"}} {stats["p95_seconds"]}')
+            lines.append(f'mapper_span_seconds_sum{{span="{name}"}} {stats["total_seconds"]}')
+            lines.append(f'mapper_span_seconds_count{{span="{name}"}} {stats["count"]}')
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE mapper_{name}_total counter")
+            lines.append(f"mapper_{name}_total {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE mapper_{name} gauge")
+            lines.append(f"mapper_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+              extra: Optional[dict] = None) -> None:
+        """Write a snapshot; extra entries (e.g. the run summary) are added to the JSON."""
+        snapshot = self.snapshot()
+        if json_path:
+            write_text_atomic(json_path, json.dumps({**snapshot, **(extra or {})}, indent=2, default=str))
+        if prometheus_path:
+            write_text_atomic(prometheus_path, self.to_prometheus(snapshot))
+
+    def summary(
+        self,
+        n_services: int,
+        prompt_price: float = PROMPT_PRICE_PER_MILLION,
+        completion_price: float = COMPLETION_PRICE_PER_MILLION
+    ) -> dict:
+        """End-of-run totals: tokens per service, estimated cost and per-span p50/p95."""
+        snapshot = self.snapshot()
+        counters = snapshot["counters"]
+        prompt_tokens = counters.get("llm_prompt_tokens", 0)
+        completion_tokens = counters.get("llm_completion_tokens", 0)
+        return {
+            "services": n_services,
+            "llm_requests": counters.get("llm_requests", 0),
+            "llm_cache_hits": counters.get("llm_cache_hits", 0),
+            "llm_streams_stopped_early": counters.get("llm_streams_stopped_early", 0),
+            "llm_truncated": counters.get("llm_truncated", 0),
+            "retries": counters.get("retries", 0),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_per_service": (prompt_tokens + completion_tokens) / n_services if n_services else 0.0,
+            "estimated_cost_usd": (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6,
+            "spans": {
+                name: {"count": stats["count"], "p50_seconds": stats["p50_seconds"],
+                       "p95_seconds": stats["p95_seconds"], "total_seconds": stats["total_seconds"]}
+                for name, stats in snapshot["spans"].items()
+            },
+        }
+
+
+class MetricsFlusher:
+    """Writes the registry to JSON and/or a Prometheus textfile every interval seconds."""
+
+    def __init__(self, metrics: Metrics, json_path: Optional[str] = None,
+                 prometheus_path: Optional[str] = None, interval: float = 15.0):
+        self.metrics = metrics
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.metrics.write(self.json_path, self.prometheus_path)
+
+    def start(self) -> "MetricsFlusher":
+        if self.json_path or self.prometheus_path:
+            self._thread.start()
+        return self
+
+    def stop(self, extra: Optional[dict] = None) -> None:
+        """Stop flushing and write the final state."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.metrics.write(self.json_path, self.prometheus_path, extra=extra)
+
+
+# Process-wide registry the pipeline modules record into
+METRICS = Metrics()
@@ -0,0 +1,36 @@
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+
+def to_python(value):
+    """Convert numpy scalars to Python and NaN to None, so sqlite3 and strict JSON can store them."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+@contextmanager
+def atomic_path(path: str, suffix: str = ""):
+    """Yield a temporary path to write path's new content to; it replaces path once the block succeeds.
+
+    Readers, including other processes, never see a half-written file. suffix is appended
+    to the temporary name for writers that add an extension of their own (np.savez).
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}{suffix}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_text_atomic(path: str, text: str) -> None:
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w") as f:
+            f.write(text)
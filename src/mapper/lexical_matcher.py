@@ -0,0 +1,104 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Common price-list abbreviations expanded before matching
+ABBREVIATIONS = {
+    "AMP": "AMPOULE",
+    "BIL": "BILATERAL",
+    "CAP": "CAPSULE",
+    "CAPS": "CAPSULE",
+    "INJ": "INJECTION",
+    "LT": "LEFT",
+    "RT": "RIGHT",
+    "SOL": "SOLUTION",
+    "SOLN": "SOLUTION",
+    "SUSP": "SUSPENSION",
+    "SYR": "SYRUP",
+    "TAB": "TABLET",
+    "TABS": "TABLET",
+    "XRAY": "X RAY",
+}
+_ABBREVIATION_PATTERN = r"\b(" + "|".join(map(re.escape, ABBREVIATIONS)) + r")\b"
+
+
+def normalize_for_matching(series: pd.Series) -> pd.Series:
+    """Canonical form ignoring case, punctuation, spacing, common abbreviations and word order."""
+    text = (
+        series.fillna("").astype(str).str.upper()
+        .str.replace(r"\bW/O\b", " WITHOUT ", regex=True)
+        .str.replace(r"\bW/", " WITH ", regex=True)
+        .str.replace("&", " AND ", regex=False)
+        .str.replace(r"[^A-Z0-9]+", " ", regex=True)
+        .str.replace(_ABBREVIATION_PATTERN, lambda m: ABBREVIATIONS[m.group(1)], regex=True)
+    )
+    return text.str.split().map(lambda tokens: " ".join(sorted(tokens)))
+
+
+def numeric_signature(normalized: pd.Series) -> pd.Series:
+    """The numbers in each normalized description (doses, sizes, counts), sorted, as one string."""
+    return normalized.str.findall(r"\d+").map(lambda numbers: " ".join(sorted(str(int(n)) for n in numbers)))
+
+
+class LexicalMatcher:
+    """Character n-gram TF-IDF index over SBS short and long descriptions.
+
+    Scores are cosine similarities of normalized descriptions; pairs at or above
+    the threshold are treated as near-exact matches. Character n-grams barely notice
+    a changed number (500MG vs 5000MG), so only descriptions with the same numbers
+    are compared at all.
+    """
+
+    def __init__(self, threshold: float = 0.9, ngram_range=(3, 4), chunk_size: int = 500):
+        self.threshold = threshold
+        self.ngram_range = ngram_range
+        self.chunk_size = chunk_size
+        self.vectorizer = None
+        self.sbs_rows = None
+        self.sbs_matrix = None
+        self.signatures = None
+        self.sbs_signatures = None
+
+    def fit(self, sbs: pd.DataFrame) -> "LexicalMatcher":
+        """Index every distinct normalized short/long description, remembering its SBS row label."""
+        candidates = pd.concat([
+            pd.DataFrame({"sbs_row": sbs.index, "text": normalize_for_matching(sbs[col])})
+            for col in ["Short Description", "Long Description"]
+        ])
+        candidates = candidates[candidates["text"] != ""].drop_duplicates("text")
+
+        # Imported here: scikit-learn is slow to import and only needed once matching starts
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        self.vectorizer = TfidfVectorizer(
+            analyzer="char_wb", ngram_range=self.ngram_range, sublinear_tf=True, dtype=np.float32
+        )
+        self.sbs_matrix = self.vectorizer.fit_transform(candidates["text"]).T.tocsr()
+        self.sbs_rows = candidates["sbs_row"].to_numpy()
+        self.sbs_signatures, self.signatures = pd.factorize(numeric_signature(candidates["text"]))
+        return self
+
+    def best_matches(self, descriptions: pd.Series) -> pd.DataFrame:
+        """Return the best SBS row label and cosine score for every description.
+
+        Only SBS descriptions with exactly the description's numbers are candidates; a
+        description no SBS entry shares its numbers with scores 0.
+        """
+        if self.vectorizer is None:
+            raise ValueError("Fit the matcher on SBS data first using fit().")
+
+        normalized = normalize_for_matching(descriptions)
+        query_matrix = self.vectorizer.transform(normalized)
+        # -1 for number combinations no SBS description has, matching no candidate
+        query_signatures = self.signatures.get_indexer(numeric_signature(normalized))
+        best_idx = np.zeros(query_matrix.shape[0], dtype=np.int64)
+        best_score = np.zeros(query_matrix.shape[0], dtype=np.float32)
+        for start in range(0, query_matrix.shape[0], self.chunk_size):
+            sims = (query_matrix[start:start + self.chunk_size] @ self.sbs_matrix).toarray()
+            sims[query_signatures[start:start + len(sims), None] != self.sbs_signatures[None, :]] = 0
+            best_idx[start:start + len(sims)] = sims.argmax(axis=1)
+            best_score[start:start + len(sims)] = sims.max(axis=1)
+
+        return pd.DataFrame(
+            {"sbs_row": self.sbs_rows[best_idx], "LEXICAL_SCORE": best_score},
+            index=descriptions.index
+        )
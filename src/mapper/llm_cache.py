@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of LLM completions keyed on the full request.
+
+    Entries older than max_age_seconds are dropped, and the least recently used
+    entries are evicted once max_entries or max_bytes is exceeded.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "llm_cache.sqlite",
+        max_entries: Optional[int] = 500_000,
+        max_bytes: Optional[int] = 1_000_000_000,
+        max_age_seconds: Optional[float] = 90 * 24 * 3600,
+        evict_every: int = 1000
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " model TEXT,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_accessed ON responses (last_accessed)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(system_message: str, prompt: str, model: str, temperature: float, top_p: float, **params) -> str:
+        """Hash everything that can change the completion."""
+        payload = {
+            "system": system_message,
+            "prompt": prompt,
+            "model": model,
+            "temperature": temperature,
+            "top_p": top_p,
+            **params
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age_seconds is not None and now - row[1] > self.max_age_seconds):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, model: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, model, size, created_at, last_accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, model, len(response.encode("utf-8")), now, now)
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            due = self._puts_since_evict >= self.evict_every
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Apply the age, entry-count and size limits. Returns the number of evicted entries."""
+        with self._lock:
+            self._puts_since_evict = 0
+            evicted = 0
+            if self.max_age_seconds is not None:
+                evicted += self._conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+                ).rowcount
+            if self.max_entries is not None:
+                evicted += self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+            if self.max_bytes is not None:
+                # Keep the most recently used entries whose cumulative size fits the budget
+                evicted += self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM ("
+                    "  SELECT key, SUM(size) OVER (ORDER BY last_accessed DESC) AS running_size"
+                    "  FROM responses)"
+                    " WHERE running_size > ?)",
+                    (self.max_bytes,)
+                ).rowcount
+            self._conn.commit()
+            return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
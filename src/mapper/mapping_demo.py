@@ -1,10 +1,14 @@
 import streamlit as st 
 import pandas as pd
-import os
+import threading
+from excel_cache import read_excel_cached
+from feedback_store import DebouncedCsvExport, FeedbackStore
+from mapping_index import MappingIndex
 
 # ---- File paths ---- #
 DATA_ORIGINAL = "D:/CodingSystem/notebooks/full_mappings.xlsx"
 DATA_VALIDATED = "D:/CodingSystem/assets/validated_mappings.csv"
+DATA_FEEDBACK_DB = "D:/CodingSystem/assets/validated_mappings.sqlite"
 
 # ---- Expected columns for the validation sheet ---- #
 VALIDATION_COLUMNS = [
@@ -28,14 +32,24 @@ VALIDATION_COLUMNS = [
     "Validated By"
 ]
 
-# ---- Cache only the original Excel data ---- #
+# ---- Cache only the original Excel data (Parquet sidecar makes reloads cheap) ---- #
 @st.cache_data
 def load_original_data():
-    return pd.read_excel(DATA_ORIGINAL)
+    return read_excel_cached(DATA_ORIGINAL, columns=VALIDATION_COLUMNS)
+
+# ---- Feedback store (imports validated_mappings.csv the first time) ---- #
+@st.cache_resource
+def get_feedback_store():
+    return FeedbackStore(DATA_FEEDBACK_DB, VALIDATION_COLUMNS, legacy_csv=DATA_VALIDATED)
+
+# ---- Keeps validated_mappings.csv in step with the store for the tools that read it ---- #
+@st.cache_resource
+def get_csv_export():
+    return DebouncedCsvExport(get_feedback_store(), DATA_VALIDATED)
 
 def merge_validated_data(df_original):
-    if os.path.exists(DATA_VALIDATED):
-        df_validated = pd.read_csv(DATA_VALIDATED)
+    df_validated = get_feedback_store().load_frame()
+    if not df_validated.empty:
 
         merge_cols = [
             'INSURANCE_COMPANY', 'SERVICE_CODE',
@@ -66,16 +80,42 @@ def merge_validated_data(df_original):
         return df_original
 
 
+# ---- In-memory view shared by all sessions; saved feedback patches only its own rows ---- #
+@st.cache_resource
+def load_view():
+    view = merge_validated_data(load_original_data()).copy()
+    for col in VALIDATION_COLUMNS:
+        # object dtype so text feedback can be written into all-NaN columns in place
+        view[col] = view[col].astype(object) if col in view.columns else None
+    return view, threading.Lock()
+
+# ---- Lookup index over the view: per-company partitions and sorted select box options ---- #
+@st.cache_resource
+def load_index():
+    view, _ = load_view()
+    return MappingIndex(view)
+
+def apply_feedback_to_view(view, index, updated_row):
+    rows = index.company(updated_row['INSURANCE_COMPANY']).lookup(code=updated_row['SERVICE_CODE'])
+    for col in ['Validation (Correct / In Correct)', 'Correct SBS Code',
+                'Correct SBS Short / Long Description', 'Validated By']:
+        view.iloc[rows, view.columns.get_loc(col)] = updated_row[col]
+
+
 # ---- Load data ---- #
-df_original = load_original_data()
-df = merge_validated_data(df_original)
+df, view_lock = load_view()
+index = load_index()
 
 st.title("AHJ Service Mapper 🚀")
 
 # ---- Sidebar filters ---- #
 st.sidebar.header("🔎 Filter Options")
 
-insurance_companies = df['INSURANCE_COMPANY'].unique()
+if st.sidebar.button("📤 Export Validated CSV"):
+    get_csv_export().flush()
+    st.sidebar.success(f"Saved to {DATA_VALIDATED}")
+
+insurance_companies = index.companies
 
 # -- Session state for filters -- #
 if 'selected_company' not in st.session_state:
@@ -84,11 +124,11 @@ if 'selected_company' not in st.session_state:
 selected_company = st.sidebar.selectbox(
     "🏢 Select Insurance Company",
     insurance_companies,
-    index=list(insurance_companies).index(st.session_state.selected_company)
+    index=insurance_companies.index(st.session_state.selected_company)
 )
 st.session_state.selected_company = selected_company
 
-company_df = df[df['INSURANCE_COMPANY'] == selected_company]
+company_index = index.company(selected_company)
 
 filter_mode = st.sidebar.radio(
     "🎛️ Filter Mode",
@@ -98,18 +138,14 @@ filter_mode = st.sidebar.radio(
 selected_description, selected_code = None, None
 
 if filter_mode in ["Filter by Description", "Filter by Both"]:
-    service_descriptions = company_df['SERVICE_DESCRIPTION'].unique()
+    service_descriptions = company_index.descriptions
     selected_description = st.sidebar.selectbox("📝 Select Service Description", service_descriptions)
 
 if filter_mode in ["Filter by Service Code", "Filter by Both"]:
-    service_codes = company_df['SERVICE_CODE'].unique()
+    service_codes = company_index.codes
     selected_code = st.sidebar.selectbox("💡 Select Service Code", service_codes)
 
-result_df = company_df
-if selected_description:
-    result_df = result_df[result_df['SERVICE_DESCRIPTION'] == selected_description]
-if selected_code:
-    result_df = result_df[result_df['SERVICE_CODE'] == selected_code]
+result_df = df.iloc[company_index.lookup(selected_description, selected_code)]
 
 st.subheader("📑 Service Details")
 
@@ -199,17 +235,7 @@ if not result_df.empty:
                 'Validated By': user_name
             }
 
-            def save_feedback_csv(updated_row, full_record):
-                if os.path.exists(DATA_VALIDATED):
-                    validated_df = pd.read_csv(DATA_VALIDATED)
-                else:
-                    validated_df = pd.DataFrame(columns=VALIDATION_COLUMNS)
-
-                idx = validated_df[
-                    (validated_df['INSURANCE_COMPANY'] == updated_row['INSURANCE_COMPANY']) &
-                    (validated_df['SERVICE_CODE'] == updated_row['SERVICE_CODE'])
-                ].index
-
+            def save_feedback(updated_row, full_record):
                 new_row = {}
                 for col in VALIDATION_COLUMNS:
                     if col in updated_row:
@@ -219,19 +245,15 @@ if not result_df.empty:
                     else:
                         new_row[col] = ""
 
-                if not idx.empty:
-                    for col in VALIDATION_COLUMNS:
-                        validated_df.loc[idx, col] = new_row[col]
-                else:
-                    validated_df = pd.concat([validated_df, pd.DataFrame([new_row])], ignore_index=True)
-
-                validated_df.to_csv(DATA_VALIDATED, index=False)
+                get_feedback_store().upsert(new_row)
+                get_csv_export().schedule()
+                with view_lock:
+                    apply_feedback_to_view(df, index, updated_row)
 
-            save_feedback_csv(updated_row, record)
+            save_feedback(updated_row, record)
 
             # ✅ Flag for next render to show message
             st.session_state.feedback_saved = True
-            st.cache_data.clear()
             st.rerun()
 
 else:
@@ -0,0 +1,63 @@
+from numbers import Number
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+def _option_sort_key(value):
+    """Sort numbers numerically and everything else as text, numbers first."""
+    if isinstance(value, Number) and not isinstance(value, bool):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+class CompanyIndex:
+    """Row positions of one insurance company's services, by description and by code."""
+
+    def __init__(self, rows: np.ndarray, by_description: Dict, by_code: Dict):
+        self.rows = rows
+        self.by_description = by_description
+        self.by_code = by_code
+        self.descriptions = sorted(by_description, key=_option_sort_key)
+        self.codes = sorted(by_code, key=_option_sort_key)
+
+    def lookup(self, description=None, code=None) -> np.ndarray:
+        """Positional rows matching the selected description and/or code."""
+        empty = np.empty(0, dtype=np.int64)
+        if description is None and code is None:
+            return self.rows
+        if code is None:
+            return self.by_description.get(description, empty)
+        if description is None:
+            return self.by_code.get(code, empty)
+        return np.intersect1d(
+            self.by_description.get(description, empty), self.by_code.get(code, empty)
+        )
+
+
+class MappingIndex:
+    """Per-company partitions and hash maps over the mappings view, built in one pass.
+
+    Positions refer to df.iloc, so the index stays valid while rows are only edited in place.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        by_company = df.groupby('INSURANCE_COMPANY', sort=False).indices
+        by_description = df.groupby(['INSURANCE_COMPANY', 'SERVICE_DESCRIPTION'], sort=False).indices
+        by_code = df.groupby(['INSURANCE_COMPANY', 'SERVICE_CODE'], sort=False).indices
+
+        descriptions: Dict = {company: {} for company in by_company}
+        for (company, description), rows in by_description.items():
+            descriptions[company][description] = rows
+        codes: Dict = {company: {} for company in by_company}
+        for (company, code), rows in by_code.items():
+            codes[company][code] = rows
+
+        self.companies: List = sorted(by_company, key=_option_sort_key)
+        self._companies = {
+            company: CompanyIndex(rows, descriptions[company], codes[company])
+            for company, rows in by_company.items()
+        }
+
+    def company(self, company) -> Optional[CompanyIndex]:
+        return self._companies.get(company)
@@ -0,0 +1,323 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+import pandas as pd
+from instrumentation import METRICS
+from io_utils import to_python
+
+# Heavy modules (LangChain, FAISS, the embedding model, the OpenAI client) load in
+# MappingService.load, so importing this module stays cheap.
+REQUEST_COLUMNS = ['SERVICE_CODE', 'SERVICE_DESCRIPTION', 'SERVICE_CLASSIFICATION', 'SERVICE_CATEGORY']
+
+
+class MicroBatcher:
+    """Coalesces concurrent callers' items into single calls of fn.
+
+    A batch goes out once max_batch items are waiting or the oldest request has waited
+    max_wait seconds; fn gets the items of every request in it and returns one result per item.
+    """
+
+    def __init__(self, fn: Callable[[list], list], max_batch: int = 256, max_wait: float = 0.01):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, items: list) -> list:
+        """Results for items, computed in a batch shared with other callers; blocks until ready."""
+        if not items:
+            return []
+        future = Future()
+        self._queue.put((items, future))
+        return future.result()
+
+    def _next_batch(self) -> Optional[List[tuple]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch, size = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # stop after this batch
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            items = [item for request_items, _ in batch for item in request_items]
+            METRICS.inc("retrieval_micro_batches")
+            METRICS.set_gauge("retrieval_micro_batch_size", len(items))
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for request_items, future in batch:
+                future.set_result(results[start:start + len(request_items)])
+                start += len(request_items)
+
+    def stop(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+
+class MappingService:
+    """The mapping pipeline kept resident: index, embedding model and LLM client load once.
+
+    Concurrent requests share batched embedding and retrieval through a MicroBatcher; their
+    LLM calls go through one pool of max_workers, as in a batch run.
+    """
+
+    def __init__(self, mapper, max_batch: int = 256, max_wait: float = 0.01, query_embedding_cache=None):
+        from fireworks_llm import get_fireworks_llm
+
+        self.mapper = mapper
+        self.query_embedding_cache = query_embedding_cache
+        self.llm = get_fireworks_llm(
+            cache_path=mapper.llm_cache_path, base_url=mapper.llm_base_url,
+            max_tokens=mapper.llm_max_tokens, streaming=mapper.llm_stream, rate_limiter=mapper.rate_limiter
+        )
+        self.retrieval = MicroBatcher(mapper.retriever.search, max_batch=max_batch, max_wait=max_wait)
+        self.executor = ThreadPoolExecutor(max_workers=mapper.max_workers)
+
+    @classmethod
+    def load(cls, args) -> "MappingService":
+        """Open the prebuilt index and build the mapper from the command-line options."""
+        from answer_parser import AnswerParser
+        from prompt import prompt_template
+        from service_mapper import ServiceMapper
+        from vector_store import VectorstoreBuilder
+        from verified_lookup import VerifiedLookup
+
+        builder = VectorstoreBuilder(args.embeddings_model, cache_dir=args.index_cache_dir, index_type=args.index_type)
+        cache_key = args.index_key or builder.latest_cache_key()
+        if cache_key is None:
+            raise FileNotFoundError(
+                f"No FAISS index in {args.index_cache_dir}; build one with service_mapper.py --build-index-only."
+            )
+        vectorstore = builder.load_cached_index(cache_key)
+        query_embedding_cache = None
+        if args.query_embedding_cache:
+            from embedding_cache import EmbeddingCache, cache_query_embeddings
+            query_embedding_cache = EmbeddingCache(
+                args.query_embedding_cache, args.embeddings_model, memory_items=args.query_embedding_cache_items
+            )
+            cache_query_embeddings(vectorstore, query_embedding_cache)
+        bm25_index = builder.create_bm25_index(vectorstore, cache_key=cache_key) if args.hybrid_retrieval else None
+        verified_lookup = None
+        if args.verified_lookup:
+            verified_lookup = VerifiedLookup.load(args.verified_lookup, match_context=not args.verified_ignore_context)
+
+        mapper = ServiceMapper(
+            vectorstore=vectorstore,
+            prompt_template=prompt_template,
+            answer_parser=AnswerParser(),
+            max_workers=args.max_workers,
+            requests_per_second=args.requests_per_second,
+            max_retries=args.max_retries,
+            llm_cache_path=args.llm_cache,
+            llm_base_url=args.llm_base_url,
+            llm_max_tokens=args.llm_max_tokens,
+            llm_stream=args.llm_stream,
+            batch_size=args.batch_size,
+            retrieval_k=args.retrieval_k,
+            bm25_index=bm25_index,
+            cascade_min_score=args.cascade_min_score,
+            cascade_min_margin=args.cascade_min_margin,
+            verified_lookup=verified_lookup
+        )
+        return cls(mapper, max_batch=args.micro_batch_size, max_wait=args.micro_batch_wait_ms / 1000,
+                   query_embedding_cache=query_embedding_cache)
+
+    def map_services(self, services: List[dict]) -> List[dict]:
+        """Map services given as dicts of REQUEST_COLUMNS; one result row per service.
+
+        Services whose query fails get a row with Match_Source "error" and the error message.
+        """
+        mapper = self.mapper
+        services_df = pd.DataFrame(services).reindex(columns=REQUEST_COLUMNS)
+        with METRICS.span("serve_plan"):
+            verified, plan = mapper._split_verified(mapper._plan_queries(services_df))
+        with METRICS.span("serve_retrieve"):
+            candidates = self.retrieval.submit([query for query, _ in plan])
+        tasks = [(query, members, found) for (query, members), found in zip(plan, candidates)]
+
+        decisive = [task for task in tasks if mapper._is_decisive(task[2])]
+        to_ask = [task for task in tasks if not mapper._is_decisive(task[2])]
+        units = [to_ask[i:i + mapper.batch_size] for i in range(0, len(to_ask), mapper.batch_size)]
+        futures = [self.executor.submit(mapper._map_unit, self.llm, unit) for unit in units]
+
+        outcomes = (
+            [(task, outcome, "verified") for task, outcome in verified]
+            + [(*mapper._auto_assign(task), "retrieval") for task in decisive]
+            + [(task, outcome, "llm") for future in futures for task, outcome in future.result()]
+        )
+        rows = []
+        for (_, members, found), outcome, source in outcomes:
+            if isinstance(outcome, Exception):
+                rows.extend(
+                    {"Internal_Service_Code": row['SERVICE_CODE'], "Internal_Description": row['SERVICE_DESCRIPTION'],
+                     "Match_Source": "error", "Error": str(outcome)}
+                    for _, row in members.iterrows()
+                )
+                METRICS.inc("services_failed", len(members))
+            else:
+                rows.extend(mapper._result_rows(members, found, outcome, source))
+                METRICS.inc(f"services_{source}", len(members))
+        return [{key: to_python(value) for key, value in row.items()} for row in rows]
+
+    def stop(self) -> None:
+        self.retrieval.stop()
+        self.executor.shutdown(wait=True)
+        if self.query_embedding_cache is not None:
+            self.query_embedding_cache.flush()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 resets bursts of concurrent clients
+
+
+class MappingServer:
+    """HTTP front end for a MappingService.
+
+    POST /map takes one service object or {"services": [...]} and answers {"results": [...]};
+    GET /health reports readiness and the process metrics snapshot.
+    """
+
+    def __init__(self, service: MappingService, host: str = "127.0.0.1", port: int = 8780):
+        self.service = service
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path != "/health":
+                    self._send(404, {"error": f"Unknown path {self.path}"})
+                    return
+                self._send(200, {"status": "ok", "metrics": METRICS.snapshot()})
+
+            def do_POST(self):
+                if self.path != "/map":
+                    self._send(404, {"error": f"Unknown path {self.path}"})
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+                    services = body.get("services", [body]) if isinstance(body, dict) else None
+                    if not services or not all(
+                        isinstance(service, dict) and service.get("SERVICE_DESCRIPTION") for service in services
+                    ):
+                        raise ValueError("Send a service, or {\"services\": [...]}, each with a SERVICE_DESCRIPTION.")
+                except ValueError as e:
+                    self._send(400, {"error": str(e)})
+                    return
+
+                try:
+                    with METRICS.span("serve_request"):
+                        results = server.service.map_services(services)
+                except Exception as e:
+                    self._send(500, {"error": str(e)})
+                    return
+                self._send(200, {"results": results})
+
+            def _send(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MappingServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self.service.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve on-demand AHJ to SBS mappings over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--index-cache-dir", default=r"D:\CodingSystem\assets\faiss_cache")
+    parser.add_argument("--index-key", default=None,
+                        help="Cache key of the index to serve; defaults to the latest one built for the model.")
+    parser.add_argument("--embeddings-model", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--index-type", default="flat", help="Type the served index was built with.")
+    parser.add_argument("--hybrid-retrieval", action="store_true")
+    parser.add_argument("--verified-lookup", default=None)
+    parser.add_argument("--verified-ignore-context", action="store_true")
+    parser.add_argument("--retrieval-k", type=int, default=3)
+    parser.add_argument("--cascade-min-score", type=float, default=None,
+                        help="As in service_mapper.py; calibrated for the same retrieval mode (dense or hybrid).")
+    parser.add_argument("--cascade-min-margin", type=float, default=0.0)
+    parser.add_argument("--max-workers", type=int, default=4, help="Concurrent LLM requests across all clients.")
+    parser.add_argument("--requests-per-second", type=float, default=None)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--llm-cache", default=None)
+    parser.add_argument("--query-embedding-cache", default=None,
+                        help="Folder caching query embeddings across restarts; shared safely with batch runs.")
+    parser.add_argument("--query-embedding-cache-items", type=int, default=10_000)
+    parser.add_argument("--llm-base-url", default=None)
+    parser.add_argument("--llm-max-tokens", type=int, default=None)
+    parser.add_argument("--llm-stream", action="store_true")
+    parser.add_argument("--micro-batch-size", type=int, default=256,
+                        help="Most queries embedded and searched together across concurrent requests.")
+    parser.add_argument("--micro-batch-wait-ms", type=float, default=10.0,
+                        help="How long a request waits for others to share its retrieval batch.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = MappingServer(MappingService.load(args), host=args.host, port=args.port)
+    print(f"🛰️ Mapping server listening on {server.url} (POST /map, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
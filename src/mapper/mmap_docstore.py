@@ -0,0 +1,61 @@
+import json
+import os
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_community.docstore.base import Docstore
+
+DOCS_FILE = "docs.bin"
+OFFSETS_FILE = "docs_offsets.npy"
+IDS_FILE = "docs_ids.json"
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over one file of JSON records, memory-mapped.
+
+    Documents are decoded on lookup instead of living as Python objects, so processes
+    opening the same saved index share its pages through the OS page cache.
+    Row i holds the document at FAISS position i.
+    """
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, IDS_FILE)) as f:
+            self.ids: List[str] = json.load(f)
+        self.rows: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        self.data = np.memmap(os.path.join(index_dir, DOCS_FILE), dtype=np.uint8, mode="r") \
+            if self.offsets[-1] else np.zeros(0, dtype=np.uint8)
+
+    def search(self, search: str) -> Document:
+        row = self.rows.get(search)
+        if row is None:
+            raise KeyError(f"ID {search} not found.")
+        record = json.loads(self.data[self.offsets[row]:self.offsets[row + 1]].tobytes())
+        return Document(id=search, page_content=record["page_content"], metadata=record["metadata"])
+
+    @staticmethod
+    def write(index_dir: str, docstore, index_to_docstore_id: Dict[int, str]) -> None:
+        """Save a docstore's documents in FAISS position order next to the index."""
+        ids = [index_to_docstore_id[i] for i in range(len(index_to_docstore_id))]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        with open(os.path.join(index_dir, DOCS_FILE), "wb") as f:
+            for row, doc_id in enumerate(ids):
+                doc = docstore.search(doc_id)
+                record = json.dumps(
+                    {"page_content": doc.page_content, "metadata": doc.metadata}, default=str
+                ).encode("utf-8")
+                f.write(record)
+                offsets[row + 1] = offsets[row] + len(record)
+        np.save(os.path.join(index_dir, OFFSETS_FILE), offsets)
+        with open(os.path.join(index_dir, IDS_FILE), "w") as f:
+            json.dump(ids, f)
+
+    @classmethod
+    def open(cls, index_dir: str) -> Tuple["MmapDocstore", Dict[int, str]]:
+        """The docstore and the FAISS position -> docstore id mapping saved in index_dir."""
+        docstore = cls(index_dir)
+        return docstore, dict(enumerate(docstore.ids))
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, IDS_FILE))
@@ -34,4 +34,39 @@ Explanation: <one-sentence reason>
 """
 
 # Create the PromptTemplate object
-prompt_template = PromptTemplate.from_template(PROMPT_TEXT)
\ No newline at end of file
+prompt_template = PromptTemplate.from_template(PROMPT_TEXT)
+
+# ---- Batch mode: several services per request, answered per item ID ---- #
+BATCH_ITEM_TEXT = """
+### Item {item_id}
+Internal service details:
+{question}
+
+Possible standard SBS codes:
+{context}
+"""
+
+BATCH_PROMPT_TEXT = """
+You are an expert medical coding analyst.
+
+You are given several internal services, each with its own list of possible standard SBS codes.
+Treat every item independently and only choose among that item's own SBS options.
+
+{items}
+
+Your task, for EACH item:
+1. Carefully compare the internal service’s description, category, and classification with each SBS option’s short and long descriptions, definition, category (Block Name), and classification (Chapter Name).
+2. Identify the single best-matching SBS code that most accurately represents the internal service.
+3. Provide the SBS short description for the selected code.
+4. Write a clear, one-sentence explanation of why this SBS code is the best match, mentioning key matching aspects.
+
+If you are unsure, pick the SBS code that has the closest clinical purpose or wording.
+
+Respond with one block per item, in item order, in this exact format ONLY:
+Item ID: <item id>
+Best SBS Code: <code>
+Best SBS Description: <short description>
+Explanation: <one-sentence reason>
+"""
+
+batch_prompt_template = PromptTemplate.from_template(BATCH_PROMPT_TEXT)
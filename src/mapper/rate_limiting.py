@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+from instrumentation import METRICS
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how many requests are sent per second."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until the requested number of tokens is available."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """Retry on rate limiting (429), server errors (5xx), timeouts and dropped connections."""
+    import openai  # already loaded by whichever client raised exc
+
+    if isinstance(exc, openai.APIConnectionError):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        return False
+    return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Read the server's Retry-After header when the error carries one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    rate_limiter: Optional[TokenBucket] = None
+) -> T:
+    """Call fn, retrying retryable errors with full-jitter exponential backoff."""
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            retry_after = _retry_after_seconds(e)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            attempt += 1
+            METRICS.inc("retries")
+            print(f"⏳ {type(e).__name__}, retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+from typing import List, Set
+import pandas as pd
+from io_utils import atomic_path, to_python
+
+CODE_COLUMN = "Internal_Service_Code"
+
+
+class CsvResultSink:
+    """Writes results and failures straight to CSV, buffering rows between flushes."""
+
+    def __init__(self, results_file: str = "mapping_results.csv",
+                 failures_file: str = "mapping_failures.csv", flush_every: int = 50):
+        self.results_file = results_file
+        self.failures_file = failures_file
+        self.flush_every = flush_every
+        self._buffers = {results_file: [], failures_file: []}
+        self._columns = {}
+
+    def open(self, results_cols: List[str], failures_cols: List[str]) -> None:
+        """Ensure result and failure files exist with headers."""
+        for path, cols in [(self.results_file, results_cols), (self.failures_file, failures_cols)]:
+            if os.path.exists(path):
+                self._drop_partial_line(path)
+                self._columns[path] = self._extend_header(path, cols)
+            else:
+                pd.DataFrame(columns=cols).to_csv(path, index=False)
+                self._columns[path] = cols
+
+    @staticmethod
+    def _drop_partial_line(path: str) -> None:
+        """Cut a trailing half-written row left by a crash mid-append."""
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    @staticmethod
+    def _extend_header(path: str, cols: List[str]) -> List[str]:
+        """Add columns a newer run writes to a file started by an older one; cells are kept verbatim."""
+        existing = pd.read_csv(path, nrows=0).columns.tolist()
+        missing = [col for col in cols if col not in existing]
+        if missing:
+            rows = pd.read_csv(path, dtype=str, keep_default_na=False)
+            rows.reindex(columns=existing + missing, fill_value="").to_csv(path, index=False)
+        return existing + missing
+
+    def done_codes(self) -> Set:
+        if not os.path.exists(self.results_file):
+            return set()
+        return set(pd.read_csv(self.results_file, usecols=[CODE_COLUMN], dtype=str, keep_default_na=False)[CODE_COLUMN].unique())
+
+    def add_result(self, row: dict) -> None:
+        self._add(self.results_file, row)
+
+    def add_failure(self, row: dict) -> None:
+        self._add(self.failures_file, row)
+
+    def _add(self, path: str, row: dict) -> None:
+        self._buffers[path].append(row)
+        if len(self._buffers[path]) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        for path, rows in self._buffers.items():
+            if rows:
+                pd.DataFrame(rows).reindex(columns=self._columns[path]).to_csv(
+                    path, mode='a', header=False, index=False
+                )
+                rows.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class SQLiteResultSink:
+    """Checkpoints results and failures in SQLite (WAL mode) with batched commits.
+
+    Completed codes are looked up through an index instead of re-reading a CSV, and
+    close() exports both tables to the usual CSV layout. Existing result/failure CSVs
+    are imported the first time, so runs started with CsvResultSink can be resumed.
+    """
+
+    def __init__(self, db_path: str = "mapping_checkpoint.sqlite",
+                 results_file: str = "mapping_results.csv",
+                 failures_file: str = "mapping_failures.csv", commit_every: int = 100):
+        self.db_path = db_path
+        self.results_file = results_file
+        self.failures_file = failures_file
+        self.commit_every = commit_every
+        self._pending = 0
+        self._results_cols = []
+        self._failures_cols = []
+
+        is_new = not os.path.exists(db_path)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for table in ["results", "failures"]:
+            # code has no declared type so ints and strings keep their original type
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, code, row TEXT NOT NULL)"
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_code ON results (code)")
+        self._conn.commit()
+
+        if is_new:
+            for table, path in [("results", results_file), ("failures", failures_file)]:
+                if os.path.exists(path):
+                    # Cells verbatim, so codes like '01' are not re-typed on the way in
+                    existing = pd.read_csv(path, dtype=str, keep_default_na=False)
+                    for row in existing.to_dict("records"):
+                        self._insert(table, row)
+                    self._conn.commit()
+                    print(f"📥 Imported {len(existing)} rows from {path} into {db_path}.")
+
+    def open(self, results_cols: List[str], failures_cols: List[str]) -> None:
+        self._results_cols = results_cols
+        self._failures_cols = failures_cols
+
+    def done_codes(self) -> Set:
+        return {code for (code,) in self._conn.execute("SELECT DISTINCT code FROM results")}
+
+    def is_done(self, code) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM results WHERE code = ? LIMIT 1", (to_python(code),)
+        ).fetchone() is not None
+
+    def _insert(self, table: str, row: dict) -> None:
+        row = {key: to_python(value) for key, value in row.items()}
+        code = row.get(CODE_COLUMN, row.get("SERVICE_CODE"))
+        self._conn.execute(
+            f"INSERT INTO {table} (code, row) VALUES (?, ?)", (code, json.dumps(row, default=str))
+        )
+
+    def add_result(self, row: dict) -> None:
+        self._add("results", row)
+
+    def add_failure(self, row: dict) -> None:
+        self._add("failures", row)
+
+    def _add(self, table: str, row: dict) -> None:
+        self._insert(table, row)
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self._conn.commit()
+        self._pending = 0
+
+    def _table_frame(self, table: str, columns: List[str]) -> pd.DataFrame:
+        rows = [json.loads(row) for (row,) in self._conn.execute(f"SELECT row FROM {table} ORDER BY seq")]
+        frame = pd.DataFrame(rows)
+        extra = [col for col in frame.columns if col not in columns]
+        return frame.reindex(columns=columns + extra)
+
+    def export_csv(self) -> None:
+        """Write the results and failures tables in the CSV layout of CsvResultSink."""
+        for table, columns, path in [("results", self._results_cols, self.results_file),
+                                     ("failures", self._failures_cols, self.failures_file)]:
+            with atomic_path(path) as tmp_path:
+                self._table_frame(table, columns).to_csv(tmp_path, index=False)
+
+    def close(self) -> None:
+        self.flush()
+        self.export_csv()
+        self._conn.close()
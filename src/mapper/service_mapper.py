@@ -1,13 +1,24 @@
+import argparse
 import os
+import sys
 import traceback
 import pandas as pd
-from typing import List
-from data_preprocessing import ServiceMatcher
-from document_convertor import DocumentConverter
-from prompt import prompt_template
-from vector_store import VectorstoreBuilder
-from rag_chain_factory import RAGChainFactory
-from answer_parser import AnswerParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from typing import List, Optional, Set, Tuple
+from data_preprocessing import ServiceMatcher, normalize_text
+from answer_parser import FIELDS, AnswerParser
+from rate_limiting import TokenBucket, call_with_retry
+from result_store import CsvResultSink, SQLiteResultSink
+from sharding import merge_shards, run_local_shards, select_shard, shard_path
+from verified_lookup import VerifiedLookup
+from instrumentation import (
+    COMPLETION_PRICE_PER_MILLION, METRICS, PROMPT_PRICE_PER_MILLION, MetricsFlusher
+)
+
+# LangChain, FAISS and the OpenAI client are imported where first needed, so importing this
+# module (the CLI's --help, the mapping server, offline tools) stays fast.
+QUERY_COLUMNS = ['SERVICE_DESCRIPTION', 'SERVICE_CLASSIFICATION', 'SERVICE_CATEGORY']
 
 class ServiceMapper:
     def __init__(
@@ -16,119 +27,583 @@ class ServiceMapper:
         prompt_template,
         answer_parser: AnswerParser,
         results_file: str = "mapping_results.csv",
-        failures_file: str = "mapping_failures.csv"
+        failures_file: str = "mapping_failures.csv",
+        max_workers: int = 1,
+        requests_per_second: Optional[float] = None,
+        max_retries: int = 5,
+        llm_cache_path: Optional[str] = None,
+        llm_base_url: Optional[str] = None,
+        llm_max_tokens: Optional[int] = None,
+        llm_stream: bool = False,
+        dedupe_queries: bool = True,
+        result_sink=None,
+        batch_size: int = 1,
+        retrieval_k: int = 3,
+        retrieval_batch_size: int = 1024,
+        retrieval_file: Optional[str] = None,
+        bm25_index=None,
+        cascade_min_score: Optional[float] = None,
+        cascade_min_margin: float = 0.0,
+        verified_lookup: Optional[VerifiedLookup] = None,
+        prompt_price_per_million: float = PROMPT_PRICE_PER_MILLION,
+        completion_price_per_million: float = COMPLETION_PRICE_PER_MILLION
     ):
         self.vectorstore = vectorstore
         self.prompt_template = prompt_template
         self.answer_parser = answer_parser
         self.results_file = results_file
         self.failures_file = failures_file
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self.max_retries = max_retries
+        self.llm_cache_path = llm_cache_path
+        self.llm_base_url = llm_base_url
+        self.llm_max_tokens = llm_max_tokens
+        self.llm_stream = llm_stream
+        self.dedupe_queries = dedupe_queries
+        self.result_sink = result_sink or CsvResultSink(results_file, failures_file)
+        self.batch_size = batch_size
+        from batch_retriever import BatchRetriever
+        self.retriever = BatchRetriever(vectorstore, k=retrieval_k, bm25_index=bm25_index)
+        self.retrieval_batch_size = retrieval_batch_size
+        self.retrieval_file = retrieval_file
+        self.cascade_min_score = cascade_min_score
+        self.cascade_min_margin = cascade_min_margin
+        self.verified_lookup = verified_lookup
+        self.prompt_price_per_million = prompt_price_per_million
+        self.completion_price_per_million = completion_price_per_million
+        self.run_summary = None
 
-    def _load_done_codes(self) -> List[str]:
-        """Load already processed service codes from results file."""
-        if os.path.exists(self.results_file):
-            done_codes = pd.read_csv(self.results_file)["Internal_Service_Code"].unique().tolist()
+    def _load_done_codes(self) -> Set:
+        """Load already processed service codes from the result sink."""
+        done_codes = self.result_sink.done_codes()
+        if done_codes:
             print(f"🔄 Found {len(done_codes)} completed rows. Skipping them.")
-            return done_codes
-        else:
+        return done_codes
+
+    def _plan_queries(self, services_df: pd.DataFrame) -> List[tuple]:
+        """Group services into (query, member rows) pairs, one LLM call per distinct query.
+
+        With dedupe_queries, services whose normalized description, classification and
+        category match share one query; the internal service code is left out of it.
+        """
+        if services_df.empty:
             return []
+        if not self.dedupe_queries:
+            return [
+                (
+                    f"Service Code: {row['SERVICE_CODE']}\n"
+                    f"Description: {row['SERVICE_DESCRIPTION']}\n"
+                    f"Classification: {row['SERVICE_CLASSIFICATION']}\n"
+                    f"Category: {row['SERVICE_CATEGORY']}",
+                    services_df.loc[[label]]
+                )
+                for label, row in services_df.iterrows()
+            ]
+
+        query_key = pd.concat(
+            [normalize_text(services_df[col]) for col in QUERY_COLUMNS], axis=1
+        ).agg("\x1f".join, axis=1)
+
+        plan = []
+        for _, members in services_df.groupby(query_key, sort=False):
+            first = members.iloc[0]
+            query = (
+                f"Description: {first['SERVICE_DESCRIPTION']}\n"
+                f"Classification: {first['SERVICE_CLASSIFICATION']}\n"
+                f"Category: {first['SERVICE_CATEGORY']}"
+            )
+            plan.append((query, members))
+        return plan
+
+    @staticmethod
+    def _context(candidates) -> str:
+        """Join candidate documents the way RetrievalQA's stuff chain does."""
+        return "\n\n".join(doc.page_content for doc, _ in candidates)
+
+    def _map_query(self, llm, query: str, candidates):
+        """Ask the LLM to pick among precomputed candidates, retrying rate limits and server errors."""
+        prompt = self.prompt_template.format(question=query, context=self._context(candidates))
+        answer = call_with_retry(lambda: llm.invoke(prompt), max_retries=self.max_retries)
+        with METRICS.span("parse"):
+            parsed = self.answer_parser.parse_llm_answer(answer)
+        missing = [field for field, index in FIELDS.items() if not parsed[index]]
+        if missing:
+            # Recorded as a failure, so --resume asks again instead of keeping a partial answer
+            raise ValueError(f"LLM answer has no {', '.join(missing)}: {answer!r}")
+        return parsed
+
+    def _map_batch(self, llm, batch: List[tuple]) -> List[tuple]:
+        """Map several planned queries with one LLM request, each item with its own SBS candidates.
+
+        Items the batch answer does not cover (or a failed batch request) are retried singly.
+        """
+        from prompt import BATCH_ITEM_TEXT, batch_prompt_template
+
+        item_ids = [str(i) for i in range(1, len(batch) + 1)]
+        parsed = {}
+        try:
+            items = "\n".join(
+                BATCH_ITEM_TEXT.format(item_id=item_id, question=query, context=self._context(candidates))
+                for item_id, (query, _, candidates) in zip(item_ids, batch)
+            )
+            prompt = batch_prompt_template.format(items=items)
+            answer = call_with_retry(lambda: llm.invoke(prompt, item_ids=item_ids), max_retries=self.max_retries)
+            with METRICS.span("parse"):
+                parsed = self.answer_parser.parse_batch_answer(answer, item_ids)
+        except Exception as e:
+            print(f"⚠️ Batch request failed ({e}); retrying its {len(batch)} items singly.")
 
-    def _init_output_files(self, results_cols: List[str], failures_cols: List[str]) -> None:
-        """Ensure result and failure files exist with headers."""
-        if not os.path.exists(self.results_file):
-            pd.DataFrame(columns=results_cols).to_csv(self.results_file, index=False)
-        if not os.path.exists(self.failures_file):
-            pd.DataFrame(columns=failures_cols).to_csv(self.failures_file, index=False)
+        outcomes = []
+        for item_id, task in zip(item_ids, batch):
+            if item_id in parsed:
+                outcomes.append((task, parsed[item_id]))
+            else:
+                outcomes.extend(self._map_unit(llm, [task]))
+        return outcomes
 
-    def _append_to_csv(self, file_path: str, row_data: dict) -> None:
-        """Append a single row to a CSV file."""
-        pd.DataFrame([row_data]).to_csv(file_path, mode='a', header=False, index=False)
+    def _map_unit(self, llm, unit: List[tuple]) -> List[tuple]:
+        """Map one unit of work, returning (task, parsed answer or the exception raised) per query."""
+        if len(unit) > 1:
+            return self._map_batch(llm, unit)
+        query, _, candidates = unit[0]
+        try:
+            return [(unit[0], self._map_query(llm, query, candidates))]
+        except Exception as e:
+            return [(unit[0], e)]
+
+    def _split_verified(self, plan: List[tuple]) -> Tuple[List[tuple], List[tuple]]:
+        """Answer queries the verified lookup knows; returns (outcomes, the rest of the plan)."""
+        if self.verified_lookup is None or not plan:
+            return [], plan
+        firsts = pd.concat([members.iloc[[0]] for _, members in plan])
+        found = self.verified_lookup.lookup(firsts)
+
+        verified, rest = [], []
+        for (query, members), (_, entry) in zip(plan, found.iterrows()):
+            if pd.isna(entry['SBS Code (Hyphenated)']):
+                rest.append((query, members))
+                continue
+            explanation = f"Verified mapping from {entry['Source']}; retrieval and LLM skipped."
+            verified.append((
+                (query, members, []),
+                (entry['SBS Code (Hyphenated)'], entry['SHORT_DESCRIPTION'], explanation)
+            ))
+        return verified, rest
+
+    def _retrieve(self, plan: List[tuple]) -> List[tuple]:
+        """Retrieval pre-pass: top-k SBS candidates for every planned query in batched searches.
+
+        Returns (query, members, candidates) tasks and, if retrieval_file is set, saves the
+        candidates and their scores there for inspection.
+        """
+        queries = [query for query, _ in plan]
+        candidates = []
+        for start in range(0, len(queries), self.retrieval_batch_size):
+            with METRICS.span("retrieve"):
+                candidates.extend(self.retriever.search(queries[start:start + self.retrieval_batch_size]))
+            print(f"🔎 Retrieved candidates for {len(candidates)}/{len(queries)} queries...")
+
+        if self.retrieval_file:
+            self.retriever.to_frame(queries, candidates).to_csv(self.retrieval_file, index=False)
+        return [(query, members, found) for (query, members), found in zip(plan, candidates)]
+
+    @staticmethod
+    def _retrieval_signals(candidates) -> Tuple[Optional[str], float, float]:
+        """Top candidate's SBS code, its retrieval score and its lead over the runner-up."""
+        from vector_store import CODE_FIELD
+
+        if not candidates:
+            return None, float("nan"), float("nan")
+        top_doc, top_score = candidates[0]
+        margin = top_score - candidates[1][1] if len(candidates) > 1 else float("nan")
+        return top_doc.metadata.get(CODE_FIELD), top_score, margin
+
+    def _is_decisive(self, candidates) -> bool:
+        """Whether the cascade may take the top candidate without asking the LLM."""
+        if self.cascade_min_score is None or not candidates:
+            return False
+        _, score, margin = self._retrieval_signals(candidates)
+        if score < self.cascade_min_score:
+            return False
+        # A lone candidate has no runner-up, so only a margin-free cascade accepts it
+        return self.cascade_min_margin <= 0 or margin >= self.cascade_min_margin
+
+    def _auto_assign(self, task: tuple) -> tuple:
+        """Answer a decisive query with its top retrieval candidate."""
+        top_code, score, margin = self._retrieval_signals(task[2])
+        top_doc, _ = task[2][0]
+        explanation = f"Auto-assigned from retrieval (score {score:.4f}, margin {margin:.4f}); LLM skipped."
+        return task, (top_code, top_doc.metadata.get("Short Description"), explanation)
+
+    def _result_rows(self, members: pd.DataFrame, candidates, outcome: tuple, source: str) -> List[dict]:
+        """One result row per service code sharing a query's answer."""
+        best_code, best_desc, explanation = outcome
+        top_code, score, margin = self._retrieval_signals(candidates)
+        return [
+            {
+                "Internal_Service_Code": row['SERVICE_CODE'],
+                "Internal_Description": row['SERVICE_DESCRIPTION'],
+                "Matched_SBS_Code": best_code,
+                "Matched_SBS_Short_Description": best_desc,
+                "LLM_Explanation": explanation,
+                "Match_Source": source,
+                "Retrieval_Top_Code": top_code,
+                "Retrieval_Score": score,
+                "Retrieval_Margin": margin
+            }
+            for _, row in members.iterrows()
+        ]
+
+    @staticmethod
+    def _completed_outcomes(futures):
+        """Outcomes of finished units, tracking how many units are still queued or in flight."""
+        pending = len(futures)
+        METRICS.set_gauge("llm_queue_depth", pending)
+        for future in as_completed(futures):
+            pending -= 1
+            METRICS.set_gauge("llm_queue_depth", pending)
+            yield from future.result()
+
+    def _summarize(self, n_services: int) -> None:
+        """Keep the end-of-run metrics summary in run_summary and print its headline numbers."""
+        self.run_summary = METRICS.summary(
+            n_services, self.prompt_price_per_million, self.completion_price_per_million
+        )
+        summary = self.run_summary
+        print(f"📈 {summary['llm_requests']:.0f} LLM requests, {summary['retries']:.0f} retries, "
+              f"{summary['tokens_per_service']:.0f} tokens/service, ~${summary['estimated_cost_usd']:.2f}")
+        for name, stats in summary["spans"].items():
+            print(f"   {name}: p50 {stats['p50_seconds'] * 1000:.0f} ms, p95 {stats['p95_seconds'] * 1000:.0f} ms, "
+                  f"total {stats['total_seconds']:.1f}s over {stats['count']}")
 
     def map_service_codes(self, ahj_services_df: pd.DataFrame) -> None:
-        """Map AHJ service codes to SBS codes using RAG."""
-        rag_chain = RAGChainFactory(self.vectorstore, self.prompt_template).create_rag_chain()
+        """Map AHJ service codes to SBS codes using RAG.
+
+        Candidates for all pending queries are retrieved up front; then up to max_workers
+        LLM requests are in flight at once, while all file writes stay on the calling thread.
+        With batch_size > 1 each request carries that many queries. Each query's answer is
+        written for every service code that shares it.
+
+        Queries whose service text a reviewer already verified (verified_lookup) take the
+        verified code before any retrieval. With cascade_min_score set, queries whose top
+        candidate scores at least that much and leads the runner-up by cascade_min_margin
+        are assigned it without an LLM call.
+        Every row records its Match_Source and the retrieval score and margin.
+        """
+        from fireworks_llm import get_fireworks_llm
+
+        llm = get_fireworks_llm(
+            cache_path=self.llm_cache_path, base_url=self.llm_base_url,
+            max_tokens=self.llm_max_tokens, streaming=self.llm_stream, rate_limiter=self.rate_limiter
+        )
 
         results_cols = [
             "Internal_Service_Code",
             "Internal_Description",
             "Matched_SBS_Code",
             "Matched_SBS_Short_Description",
-            "LLM_Explanation"
+            "LLM_Explanation",
+            "Match_Source",
+            "Retrieval_Top_Code",
+            "Retrieval_Score",
+            "Retrieval_Margin"
         ]
         failures_cols = ahj_services_df.columns.tolist() + ["Error", "Traceback"]
 
+        self.result_sink.open(results_cols, failures_cols)
         done_codes = self._load_done_codes()
-        self._init_output_files(results_cols, failures_cols)
 
-        to_process = ahj_services_df[~ahj_services_df["SERVICE_CODE"].isin(done_codes)]
-        print(f"🚀 Processing {len(to_process)} rows...")
+        # Compare as text: a CSV round trip turns codes in a mixed int/str column into strings
+        to_process = ahj_services_df[
+            ~ahj_services_df["SERVICE_CODE"].astype(str).isin({str(code) for code in done_codes})
+        ]
+        plan = self._plan_queries(to_process)
+        print(f"🚀 Processing {len(to_process)} rows as {len(plan)} queries "
+              f"with {self.max_workers} worker(s)...")
 
-        for idx, (_, row) in enumerate(to_process.iterrows(), start=1):
-            query = (
-                f"Service Code: {row['SERVICE_CODE']}\n"
-                f"Description: {row['SERVICE_DESCRIPTION']}\n"
-                f"Classification: {row['SERVICE_CLASSIFICATION']}\n"
-                f"Category: {row['SERVICE_CATEGORY']}"
-            )
-            try:
-                response = rag_chain({"query": query})
-                answer = response['result']
-                best_code, best_desc, explanation = self.answer_parser.parse_llm_answer(answer)
+        verified, plan_to_retrieve = self._split_verified(plan)
+        if self.verified_lookup is not None:
+            print(f"🔖 Verified lookup: {len(verified)} queries resolved from reviewer feedback.")
+
+        tasks = self._retrieve(plan_to_retrieve)
+        decisive = [task for task in tasks if self._is_decisive(task[2])]
+        to_ask = [task for task in tasks if not self._is_decisive(task[2])]
+        if self.cascade_min_score is not None:
+            print(f"⚡ Cascade: {len(decisive)} queries auto-assigned from retrieval, "
+                  f"{len(to_ask)} sent to the LLM.")
+        units = [to_ask[i:i + self.batch_size] for i in range(0, len(to_ask), self.batch_size)]
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(self._map_unit, llm, unit) for unit in units]
+            outcomes = chain(verified, map(self._auto_assign, decisive), self._completed_outcomes(futures))
+            for idx, ((_, members, candidates), outcome) in enumerate(outcomes, start=1):
+                try:
+                    if isinstance(outcome, Exception):
+                        raise outcome
+                    # Verified and auto-assigned outcomes come first in the chain
+                    if idx <= len(verified):
+                        source = "verified"
+                    elif idx <= len(verified) + len(decisive):
+                        source = "retrieval"
+                    else:
+                        source = "llm"
 
-                self._append_to_csv(self.results_file, {
-                    "Internal_Service_Code": row['SERVICE_CODE'],
-                    "Internal_Description": row['SERVICE_DESCRIPTION'],
-                    "Matched_SBS_Code": best_code,
-                    "Matched_SBS_Short_Description": best_desc,
-                    "LLM_Explanation": explanation
-                })
+                    with METRICS.span("write"):
+                        for result in self._result_rows(members, candidates, outcome, source):
+                            self.result_sink.add_result(result)
+                    METRICS.inc(f"services_{source}", len(members))
 
-                print(f"✅ Row {idx}/{len(to_process)} — {row['SERVICE_CODE']} mapped.")
+                    print(f"✅ Query {idx}/{len(plan)} — {', '.join(map(str, members['SERVICE_CODE']))} mapped.")
 
-            except Exception as e:
-                tb = traceback.format_exc()
-                print(f"❌ Error at row {idx}/{len(to_process)}: {e}")
+                except Exception as e:
+                    tb = "".join(traceback.format_exception(e))
+                    print(f"❌ Error at query {idx}/{len(plan)}: {e}")
 
-                failed_row = row.to_dict()
-                failed_row["Error"] = str(e)
-                failed_row["Traceback"] = tb
+                    for _, row in members.iterrows():
+                        failed_row = row.to_dict()
+                        failed_row["Error"] = str(e)
+                        failed_row["Traceback"] = tb
 
-                self._append_to_csv(self.failures_file, failed_row)
+                        self.result_sink.add_failure(failed_row)
+                    METRICS.inc("services_failed", len(members))
+        finally:
+            # On Ctrl+C drop queued services; everything already written is kept for resume
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.result_sink.close()
 
+        if llm.response_cache is not None:
+            print(f"🗄️ LLM cache: {llm.response_cache.stats()}")
+        self._summarize(len(to_process))
         print(f"🎉 Done! Results in {self.results_file}, failures in {self.failures_file}")
 
-# === STEP 1: Load and prepare AHJ & SBS data ===
-matcher = ServiceMatcher(
-    ahj_path=r"D:\CodingSystem\assets\AHJ_PriceList.xlsx",
-    sbs_path=r"D:\CodingSystem\assets\SBS_Services.xlsx"
-)
 
-ahj_df, sbs_df = matcher.load_data()
-ahj_df = matcher.preprocess_ahj()
-exact_matches = matcher.match_services()
-unique_ahj_services = matcher.find_unique_ahj_services(exact_matches)
-
-print(f"Matched services: {exact_matches.shape}")
-print(f"Unique AHJ services: {unique_ahj_services.shape}")
-
-# === STEP 2: Convert SBS services to documents ===
-# You can combine Short & Long descriptions if needed for better retrieval
-sbs_docs = DocumentConverter().convert_sbs_to_docs(sbs_df)
-
-# === STEP 3: Build Vectorstore ===
-vectorstore_builder = VectorstoreBuilder("BAAI/bge-small-en-v1.5")
-vectorstore = vectorstore_builder.create_faiss_index(sbs_docs)
-
-# === STEP 4: Initialize ServiceMapper ===
-mapper = ServiceMapper(
-    vectorstore=vectorstore,
-    prompt_template=prompt_template,
-    answer_parser=AnswerParser(),  # ✅ Instantiate here
-    results_file="mapping_results.csv",
-    failures_file="mapping_failures.csv"
-)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Map AHJ services to SBS codes.")
+    parser.add_argument("--ahj-path", default=r"D:\CodingSystem\assets\AHJ_PriceList.xlsx")
+    parser.add_argument("--sbs-path", default=r"D:\CodingSystem\assets\SBS_Services.xlsx")
+    parser.add_argument("--index-cache-dir", default=r"D:\CodingSystem\assets\faiss_cache")
+    parser.add_argument("--lexical-threshold", type=float, default=0.9,
+                        help="Minimum character n-gram cosine score to auto-match a description without the LLM.")
+    parser.add_argument("--lexical-matches-file", default="lexical_matches.csv")
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--embed-multi-process", action="store_true",
+                        help="Embed the SBS catalog with one worker process per CPU core.")
+    parser.add_argument("--index-type", default="flat",
+                        help="FAISS index type: flat, sq16 (float16), hnsw, hnsw_sq16, ivf or ivfpq. "
+                             "Compare them with index_report.py.")
+    parser.add_argument("--incremental-index", action="store_true",
+                        help="On a catalog change, update the last index by SBS code instead of rebuilding it.")
+    parser.add_argument("--results-file", default="mapping_results.csv")
+    parser.add_argument("--failures-file", default="mapping_failures.csv")
+    parser.add_argument("--max-workers", type=int, default=4,
+                        help="Number of services mapped concurrently.")
+    parser.add_argument("--requests-per-second", type=float, default=None,
+                        help="Cap on LLM requests per second (token bucket). Unlimited if omitted.")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="Retries per service on 429/5xx/connection errors.")
+    parser.add_argument("--llm-cache", default=None,
+                        help="SQLite file caching LLM responses across runs. Disabled if omitted.")
+    parser.add_argument("--query-embedding-cache", default=None,
+                        help="Folder caching query embeddings across runs, so repeated service texts skip the model. "
+                             "Disabled if omitted.")
+    parser.add_argument("--query-embedding-cache-items", type=int, default=10_000,
+                        help="Query embeddings also kept in memory (least recently used dropped first).")
+    parser.add_argument("--llm-base-url", default=None,
+                        help="OpenAI-compatible endpoint to use instead of Fireworks (e.g. a local stub).")
+    parser.add_argument("--llm-max-tokens", type=int, default=None,
+                        help="Output-token cap per answer (per item in batched requests). Server default if omitted. "
+                             "Answers cut by the cap are recorded as failures.")
+    parser.add_argument("--llm-stream", action="store_true",
+                        help="Stream LLM answers and stop each one as soon as its code, description and "
+                             "explanation lines are complete.")
+    parser.add_argument("--no-dedupe-queries", action="store_true",
+                        help="Send one LLM query per service code even when their details are identical.")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Services per LLM request (each with its own SBS candidates). 1 disables batching.")
+    parser.add_argument("--retrieval-k", type=int, default=3,
+                        help="SBS candidates retrieved per query and shown to the LLM.")
+    parser.add_argument("--hybrid-retrieval", action="store_true",
+                        help="Fuse FAISS results with a BM25 index over the SBS documents (reciprocal rank fusion).")
+    parser.add_argument("--cascade-min-score", type=float, default=None,
+                        help="Assign the top retrieval candidate without the LLM when its score reaches this "
+                             "(pick it with calibration.py). Disabled if omitted. With --hybrid-retrieval scores are "
+                             "RRF sums, not cosine similarities, so calibrate separately for each retrieval mode.")
+    parser.add_argument("--cascade-min-margin", type=float, default=0.0,
+                        help="Also require the top candidate to lead the runner-up by this much.")
+    parser.add_argument("--retrieval-file", default="mapping_candidates.csv",
+                        help="Where to save the retrieved SBS candidates and scores for every query.")
+    parser.add_argument("--verified-lookup", default=None,
+                        help="Verified mappings built by verified_lookup.py; matching services skip retrieval and the LLM.")
+    parser.add_argument("--verified-ignore-context", action="store_true",
+                        help="Match verified mappings on description alone, not classification and category.")
+    parser.add_argument("--metrics-file", default=None,
+                        help="JSON file the run metrics are flushed to periodically, with a summary at the end.")
+    parser.add_argument("--metrics-prom-file", default=None,
+                        help="Prometheus textfile (node_exporter textfile collector) for the run metrics.")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="Seconds between metric flushes.")
+    parser.add_argument("--prompt-price", type=float, default=PROMPT_PRICE_PER_MILLION,
+                        help="USD per million prompt tokens, for the cost estimate.")
+    parser.add_argument("--completion-price", type=float, default=COMPLETION_PRICE_PER_MILLION,
+                        help="USD per million completion tokens, for the cost estimate.")
+    parser.add_argument("--checkpoint-db", default=None,
+                        help="Checkpoint results in this SQLite file and export the CSVs at the end.")
+    parser.add_argument("--num-shards", type=int, default=1,
+                        help="Split the services into this many shards by a hash of SERVICE_CODE. Without "
+                             "--shard-index, runs every shard as a local process and merges them.")
+    parser.add_argument("--shard-index", type=int, default=None,
+                        help="Map only this shard (0-based), writing shard-suffixed outputs. For multi-machine runs; "
+                             "the FAISS index must already be built (see --build-index-only).")
+    parser.add_argument("--merge", action="store_true",
+                        help="Merge the --num-shards shard outputs into the results/failures files and check them.")
+    parser.add_argument("--build-index-only", action="store_true",
+                        help="Build (or update) the cached FAISS index and exit.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from document_convertor import DocumentConverter
+    from prompt import prompt_template
+    from vector_store import VectorstoreBuilder
+
+    sharded = args.shard_index is not None
+    if sharded:
+        # Each shard keeps its own outputs and resume state
+        for name in ["results_file", "failures_file", "retrieval_file", "checkpoint_db",
+                     "metrics_file", "metrics_prom_file"]:
+            if getattr(args, name):
+                setattr(args, name, shard_path(getattr(args, name), args.shard_index, args.num_shards))
+    flusher = MetricsFlusher(METRICS, args.metrics_file, args.metrics_prom_file, args.metrics_interval).start()
+
+    # === STEP 1: Load and prepare AHJ & SBS data ===
+    matcher = ServiceMatcher(ahj_path=args.ahj_path, sbs_path=args.sbs_path)
+
+    with METRICS.span("load"):
+        _, sbs_df = matcher.load_data()
+    with METRICS.span("preprocess"):
+        matcher.preprocess_ahj()
+    with METRICS.span("match"):
+        exact_matches = matcher.match_services()
+        lexical_matches = matcher.match_services_lexical(exact_matches, threshold=args.lexical_threshold)
+    if args.shard_index in (None, 0):
+        lexical_matches.to_csv(args.lexical_matches_file, index=False)
+    unique_ahj_services = matcher.find_unique_ahj_services(pd.concat([exact_matches, lexical_matches]))
+
+    if args.merge:
+        merge_shards(args.results_file, args.failures_file, args.num_shards,
+                     expected_codes=unique_ahj_services["SERVICE_CODE"])
+        flusher.stop()
+        return
+
+    print(f"Matched services: {exact_matches.shape}")
+    print(f"Lexical matches: {lexical_matches.shape} (saved to {args.lexical_matches_file})")
+    print(f"Unique AHJ services: {unique_ahj_services.shape}")
+
+    # === STEP 2: Convert SBS services to documents (streamed in batches) ===
+    # You can combine Short & Long descriptions if needed for better retrieval
+    converter = DocumentConverter()
+
+    # === STEP 3: Build Vectorstore (reused from the on-disk cache while SBS catalog and model are unchanged) ===
+    vectorstore_builder = VectorstoreBuilder(
+        "BAAI/bge-small-en-v1.5",
+        cache_dir=args.index_cache_dir,
+        embed_batch_size=args.embed_batch_size,
+        multi_process=args.embed_multi_process,
+        index_type=args.index_type
+    )
+    cache_key = vectorstore_builder.catalog_key(chain.from_iterable(converter.iter_sbs_docs(sbs_df)))
+    if sharded:
+        # Shards only open the prebuilt index (read-only, memory-mapped) and never embed
+        vectorstore = vectorstore_builder.load_cached_index(cache_key)
+    else:
+        vectorstore = vectorstore_builder.create_faiss_index_from_batches(
+            converter.iter_sbs_docs(sbs_df), cache_key=cache_key, incremental=args.incremental_index
+        )
+    bm25_index = None
+    if args.hybrid_retrieval:
+        bm25_index = vectorstore_builder.create_bm25_index(vectorstore, cache_key=cache_key)
+
+    if args.build_index_only:
+        print(f"✅ Index {cache_key[:12]} ready in {args.index_cache_dir}")
+        flusher.stop()
+        return
+
+    if args.num_shards > 1 and not sharded:
+        log_file = os.path.splitext(args.results_file)[0] + ".log"
+        exit_codes = run_local_shards(args.num_shards, os.path.abspath(__file__), sys.argv[1:], log_file=log_file)
+        failed = [shard_index + 1 for shard_index, code in enumerate(exit_codes) if code != 0]
+        if failed:
+            # The shard files stay for inspection; a rerun resumes each shard from its own checkpoint
+            print(f"❌ Shards {failed} of {args.num_shards} failed; not merging into {args.results_file}.")
+            flusher.stop()
+            sys.exit(1)
+        merge_shards(args.results_file, args.failures_file, args.num_shards,
+                     expected_codes=unique_ahj_services["SERVICE_CODE"])
+        flusher.stop()
+        return
+
+    if sharded:
+        unique_ahj_services = select_shard(unique_ahj_services, args.shard_index, args.num_shards)
+        print(f"🧩 Shard {args.shard_index + 1}/{args.num_shards}: {len(unique_ahj_services)} services")
+
+    # === STEP 4: Initialize ServiceMapper ===
+    query_embedding_cache = None
+    if args.query_embedding_cache:
+        from embedding_cache import EmbeddingCache, cache_query_embeddings
+        query_embedding_cache = EmbeddingCache(
+            args.query_embedding_cache, vectorstore_builder.embeddings_model,
+            memory_items=args.query_embedding_cache_items
+        )
+        cache_query_embeddings(vectorstore, query_embedding_cache)
+        print(f"🧠 Query embedding cache: {len(query_embedding_cache)} embeddings in {args.query_embedding_cache}")
+
+    verified_lookup = None
+    if args.verified_lookup:
+        verified_lookup = VerifiedLookup.load(args.verified_lookup, match_context=not args.verified_ignore_context)
+
+    result_sink = None
+    if args.checkpoint_db:
+        result_sink = SQLiteResultSink(args.checkpoint_db, args.results_file, args.failures_file)
+
+    mapper = ServiceMapper(
+        vectorstore=vectorstore,
+        prompt_template=prompt_template,
+        answer_parser=AnswerParser(),  # ✅ Instantiate here
+        results_file=args.results_file,
+        failures_file=args.failures_file,
+        max_workers=args.max_workers,
+        requests_per_second=args.requests_per_second,
+        max_retries=args.max_retries,
+        llm_cache_path=args.llm_cache,
+        llm_base_url=args.llm_base_url,
+        llm_max_tokens=args.llm_max_tokens,
+        llm_stream=args.llm_stream,
+        dedupe_queries=not args.no_dedupe_queries,
+        result_sink=result_sink,
+        batch_size=args.batch_size,
+        retrieval_k=args.retrieval_k,
+        retrieval_file=args.retrieval_file,
+        bm25_index=bm25_index,
+        cascade_min_score=args.cascade_min_score,
+        cascade_min_margin=args.cascade_min_margin,
+        verified_lookup=verified_lookup,
+        prompt_price_per_million=args.prompt_price,
+        completion_price_per_million=args.completion_price
+    )
+
+    # === STEP 5: Map services ===
+    try:
+        mapper.map_service_codes(unique_ahj_services)
+    finally:
+        if query_embedding_cache is not None:
+            query_embedding_cache.flush()
+    flusher.stop(extra={"summary": mapper.run_summary})
+
+    print("✅ Service mapping process completed.")
 
-# === STEP 5: Map services ===
-mapper.map_service_codes(unique_ahj_services)
 
-print("✅ Service mapping process completed.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import subprocess
+import sys
+from typing import Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+CODE_COLUMN = "Internal_Service_Code"
+
+
+def shard_of(codes: Iterable, num_shards: int) -> np.ndarray:
+    """Shard number of each service code: a hash of its text, the same on every machine and run."""
+    return np.fromiter(
+        (
+            int.from_bytes(hashlib.md5(str(code).encode("utf-8")).digest()[:8], "big") % num_shards
+            for code in codes
+        ),
+        dtype=np.int64
+    )
+
+
+def select_shard(services_df: pd.DataFrame, shard_index: int, num_shards: int) -> pd.DataFrame:
+    """Rows whose SERVICE_CODE falls in this shard; all rows of one code land in the same shard."""
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}.")
+    return services_df[shard_of(services_df["SERVICE_CODE"], num_shards) == shard_index]
+
+
+def shard_path(path: str, shard_index: int, num_shards: int) -> str:
+    """e.g. mapping_results.csv -> mapping_results.shard-02-of-08.csv"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard-{shard_index:02d}-of-{num_shards:02d}{ext}"
+
+
+def run_local_shards(
+    num_shards: int, script: str, argv: List[str], log_file: str = "mapping_shard.log"
+) -> List[int]:
+    """Run every shard of script as its own process on this machine and wait for all of them.
+
+    Each process gets argv plus --shard-index; its output goes to its shard of log_file.
+    Returns the exit codes in shard order.
+    """
+    processes = []
+    for shard_index in range(num_shards):
+        log_path = shard_path(log_file, shard_index, num_shards)
+        log = open(log_path, "w")
+        processes.append((
+            subprocess.Popen(
+                [sys.executable, script, *argv, "--shard-index", str(shard_index)],
+                stdout=log, stderr=subprocess.STDOUT
+            ),
+            log,
+            log_path
+        ))
+        print(f"🚚 Started shard {shard_index + 1}/{num_shards} (log: {log_path})")
+
+    exit_codes = []
+    for shard_index, (process, log, log_path) in enumerate(processes):
+        exit_codes.append(process.wait())
+        log.close()
+        status = "✅ finished" if exit_codes[-1] == 0 else f"❌ failed with exit code {exit_codes[-1]}"
+        print(f"{status}: shard {shard_index + 1}/{num_shards} (log: {log_path})")
+    return exit_codes
+
+
+def _read_shards(path: str, num_shards: int) -> pd.DataFrame:
+    frames = []
+    for shard_index in range(num_shards):
+        part = shard_path(path, shard_index, num_shards)
+        if os.path.exists(part):
+            # Codes stay text so a merge never rewrites them (e.g. leading zeros)
+            frame = pd.read_csv(part, dtype={CODE_COLUMN: str, "SERVICE_CODE": str})
+            frames.append(frame.assign(_shard=shard_index))
+        else:
+            print(f"⚠️ Missing shard output {part}")
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["_shard"])
+
+
+def merge_shards(
+    results_file: str,
+    failures_file: str,
+    num_shards: int,
+    expected_codes: Optional[Iterable] = None
+) -> dict:
+    """Combine shard outputs into the canonical results and failures CSVs.
+
+    Checks that every code sits in the shard its hash assigns, drops repeated result rows
+    and failures of codes that later succeeded, and, given expected_codes, lists the codes
+    that are neither mapped nor failed. Returns these checks as a report.
+    """
+    results = _read_shards(results_file, num_shards)
+    failures = _read_shards(failures_file, num_shards)
+
+    report = {"shards": num_shards}
+    if len(results):
+        wrong_shard = shard_of(results[CODE_COLUMN], num_shards) != results["_shard"]
+        report["codes_in_wrong_shard"] = sorted(results.loc[wrong_shard, CODE_COLUMN].unique())
+
+        # A code can map several times with different descriptions, but never twice for the same one.
+        # Of repeated rows keep the latest from the code's own shard.
+        ordered = results.assign(_wrong=wrong_shard).sort_values("_wrong", ascending=False, kind="stable")
+        duplicated = ordered.duplicated(subset=[CODE_COLUMN, "Internal_Description"], keep="last")
+        report["duplicate_result_rows"] = int(duplicated.sum())
+        report["duplicate_codes"] = sorted(ordered.loc[duplicated, CODE_COLUMN].unique())
+        results = ordered[~duplicated].drop(columns="_wrong").sort_index()
+
+    mapped = set(results[CODE_COLUMN]) if len(results) else set()
+    if len(failures):
+        resolved = failures["SERVICE_CODE"].isin(mapped)
+        report["failures_resolved_on_retry"] = int(resolved.sum())
+        failures = failures[~resolved].drop_duplicates(subset=["SERVICE_CODE"], keep="last")
+    failed = set(failures["SERVICE_CODE"]) if len(failures) else set()
+
+    if expected_codes is not None:
+        expected = {str(code) for code in expected_codes}
+        report["missing_codes"] = sorted(expected - mapped - failed)
+        report["unexpected_codes"] = sorted((mapped | failed) - expected)
+
+    results.drop(columns="_shard").to_csv(results_file, index=False)
+    failures.drop(columns="_shard").to_csv(failures_file, index=False)
+    report["results"] = len(results)
+    report["failures"] = len(failures)
+
+    print(f"🧩 Merged {num_shards} shards: {report['results']} results, {report['failures']} failures.")
+    for check in ["codes_in_wrong_shard", "duplicate_codes", "missing_codes", "unexpected_codes"]:
+        if report.get(check):
+            print(f"⚠️ {len(report[check])} {check.replace('_', ' ')}: {report[check][:10]}")
+    return report
@@ -0,0 +1,224 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+CODE_PATTERN = re.compile(r"^Service Code:\s*(.+)$", re.MULTILINE)
+SHORT_PATTERN = re.compile(r"^\**Service Short Description:\**\s*(.+)$", re.MULTILINE)
+ITEM_SPLIT = re.compile(r"^### Item (\S+)\s*$", re.MULTILINE)
+TOKEN_PATTERN = re.compile(r"\s*\S+")
+TAIL_SENTENCE = "The candidate matches the clinical purpose, service type and specificity of the request. "
+
+
+def _pick_first_candidate(text: str):
+    """The first SBS candidate listed in a prompt (or prompt item), as (code, description)."""
+    code = CODE_PATTERN.search(text)
+    short = SHORT_PATTERN.search(text)
+    return (code.group(1).strip() if code else "UNKNOWN"), (short.group(1).strip() if short else "")
+
+
+def stub_answer(prompt: str) -> str:
+    """Answer in the format AnswerParser reads, choosing each item's first candidate."""
+    parts = ITEM_SPLIT.split(prompt)
+    if len(parts) == 1:
+        code, short = _pick_first_candidate(prompt)
+        return f"Best SBS Code: {code}\nBest SBS Description: {short}\nExplanation: Stub picked the top candidate."
+
+    answers = []
+    for item_id, text in zip(parts[1::2], parts[2::2]):
+        code, short = _pick_first_candidate(text)
+        answers.append(
+            f"Item ID: {item_id}\nBest SBS Code: {code}\nBest SBS Description: {short}\n"
+            f"Explanation: Stub picked the top candidate."
+        )
+    return "\n\n".join(answers)
+
+
+def stub_tokens(answer: str, tail_tokens: int = 0):
+    """The answer as word tokens, followed by tail_tokens of reasoning a chatty model might add."""
+    tokens = TOKEN_PATTERN.findall(answer)
+    if tail_tokens:
+        tail = TOKEN_PATTERN.findall(TAIL_SENTENCE)
+        tokens.append("\n\nReasoning:")
+        tokens.extend(tail[i % len(tail)] for i in range(tail_tokens - 1))
+    return tokens
+
+
+class StubLLMServer:
+    """Local OpenAI-compatible /chat/completions endpoint for offline runs and benchmarks.
+
+    Each request waits latency seconds (plus up to latency_jitter more) and fails with a
+    429 or 500 with probability error_rate. Answers pick the first SBS candidate in the prompt,
+    followed by tail_tokens of reasoning; every output token takes token_latency seconds.
+    max_tokens and stream=True are honoured, and a client closing a stream stops generation.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        token_latency: float = 0.0,
+        tail_tokens: int = 0
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.token_latency = token_latency
+        self.tail_tokens = tail_tokens
+        self.requests = 0
+        self.errors = 0
+        self.output_tokens = 0
+        self.streams_cancelled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _draw(self):
+        """Return (delay, error status or None) for the next request."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.random() * self.latency_jitter
+            if self._random.random() < self.error_rate:
+                self.errors += 1
+                return delay, self._random.choice([429, 500])
+            return delay, None
+
+    def _count_tokens(self, n: int = 1) -> None:
+        with self._lock:
+            self.output_tokens += n
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                delay, error = server._draw()
+                time.sleep(delay)
+                if error:
+                    self._send(error, {"error": {"message": "stub failure", "code": error}}, {"Retry-After": "0"})
+                    return
+
+                prompt = body["messages"][-1]["content"]
+                tokens = stub_tokens(stub_answer(prompt), server.tail_tokens)
+                finish_reason = "stop"
+                if body.get("max_tokens") and len(tokens) > body["max_tokens"]:
+                    tokens, finish_reason = tokens[:body["max_tokens"]], "length"
+                # Prompt tokens use a rough 4-characters-per-token estimate
+                usage = {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": len(prompt) // 4 + len(tokens)
+                }
+                if body.get("stream"):
+                    self._stream(body, tokens, finish_reason, usage)
+                    return
+
+                time.sleep(server.token_latency * len(tokens))
+                server._count_tokens(len(tokens))
+                self._send(200, {
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": finish_reason,
+                        "message": {"role": "assistant", "content": "".join(tokens)}
+                    }],
+                    "usage": usage
+                })
+
+            def _stream(self, body: dict, tokens: list, finish_reason: str, usage: dict):
+                """Send the answer as server-sent chat.completion.chunk events, one token each."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def event(choices, **extra):
+                    chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model", "stub"), "choices": choices, **extra}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                try:
+                    for i, token in enumerate(tokens):
+                        time.sleep(server.token_latency)
+                        event([{"index": 0, "delta": {"content": token},
+                                "finish_reason": finish_reason if i == len(tokens) - 1 else None}])
+                        server._count_tokens()
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        event([], usage=usage)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.streams_cancelled += 1
+
+            def _send(self, status: int, payload: dict, headers: Optional[dict] = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub LLM.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per request.")
+    parser.add_argument("--latency-jitter", type=float, default=0.1, help="Extra random seconds per request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 429/500.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per output token.")
+    parser.add_argument("--tail-tokens", type=int, default=0,
+                        help="Reasoning tokens appended after each answer, as a chatty model would.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    stub = StubLLMServer(port=args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+                         error_rate=args.error_rate, seed=args.seed, token_latency=args.token_latency,
+                         tail_tokens=args.tail_tokens)
+    print(f"🧪 Stub LLM listening on {stub.base_url} (use --llm-base-url)")
+    stub.serve_forever()
@@ -0,0 +1,145 @@
+import argparse
+import os
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+# Vocabulary the synthetic SBS catalog is assembled from
+PROCEDURES = [
+    "MRI", "CT SCAN", "X RAY", "ULTRASOUND", "BIOPSY", "EXCISION", "REPAIR", "INJECTION",
+    "ENDOSCOPY", "ARTHROSCOPY", "RECONSTRUCTION", "DRAINAGE", "CONSULTATION", "DOPPLER"
+]
+SITES = [
+    "KNEE", "SHOULDER", "CHEST", "ABDOMEN", "PELVIS", "BRAIN", "SPINE", "HAND", "FOOT",
+    "LIVER", "KIDNEY", "THYROID", "BREAST", "HIP", "ELBOW", "WRIST", "NECK", "SINUS"
+]
+SIDES = ["", "LEFT", "RIGHT", "BILATERAL"]
+MODIFIERS = ["", "WITH CONTRAST", "WITHOUT CONTRAST", "COMPLEX", "SIMPLE", "FOLLOW UP"]
+DRUGS = [
+    "PARACETAMOL", "AMOXICILLIN", "IBUPROFEN", "OMEPRAZOLE", "METFORMIN", "CEFTRIAXONE",
+    "DICLOFENAC", "INSULIN", "HEPARIN", "AZITHROMYCIN", "SALBUTAMOL", "PREDNISOLONE"
+]
+FORMS = ["TABLET", "CAPSULE", "SYRUP", "INJECTION", "SUSPENSION", "AMPOULE"]
+CHAPTERS = ["Imaging", "Procedures on musculoskeletal system", "Medications", "Laboratory", "Consultations"]
+BLOCKS = ["Diagnostic imaging", "Surgical procedures", "Pharmacy", "Pathology", "Outpatient visits"]
+COMPANIES = ["BUPA", "TAWUNIYA", "MEDGULF", "ART", "MEDVISA", "TCS", "GLOBEMED"]
+
+# Price-list spellings of catalog words, the reverse of the lexical matcher's expansions
+PRICE_LIST_SPELLINGS = {
+    "LEFT": "LT", "RIGHT": "RT", "TABLET": "TAB", "CAPSULE": "CAPS", "INJECTION": "INJ",
+    "WITH CONTRAST": "W/ CONTRAST", "WITHOUT CONTRAST": "W/O CONTRAST", "X RAY": "XRAY"
+}
+
+
+def _join(*words) -> str:
+    return " ".join(word for word in words if word)
+
+
+def generate_sbs_catalog(n_services: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic SBS catalog with the columns ServiceMatcher reads."""
+    rng = np.random.default_rng(seed)
+    short = []
+    for i in range(n_services):
+        if rng.random() < 0.3:
+            name = _join(rng.choice(DRUGS), f"{rng.choice([5, 10, 50, 100, 250, 500])}MG", rng.choice(FORMS))
+        else:
+            name = _join(rng.choice(PROCEDURES), rng.choice(SITES), rng.choice(SIDES), rng.choice(MODIFIERS))
+        # Suffix keeps descriptions unique however many services are drawn
+        short.append(f"{name} {i:06d}")
+
+    codes = 10_000_000 + np.arange(n_services)
+    chapter = rng.integers(0, len(CHAPTERS), n_services)
+    return pd.DataFrame({
+        "SBS Code": codes,
+        "SBS Code (Hyphenated)": [f"{c // 10_000:04d}-{c // 100 % 100:02d}-{c % 100:02d}" for c in codes],
+        "Short Description": short,
+        "Long Description": [f"{s} PROCEDURE AS PER SBS STANDARD" for s in short],
+        "Definition": [f"Definition of {s.lower()}" for s in short],
+        "Chapter Name": np.asarray(CHAPTERS)[chapter],
+        "Block Name": np.asarray(BLOCKS)[chapter],
+    })
+
+
+def _price_list_spelling(description: str, rng: np.random.Generator) -> str:
+    """Rewrite a catalog description the way price lists tend to: abbreviations and a PK- prefix."""
+    for word, spelling in PRICE_LIST_SPELLINGS.items():
+        if word in description and rng.random() < 0.7:
+            description = description.replace(word, spelling)
+    return ("PK-" if rng.random() < 0.2 else "") + description
+
+
+def generate_ahj_price_list(
+    n_rows: int,
+    sbs: pd.DataFrame,
+    seed: int = 0,
+    exact_share: float = 0.3,
+    near_share: float = 0.2,
+    duplicate_share: float = 0.3
+) -> pd.DataFrame:
+    """Synthetic AHJ price list drawn from an SBS catalog.
+
+    exact_share of rows copy an SBS short description, near_share use price-list spellings
+    of one, and the rest are free-form services only retrieval and the LLM can map.
+    duplicate_share of rows repeat another row's service details under a different company
+    and service code, as the same service does across insurers.
+    """
+    rng = np.random.default_rng(seed + 1)
+    sbs_short = sbs["Short Description"].to_numpy()
+    kind = rng.random(n_rows)
+    descriptions = []
+    for i in range(n_rows):
+        source = sbs_short[rng.integers(len(sbs_short))]
+        if kind[i] < exact_share:
+            descriptions.append(source)
+        elif kind[i] < exact_share + near_share:
+            descriptions.append(_price_list_spelling(source, rng))
+        else:
+            words = source.split()[:-1]
+            rng.shuffle(words)
+            descriptions.append(_join(*words, f"SVC{i}"))
+
+    classification = rng.integers(0, len(CHAPTERS), n_rows)
+    ahj = pd.DataFrame({
+        "INSURANCE_COMPANY": rng.choice(COMPANIES, n_rows),
+        "SERVICE_CODE": 500_000 + np.arange(n_rows),
+        "SERVICE_DESCRIPTION": descriptions,
+        "PRICE": rng.integers(50, 5_000, n_rows).astype(float),
+        "SERVICE_KEY": [f"K{i}" for i in range(n_rows)],
+        "SERVICE_CLASSIFICATION": np.asarray(CHAPTERS)[classification],
+        "SERVICE_CATEGORY": np.asarray(BLOCKS)[classification],
+    })
+
+    duplicates = rng.random(n_rows) < duplicate_share
+    originals = rng.integers(0, n_rows, n_rows)
+    detail_columns = ["SERVICE_DESCRIPTION", "SERVICE_CLASSIFICATION", "SERVICE_CATEGORY"]
+    ahj.loc[duplicates, detail_columns] = ahj.loc[originals[duplicates], detail_columns].to_numpy()
+    return ahj
+
+
+def write_synthetic_workbooks(
+    out_dir: str, n_sbs: int, n_ahj: int, seed: int = 0
+) -> Tuple[str, str]:
+    """Write SBS_Services.xlsx and AHJ_PriceList.xlsx into out_dir and return their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    sbs = generate_sbs_catalog(n_sbs, seed=seed)
+    ahj = generate_ahj_price_list(n_ahj, sbs, seed=seed)
+    sbs_path = os.path.join(out_dir, "SBS_Services.xlsx")
+    ahj_path = os.path.join(out_dir, "AHJ_PriceList.xlsx")
+    sbs.to_excel(sbs_path, index=False)
+    ahj.to_excel(ahj_path, index=False)
+    return ahj_path, sbs_path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic SBS catalog and AHJ price list.")
+    parser.add_argument("--out-dir", default="synthetic_data")
+    parser.add_argument("--n-sbs", type=int, default=5_000)
+    parser.add_argument("--n-ahj", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ahj_path, sbs_path = write_synthetic_workbooks(args.out_dir, args.n_sbs, args.n_ahj, seed=args.seed)
+    print(f"✅ Wrote {ahj_path} ({args.n_ahj} rows) and {sbs_path} ({args.n_sbs} services)")
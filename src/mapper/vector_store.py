@@ -1,10 +1,356 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from contextlib import contextmanager
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+import faiss
+import numpy as np
+from langchain.schema import Document
 from langchain.vectorstores import FAISS
 from langchain.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+from bm25_index import BM25_FILE, BM25Index
+from mmap_docstore import MmapDocstore
+from instrumentation import METRICS
+from io_utils import write_text_atomic
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+CODE_FIELD = "Service Code"  # metadata key holding 'SBS Code (Hyphenated)'
+
+# FAISS index_factory strings per index type; {nlist} and {m} are sized from the catalog
+INDEX_TYPES = {
+    "flat": "Flat",
+    "sq16": "SQfp16",  # float16 vectors, half the flat size, same recall in practice
+    "hnsw": "HNSW32",
+    "hnsw_sq16": "HNSW32,SQfp16",
+    "ivf": "IVF{nlist},Flat",
+    "ivfpq": "IVF{nlist},PQ{m}",
+}
+# Index types whose vectors can be deleted in place, as incremental updates need
+INCREMENTAL_INDEX_TYPES = {"flat", "sq16"}
+IVF_NPROBE = 16
+HNSW_EF_SEARCH = 64
+
+
+def _document_digest(doc: Document) -> bytes:
+    """Bytes identifying a document's content and metadata."""
+    return (
+        doc.page_content.encode("utf-8") + b"\x00"
+        + json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8")
+    )
+
+
+def compact_index(index: faiss.Index, index_type: str) -> faiss.Index:
+    """Copy a flat index's vectors into an index of index_type, keeping positions and metric."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; choose from {sorted(INDEX_TYPES)}.")
+    vectors = index.reconstruct_n(0, index.ntotal)
+    n, d = vectors.shape
+    nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+    # PQ sub-quantizers of about 4 dimensions each, as many as divide the dimension evenly
+    m = max(i for i in range(1, d // 4 + 1) if d % i == 0)
+    if index_type == "ivfpq" and n < 256:
+        raise ValueError(f"ivfpq needs at least 256 vectors to train its codebooks, got {n}.")
+
+    compact = faiss.index_factory(d, INDEX_TYPES[index_type].format(nlist=nlist, m=m), index.metric_type)
+    compact.train(vectors)
+    compact.add(vectors)
+    if index_type.startswith("ivf"):
+        faiss.extract_index_ivf(compact).nprobe = min(IVF_NPROBE, nlist)
+    if index_type.startswith("hnsw"):
+        compact.hnsw.efSearch = HNSW_EF_SEARCH
+    return compact
+
+
+class _PooledEmbeddings(Embeddings):
+    """Encodes documents over one sentence-transformers process pool kept for a whole build.
+
+    HuggingFaceEmbeddings(multi_process=True) starts and stops a pool on every call. Queries go
+    to the wrapped single-process embeddings; close() stops the pool.
+    """
+
+    def __init__(self, embeddings: HuggingFaceEmbeddings):
+        self.embeddings = embeddings
+        self.pool = embeddings.client.start_multi_process_pool()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Same newline handling as HuggingFaceEmbeddings, so query and document vectors agree
+        texts = [text.replace("\n", " ") for text in texts]
+        return self.embeddings.client.encode_multi_process(
+            texts, self.pool, batch_size=self.embeddings.encode_kwargs.get("batch_size", 32)
+        ).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def close(self) -> None:
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer.stop_multi_process_pool(self.pool)
+
 
 class VectorstoreBuilder:
-    def __init__(self, embeddings_model: str):
+    def __init__(
+        self,
+        embeddings_model: str,
+        cache_dir: Optional[str] = None,
+        embed_batch_size: int = 64,
+        multi_process: bool = False,
+        embeddings=None,
+        index_type: str = "flat"
+    ):
         self.embeddings_model = embeddings_model
+        self.cache_dir = cache_dir
+        self.embed_batch_size = embed_batch_size
+        self.multi_process = multi_process
+        self.embeddings = embeddings
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}; choose from {sorted(INDEX_TYPES)}.")
+        self.index_type = index_type
+
+    @property
+    def _index_tag(self) -> str:
+        """Model name, plus the index type unless flat, so flat caches keep their keys."""
+        if self.index_type == "flat":
+            return self.embeddings_model
+        return f"{self.embeddings_model}|{self.index_type}"
+
+    def _make_embeddings(self) -> HuggingFaceEmbeddings:
+        """Single-process embeddings, which the returned store uses for queries.
+
+        A prebuilt embeddings object given to the constructor (e.g. a fake one for offline
+        benchmarks) is used as-is; embeddings_model still names it in cache keys.
+        """
+        if self.embeddings is not None:
+            return self.embeddings
+        return HuggingFaceEmbeddings(
+            model_name=self.embeddings_model,
+            encode_kwargs={"batch_size": self.embed_batch_size}
+        )
+
+    @contextmanager
+    def _build_embeddings(self, embeddings):
+        """With multi_process, documents are encoded over a process pool (one process per CPU)
+        that lives for the build only; otherwise embeddings itself."""
+        if not self.multi_process or not isinstance(embeddings, HuggingFaceEmbeddings):
+            yield embeddings
+            return
+        pooled = _PooledEmbeddings(embeddings)
+        try:
+            yield pooled
+        finally:
+            pooled.close()
+
+    def catalog_key(self, documents: Iterable[Document]) -> str:
+        """Hash the embedding model name, index type and every document's content and metadata."""
+        digest = hashlib.sha256(self._index_tag.encode("utf-8"))
+        for doc in documents:
+            digest.update(b"\x00")
+            digest.update(doc.page_content.encode("utf-8"))
+            digest.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _index_dir(self, cache_key: str) -> str:
+        return os.path.join(self.cache_dir, cache_key)
+
+    def _latest_pointer(self) -> str:
+        """File naming the most recently built index for this embedding model and index type."""
+        model_hash = hashlib.sha256(self._index_tag.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"latest-{model_hash}.txt")
+
+    def latest_cache_key(self) -> Optional[str]:
+        """Cache key of the most recently built index for this model, if any."""
+        if self.cache_dir is None or not os.path.exists(self._latest_pointer()):
+            return None
+        with open(self._latest_pointer()) as f:
+            return f.read().strip()
+
+    def _load_cached_index(self, index_dir: str, embeddings, mmap: bool = True) -> FAISS:
+        """Load a saved index, memory-mapping the FAISS file when the index type allows it.
+
+        Memory-mapped loads also open the documents memory-mapped (MmapDocstore), so workers
+        on one host share a single copy of both. Pass mmap=False for an index that will be modified.
+        """
+        index_path = os.path.join(index_dir, INDEX_FILE)
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                pass
+        if index is None:
+            index = faiss.read_index(index_path)
+
+        if mmap and MmapDocstore.exists(index_dir):
+            docstore, index_to_docstore_id = MmapDocstore.open(index_dir)
+        else:
+            with open(os.path.join(index_dir, DOCSTORE_FILE), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    def _save_index(self, vectorstore: FAISS, cache_key: str) -> None:
+        """Save under cache_key and mark it as this model's latest index."""
+        index_dir = self._index_dir(cache_key)
+
+        # Save into a temp dir and rename so an interrupted run never leaves a half-written index
+        tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+        vectorstore.save_local(tmp_dir)
+        MmapDocstore.write(tmp_dir, vectorstore.docstore, vectorstore.index_to_docstore_id)
+        try:
+            os.replace(tmp_dir, index_dir)
+        except OSError:
+            # Another process saved the same index first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        write_text_atomic(self._latest_pointer(), cache_key)
+
+    def _embed_batches(self, batches: Iterable[List[Document]], embeddings, vectorstore: Optional[FAISS] = None) -> FAISS:
+        """Embed batch by batch, growing one index, so documents never need to be held twice.
+
+        The returned store embeds queries with embeddings, whatever encoded the documents.
+        """
+        n_docs = 0
+        with self._build_embeddings(embeddings) as build_embeddings:
+            try:
+                for batch in batches:
+                    if not batch:
+                        continue
+                    with METRICS.span("embed"):
+                        if vectorstore is None:
+                            vectorstore = FAISS.from_documents(batch, build_embeddings)
+                        else:
+                            vectorstore.embedding_function = build_embeddings
+                            vectorstore.add_documents(batch)
+                    n_docs += len(batch)
+                    print(f"🧮 Embedded {n_docs} documents...")
+            finally:
+                if vectorstore is not None:
+                    vectorstore.embedding_function = embeddings
+        if vectorstore is None:
+            raise ValueError("No documents to index.")
+        return vectorstore
+
+    def _compact(self, vectorstore: FAISS) -> FAISS:
+        """Swap the freshly embedded flat index for one of index_type."""
+        if self.index_type != "flat":
+            vectorstore.index = compact_index(vectorstore.index, self.index_type)
+            print(f"🗜️ Compacted the index to {self.index_type}")
+        return vectorstore
+
+    def _apply_catalog_diff(self, vectorstore: FAISS, batches: Iterable[List[Document]]) -> FAISS:
+        """Bring a stored index in line with the new catalog, compared per SBS code.
+
+        Codes whose documents are unchanged are kept as-is; new or changed codes are
+        (re-)embedded and codes missing from the new catalog are deleted.
+        """
+        stored_ids: Dict[str, List[str]] = {}
+        stored_digests: Dict[str, List[bytes]] = {}
+        for doc_id in vectorstore.index_to_docstore_id.values():
+            doc = vectorstore.docstore.search(doc_id)
+            code = str(doc.metadata.get(CODE_FIELD))
+            stored_ids.setdefault(code, []).append(doc_id)
+            stored_digests.setdefault(code, []).append(_document_digest(doc))
+
+        new_docs: Dict[str, List[Document]] = {}
+        for doc in chain.from_iterable(batches):
+            new_docs.setdefault(str(doc.metadata.get(CODE_FIELD)), []).append(doc)
+
+        changed = [
+            code for code, docs in new_docs.items()
+            if sorted(map(_document_digest, docs)) != sorted(stored_digests.get(code, []))
+        ]
+        removed = [code for code in stored_ids if code not in new_docs]
+
+        stale_ids = [
+            doc_id for code in chain(changed, removed) for doc_id in stored_ids.get(code, [])
+        ]
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+
+        to_embed = [doc for code in changed for doc in new_docs[code]]
+        print(f"🔁 Catalog diff: {len(changed)} new/changed codes, {len(removed)} removed, "
+              f"{len(new_docs) - len(changed)} unchanged.")
+        batch_docs = self.embed_batch_size * 16
+        return self._embed_batches(
+            (to_embed[i:i + batch_docs] for i in range(0, len(to_embed), batch_docs)),
+            vectorstore.embedding_function,
+            vectorstore
+        )
+
+    def load_cached_index(self, cache_key: str) -> FAISS:
+        """Open an index built earlier for this catalog, memory-mapped and read-only where possible.
+
+        Never embeds anything, so any number of processes can share one prebuilt index.
+        """
+        index_dir = self._index_dir(cache_key)
+        if not os.path.exists(os.path.join(index_dir, DOCSTORE_FILE)):
+            raise FileNotFoundError(
+                f"No FAISS index for cache key {cache_key[:12]} in {self.cache_dir}; build it first."
+            )
+        print(f"📦 Loading cached FAISS index {cache_key[:12]} from {self.cache_dir}")
+        return self._load_cached_index(index_dir, self._make_embeddings())
+
+    def create_faiss_index(self, documents: List[Document], cache_key: Optional[str] = None, incremental: bool = False):
+        """Build the FAISS index from a list of documents (see create_faiss_index_from_batches)."""
+        return self.create_faiss_index_from_batches([documents], cache_key=cache_key, incremental=incremental)
+
+    def create_faiss_index_from_batches(
+        self,
+        batches: Iterable[List[Document]],
+        cache_key: Optional[str] = None,
+        incremental: bool = False
+    ):
+        """Build the FAISS index, reusing the on-disk copy when the catalog and model are unchanged.
+
+        Without an explicit cache_key the batches are hashed first, so they must be re-iterable.
+        With one (e.g. from catalog_key over a separate pass), a cache hit never consumes them.
+        With incremental=True a changed catalog updates this model's latest index by SBS code
+        instead of re-embedding everything.
+        """
+        embeddings = self._make_embeddings()
+        if self.cache_dir is None:
+            return self._compact(self._embed_batches(batches, embeddings))
+
+        cache_key = cache_key or self.catalog_key(chain.from_iterable(batches))
+        index_dir = self._index_dir(cache_key)
+        if os.path.exists(os.path.join(index_dir, DOCSTORE_FILE)):
+            print(f"📦 Loading cached FAISS index {cache_key[:12]} from {self.cache_dir}")
+            return self._load_cached_index(index_dir, embeddings)
+
+        if incremental and self.index_type not in INCREMENTAL_INDEX_TYPES:
+            print(f"⚠️ {self.index_type} indexes cannot delete vectors; rebuilding instead of updating.")
+            incremental = False
+
+        previous_dir = None
+        if incremental and self.latest_cache_key():
+            previous_dir = self._index_dir(self.latest_cache_key())
+
+        if previous_dir and os.path.exists(os.path.join(previous_dir, DOCSTORE_FILE)):
+            print(f"🔁 Updating FAISS index {os.path.basename(previous_dir)[:12]} -> {cache_key[:12]}...")
+            previous = self._load_cached_index(previous_dir, embeddings, mmap=False)
+            vectorstore = self._apply_catalog_diff(previous, batches)
+        else:
+            print(f"🧮 Building FAISS index (cache key {cache_key[:12]})...")
+            vectorstore = self._compact(self._embed_batches(batches, embeddings))
+
+        self._save_index(vectorstore, cache_key)
+        return vectorstore
+
+    def create_bm25_index(self, vectorstore: FAISS, cache_key: Optional[str] = None) -> BM25Index:
+        """Build the BM25 index over the store's documents, reusing the copy saved with its FAISS index."""
+        if self.cache_dir is None or cache_key is None:
+            return BM25Index.from_vectorstore(vectorstore)
+
+        path = os.path.join(self._index_dir(cache_key), BM25_FILE)
+        if os.path.exists(path):
+            print(f"📦 Loading cached BM25 index {cache_key[:12]} from {self.cache_dir}")
+            return BM25Index.load(path)
 
-    def create_faiss_index(self, documents):
-        embeddings = HuggingFaceEmbeddings(model_name=self.embeddings_model)
-        return FAISS.from_documents(documents, embeddings)
\ No newline at end of file
+        print(f"🧮 Building BM25 index (cache key {cache_key[:12]})...")
+        bm25_index = BM25Index.from_vectorstore(vectorstore)
+        bm25_index.save(path)
+        return bm25_index
@@ -0,0 +1,137 @@
+import argparse
+import os
+from typing import List, Optional
+import pandas as pd
+from data_preprocessing import normalize_text
+from feedback_merge import FeedbackMergeEngine
+from feedback_store import FeedbackStore
+from io_utils import atomic_path
+
+VERIFIED_FILE = "verified_mappings.parquet"
+ENTRY_COLUMNS = [
+    'SERVICE_DESCRIPTION', 'SERVICE_CLASSIFICATION', 'SERVICE_CATEGORY',
+    'SBS Code (Hyphenated)', 'SHORT_DESCRIPTION', 'Source'
+]
+VALIDATION_COLUMN = 'Validation (Correct / In Correct)'
+# Columns of the mapping demo's validations (FeedbackStore rows, validated_mappings.csv) read here
+VALIDATED_COLUMNS = [
+    'SERVICE_DESCRIPTION', 'SERVICE_CLASSIFICATION', 'SERVICE_CATEGORY', 'SBS Code (Hyphenated)',
+    'SHORT_DESCRIPTION', VALIDATION_COLUMN, 'Correct SBS Code', 'Correct SBS Short / Long Description',
+    'Validated By'
+]
+
+
+def _keys(frame: pd.DataFrame, match_context: bool) -> pd.Series:
+    """Hash of the normalized description, plus classification and category with match_context."""
+    columns = ['SERVICE_DESCRIPTION', 'SERVICE_CLASSIFICATION', 'SERVICE_CATEGORY'][:3 if match_context else 1]
+    normalized = pd.concat([normalize_text(frame[col]) for col in columns], axis=1)
+    return pd.util.hash_pandas_object(normalized, index=False).astype("int64")
+
+
+def entries_from_corrections(corrections: pd.DataFrame) -> pd.DataFrame:
+    """Verified entries from the feedback merge engine's corrections ('Correct' rows)."""
+    if corrections.empty:
+        return pd.DataFrame(columns=ENTRY_COLUMNS)
+    sources = corrections['_source'].map(os.path.basename)
+    return corrections.reset_index(drop=True).assign(Source="feedback:" + sources.to_numpy())[ENTRY_COLUMNS]
+
+
+def entries_from_validated(validated: pd.DataFrame) -> pd.DataFrame:
+    """Verified entries from the mapping demo's validations.
+
+    A mapping marked 'Correct' verifies its own SBS code; one marked 'In Correct' with a
+    'Correct SBS Code' filled in verifies the reviewer's code instead.
+    """
+    validated = validated.reindex(columns=VALIDATED_COLUMNS)
+    verdict = validated[VALIDATION_COLUMN].fillna('').astype(str).str.strip()
+    reviewer_code = validated['Correct SBS Code']
+    corrected = verdict.eq('In Correct') & reviewer_code.notna() & reviewer_code.astype(str).str.strip().ne('')
+
+    entries = validated.assign(**{
+        'SBS Code (Hyphenated)': reviewer_code.where(corrected, validated['SBS Code (Hyphenated)']),
+        'SHORT_DESCRIPTION': validated['Correct SBS Short / Long Description'].where(
+            corrected, validated['SHORT_DESCRIPTION']
+        ),
+        'Source': "validated:" + validated['Validated By'].fillna('unknown').astype(str)
+    })
+    return entries[verdict.eq('Correct') | corrected][ENTRY_COLUMNS]
+
+
+class VerifiedLookup:
+    """Reviewer-verified SBS codes, looked up by a hash of the service's normalized text.
+
+    Descriptions verified with different SBS codes are ambiguous and left out, so a hit
+    is always a code a reviewer approved for that exact service text.
+    """
+
+    def __init__(self, entries: pd.DataFrame, match_context: bool = True):
+        self.match_context = match_context
+        entries = entries.dropna(subset=['SERVICE_DESCRIPTION', 'SBS Code (Hyphenated)'])
+        entries = entries.assign(
+            _key=_keys(entries, match_context).to_numpy(),
+            **{'SBS Code (Hyphenated)': entries['SBS Code (Hyphenated)'].astype(str).str.strip()}
+        )
+        codes_per_key = entries.groupby('_key')['SBS Code (Hyphenated)'].nunique()
+        ambiguous = codes_per_key.index[codes_per_key > 1]
+        self.ambiguous = len(ambiguous)
+        # Later entries win, so newer feedback supplies the description and source
+        self.table = (
+            entries[~entries['_key'].isin(ambiguous)]
+            .drop_duplicates('_key', keep='last')
+            .set_index('_key')
+        )
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def lookup(self, services_df: pd.DataFrame) -> pd.DataFrame:
+        """Verified entry per service row (all NaN where none), aligned to services_df."""
+        found = self.table.reindex(_keys(services_df, self.match_context).to_numpy())
+        return found.set_axis(services_df.index)
+
+    def save(self, path: str) -> None:
+        with atomic_path(path) as tmp_path:
+            self.table[ENTRY_COLUMNS].reset_index(drop=True).to_parquet(tmp_path, index=False)
+
+    @classmethod
+    def load(cls, path: str, match_context: bool = True) -> "VerifiedLookup":
+        lookup = cls(pd.read_parquet(path), match_context=match_context)
+        print(f"✅ Loaded {len(lookup)} verified mappings from {path}")
+        return lookup
+
+
+def build_verified_entries(
+    feedback_state_dir: Optional[str] = None,
+    validated_db: Optional[str] = None,
+    validated_csv: Optional[str] = None
+) -> pd.DataFrame:
+    """All verified entries, validations first so feedback workbooks take precedence."""
+    frames: List[pd.DataFrame] = []
+    if validated_db and os.path.exists(validated_db):
+        frames.append(entries_from_validated(FeedbackStore(validated_db, VALIDATED_COLUMNS).load_frame()))
+    elif validated_csv and os.path.exists(validated_csv):
+        frames.append(entries_from_validated(pd.read_csv(validated_csv)))
+    if feedback_state_dir and os.path.isdir(feedback_state_dir):
+        frames.append(entries_from_corrections(FeedbackMergeEngine(feedback_state_dir).corrections))
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ENTRY_COLUMNS)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the verified-mapping lookup from reviewer feedback.")
+    parser.add_argument("--feedback-state-dir", default="D:\\CodingSystem\\assets\\feedback\\merge_state",
+                        help="State folder of the feedback merge engine (improvements.py).")
+    parser.add_argument("--validated-db", default="D:/CodingSystem/assets/validated_mappings.sqlite")
+    parser.add_argument("--validated-csv", default="D:/CodingSystem/assets/validated_mappings.csv",
+                        help="Used when the validations database does not exist.")
+    parser.add_argument("--output", default=VERIFIED_FILE)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    entries = build_verified_entries(args.feedback_state_dir, args.validated_db, args.validated_csv)
+    lookup = VerifiedLookup(entries)
+    lookup.save(args.output)
+    print(f"✅ Saved {len(lookup)} verified mappings to {args.output} "
+          f"({lookup.ambiguous} ambiguous descriptions left out)")
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The mapper modules import each other by name, as when run from src/mapper
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "mapper"))
+
+
+@pytest.fixture
+def sbs_documents():
+    from langchain.schema import Document
+
+    return [
+        Document(page_content=f"Service Code: {code}\nService Short Description: {text}",
+                 metadata={"Service Code": code})
+        for code, text in [("11-00", "chest x-ray"), ("22-00", "blood culture"), ("33-00", "knee mri")]
+    ]
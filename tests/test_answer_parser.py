@@ -0,0 +1,47 @@
+from answer_parser import AnswerParser, StreamingAnswerParser
+
+
+def test_single_answer_tolerates_markdown():
+    answer = "Here you go:\n- **Best SBS Code:** 11-00\n  **Best SBS Description**: Chest x-ray\nExplanation: fits"
+    assert AnswerParser().parse_llm_answer(answer) == ("11-00", "Chest x-ray", "fits")
+
+
+def test_batch_answer_is_split_by_item():
+    answer = (
+        "### Item 1\nBest SBS Code: 11-00\nBest SBS Description: Chest x-ray\nExplanation: a\n\n"
+        "**Item ID: 2**\nBest SBS Code: 33-00\nBest SBS Description: Knee MRI\nExplanation: b\n"
+    )
+    assert AnswerParser().parse_batch_answer(answer, ["1", "2"]) == {
+        "1": ("11-00", "Chest x-ray", "a"),
+        "2": ("33-00", "Knee MRI", "b"),
+    }
+
+
+def test_batch_answer_leaves_out_missing_unknown_and_incomplete_items():
+    answer = (
+        "Item ID: 1\nBest SBS Description: no code\nExplanation: a\n"
+        "Item ID: 9\nBest SBS Code: 99-00\n"
+        "Item ID: 2\nBest SBS Code: 22-00\nBest SBS Description: Knee MRI\nExplanation: b\n"
+        "Item ID: 4\nBest SBS Code: 44-00\nBest SBS Description: cut"
+    )
+    assert AnswerParser().parse_batch_answer(answer, [1, 2, 3, 4]) == {"2": ("22-00", "Knee MRI", "b")}
+
+
+def test_streaming_parser_completes_once_every_field_line_ends():
+    parser = StreamingAnswerParser()
+    answer = "Best SBS Code: 11-00\nBest SBS Description: Chest x-ray\nExplanation: fits the request\n\nReasoning:"
+    fed = [parser.feed(answer[i:i + 3]) for i in range(0, len(answer), 3)]
+
+    # Complete on the chunk that ends the Explanation line, not before
+    line_end = answer.index("\n", answer.index("Explanation"))
+    assert fed.index(True) == line_end // 3
+    assert AnswerParser().parse_llm_answer(parser.text)[2] == "fits the request"
+
+
+def test_streaming_parser_waits_for_every_listed_item():
+    parser = StreamingAnswerParser(["1", "2"])
+    item = "Best SBS Code: {0}\nBest SBS Description: d\nExplanation: e\n"
+    assert not parser.feed("Item ID: 1\n" + item.format("11-00"))
+    assert not parser.feed("Item ID: 9\n" + item.format("99-00"))
+    assert not parser.feed("Item ID: 2\nBest SBS Code: 22-00\nBest SBS Description: d\nExplanation: e")
+    assert parser.feed("\n")
@@ -0,0 +1,35 @@
+import pytest
+from langchain.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from batch_retriever import BatchRetriever
+
+QUERIES = ["chest x-ray", "blood culture", "knee mri", "something else"]
+
+
+@pytest.fixture
+def vectorstore(sbs_documents):
+    return FAISS.from_documents(sbs_documents, DeterministicFakeEmbedding(size=8))
+
+
+def test_batched_search_matches_per_query_search(vectorstore):
+    results = BatchRetriever(vectorstore, k=2, embed_batch_size=3).search(QUERIES)
+
+    for query, hits in zip(QUERIES, results):
+        expected = vectorstore.similarity_search_with_score(query, k=2)
+        assert [doc.metadata for doc, _ in hits] == [doc.metadata for doc, _ in expected]
+        # Euclidean scores are reported as similarities, 1 - squared L2 / 2
+        assert [score for _, score in hits] == pytest.approx([1 - d / 2 for _, d in expected], abs=1e-5)
+
+
+def test_no_queries_no_search(vectorstore):
+    assert BatchRetriever(vectorstore).search([]) == []
+
+
+def test_to_frame_has_one_row_per_candidate(vectorstore):
+    results = BatchRetriever(vectorstore, k=2).search(QUERIES[:2])
+    frame = BatchRetriever.to_frame(QUERIES[:2], results)
+
+    assert frame["Query"].tolist() == [QUERIES[0]] * 2 + [QUERIES[1]] * 2
+    assert frame["Rank"].tolist() == [1, 2, 1, 2]
+    assert frame["SBS_Code"].isin(["11-00", "22-00", "33-00"]).all()
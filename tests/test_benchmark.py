@@ -0,0 +1,31 @@
+import sys
+
+from benchmark import StageRecorder, parse_args, run_benchmark
+
+
+def test_stage_recorder_reports_throughput_and_percentiles():
+    recorder = StageRecorder(trace_memory=False)
+    with recorder.stage("work") as record:
+        record["items"] = 4
+        record["latencies"].extend([0.001, 0.002, 0.003, 0.004])
+
+    stage = recorder.stages["work"]
+    assert stage["items"] == 4
+    assert stage["items_per_second"] > 0
+    assert stage["latency"]["max_ms"] == 4.0
+
+
+def test_small_offline_run_maps_every_unique_service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", [
+        "benchmark.py", "--n-sbs", "50", "--n-ahj", "40", "--latency", "0", "--latency-jitter", "0",
+        "--embedding-dim", "16", "--work-dir", str(tmp_path / "run"), "--no-trace-memory"
+    ])
+    report = run_benchmark(parse_args())
+
+    stages = report["stages"]
+    assert list(stages) == ["synthetic_data", "service_matcher", "document_converter",
+                            "vectorstore_builder", "retrieval", "llm_mapping", "result_writing"]
+    assert stages["document_converter"]["items"] == 50
+    assert stages["result_writing"]["items"] == stages["llm_mapping"]["items"] > 0
+    assert report["stub_llm"]["requests"] > 0
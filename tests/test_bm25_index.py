@@ -0,0 +1,79 @@
+import math
+
+import pytest
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from batch_retriever import BatchRetriever
+from bm25_index import BM25Index, tokenize
+
+TEXTS = ["chest x-ray two views", "blood culture", "knee mri left", "chest ct with contrast"]
+
+
+@pytest.fixture
+def vectorstore():
+    documents = [Document(page_content=text, metadata={"Service Code": f"{i}0-00"}) for i, text in enumerate(TEXTS)]
+    return FAISS.from_documents(documents, DeterministicFakeEmbedding(size=8))
+
+
+def brute_force_bm25(query, k1=1.2, b=0.75):
+    docs = [tokenize(text) for text in TEXTS]
+    avgdl = sum(map(len, docs)) / len(docs)
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in d for d in docs)
+            if not df:
+                continue
+            tf = doc.count(term)
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avgdl))
+        scores.append(score)
+    return scores
+
+
+def test_tokenize_expands_abbreviations():
+    assert tokenize("Knee MRI, Lt.") == ["KNEE", "MRI", "LEFT"]
+
+
+def test_scores_match_the_bm25_formula(vectorstore):
+    index = BM25Index.from_vectorstore(vectorstore)
+    position = {vectorstore.index_to_docstore_id[i]: i for i in range(len(TEXTS))}
+
+    for query in ["chest", "knee mri lt", "blood culture chest"]:
+        expected = brute_force_bm25(query)
+        hits = index.search([query], k=len(TEXTS))[0]
+        assert {position[doc_id]: score for doc_id, score in hits} == pytest.approx(
+            {i: s for i, s in enumerate(expected) if s > 0}, rel=1e-5
+        )
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_unknown_terms_match_nothing(vectorstore):
+    assert BM25Index.from_vectorstore(vectorstore).search(["zzz"], k=3) == [[]]
+
+
+def test_save_and_load_round_trip(vectorstore, tmp_path):
+    index = BM25Index.from_vectorstore(vectorstore)
+    path = str(tmp_path / "bm25.npz")
+    index.save(path)
+    assert BM25Index.load(path).search(["chest ct"], k=2) == index.search(["chest ct"], k=2)
+
+
+def test_hybrid_search_fuses_dense_and_lexical_ranks(vectorstore):
+    retriever = BatchRetriever(vectorstore, k=2, bm25_index=BM25Index.from_vectorstore(vectorstore), rrf_k=60)
+    dense = retriever._dense_search(["chest ct contrast"], 4)[0]
+    lexical = retriever.bm25_index.search(["chest ct contrast"], 4)[0]
+
+    fused = {}
+    for ranking in (dense, lexical):
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (60 + rank)
+    expected = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:2]
+
+    hits = retriever.search(["chest ct contrast"])[0]
+    assert [score for _, score in hits] == pytest.approx([score for _, score in expected])
+    docstore = vectorstore.docstore
+    assert [doc for doc, _ in hits] == [docstore.search(doc_id) for doc_id, _ in expected]
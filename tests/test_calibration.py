@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calibration import calibration_report, label_results, read_results
+
+
+def results_frame():
+    return pd.DataFrame({
+        "Internal_Service_Code": ["1", "2", "3", "4", "5"],
+        "Retrieval_Top_Code": ["11-00", "22-00", "33-00", "44-00", "55-00"],
+        "Retrieval_Score": [0.9, 0.8, 0.7, 0.6, np.nan],
+        "Retrieval_Margin": [0.3, 0.1, 0.2, np.nan, np.nan],
+    })
+
+
+def labels_frame():
+    return pd.DataFrame({
+        "SERVICE_CODE": ["1", "2", "3", "4", "5"],
+        "Reviewed_Code": ["11-00", "22-00", "99-00", "44-00", "55-00"],
+        "Verdict": [True, False, True, True, True],
+    })
+
+
+def test_only_judgeable_top_candidates_are_labeled():
+    labeled = label_results(results_frame(), labels_frame())
+    # 2: reviewed code marked wrong is the top candidate -> wrong
+    # 3: another code was marked correct -> the top candidate is wrong
+    # 5: no retrieval score -> left out
+    assert dict(zip(labeled["SERVICE_CODE"], labeled["Top_Is_Correct"])) == {
+        "1": True, "2": False, "3": False, "4": True
+    }
+
+
+def test_report_measures_precision_and_coverage():
+    results = results_frame()
+    report = calibration_report(results, label_results(results, labels_frame()), steps=4)
+
+    loosest = report[(report["Min_Score"] == 0.6) & (report["Min_Margin"] == 0.0)].iloc[0]
+    assert loosest["Precision"] == pytest.approx(0.5)
+    assert loosest["Coverage"] == pytest.approx(1.0)
+
+    strict = report[(report["Min_Score"] == 0.9) & (report["Min_Margin"] == 0.0)].iloc[0]
+    assert strict["Precision"] == 1.0
+    assert strict["Coverage"] == pytest.approx(0.25)
+    assert report.iloc[0]["Precision"] == 1.0
+
+
+def test_results_keep_codes_as_written(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_text(
+        "Internal_Service_Code,Retrieval_Top_Code,Retrieval_Score,Retrieval_Margin\n"
+        "01,11-00,0.9,0.2\n"
+        "NA,22-00,,\n"
+    )
+    results = read_results(str(path))
+
+    assert results["Internal_Service_Code"].tolist() == ["01", "NA"]
+    assert results["Retrieval_Score"].iloc[0] == 0.9 and np.isnan(results["Retrieval_Score"].iloc[1])
+    labels = pd.DataFrame({"SERVICE_CODE": ["01"], "Reviewed_Code": ["11-00"], "Verdict": [True]})
+    assert label_results(results, labels)["Top_Is_Correct"].tolist() == [True]
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from document_convertor import DocumentConverter
+
+
+def row_by_row(row) -> str:
+    """The original one-f-string-per-row page text the vectorized build must reproduce."""
+    return (
+        f"**Service Short Description:** {row.get('Short Description', 'Not Mentioned')}\n"
+        f"Service Long Description: {row.get('Long Description', 'Not Mentioned')}\n"
+        f"Definition: {row.get('Definition', 'Not Mentioned')}\n"
+        f"Service Category: {row.get('Block Name', 'Not Mentioned')}\n"
+        f"Service Classification: {row.get('Chapter Name', 'Not Mentioned')}\n"
+        f"Service Code: {row.get('SBS Code (Hyphenated)', 'Not Mentioned')}"
+    ).strip()
+
+
+def sbs_frame(n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "SBS Code (Hyphenated)": [f"{i:05d}-00" for i in range(n)],
+        "Short Description": [f"service {i}" for i in range(n)],
+        "Long Description": [np.nan if i % 3 == 0 else f"long {i}" for i in range(n)],
+        "Definition": [f"definition {i}" for i in range(n)],
+        "Chapter Name": ["Imaging"] * n,
+    })  # no Block Name column: filled with 'Not Mentioned'
+
+
+def test_documents_match_the_row_by_row_format():
+    sbs_df = sbs_frame(7)
+    docs = DocumentConverter().convert_sbs_to_docs(sbs_df)
+
+    assert [doc.page_content for doc in docs] == [row_by_row(row) for _, row in sbs_df.iterrows()]
+    assert docs[2].metadata == {"Service Code": "00002-00", "Short Description": "service 2"}
+
+
+def test_documents_stream_in_batches():
+    batches = list(DocumentConverter().iter_sbs_docs(sbs_frame(25), batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert batches[2][0].metadata["Service Code"] == "00020-00"
@@ -0,0 +1,95 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+from langchain.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from embedding_cache import CachedQueryEmbeddings, EmbeddingCache, cache_query_embeddings
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def vectors(n, start=0):
+    return np.arange(start, start + n, dtype=np.float32)[:, None].repeat(4, axis=1)
+
+
+def segment_count(cache):
+    return len(glob.glob(os.path.join(cache.cache_dir, "keys-*.npy")))
+
+
+def test_keys_ignore_whitespace_and_separate_model_and_kind(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    assert cache.key("knee  mri ") == cache.key("knee mri")
+    assert cache.key("knee mri", "query") != cache.key("knee mri")
+    assert EmbeddingCache(str(tmp_path), "model-b").key("knee mri") != cache.key("knee mri")
+
+
+def test_flushed_vectors_are_shared_with_a_new_process(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m", memory_items=1)
+    keys = [cache.key(f"text {i}") for i in range(5)]
+    cache.put_many(keys, vectors(5))
+    cache.flush()
+
+    other = EmbeddingCache(str(tmp_path), "m", memory_items=1)
+    found = other.get_many(keys + [other.key("unknown")])
+    assert np.array_equal(np.stack(found[:5]), vectors(5))
+    assert found[5] is None
+
+
+def test_segments_are_compacted_and_len_counts_unique_texts(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m", max_segments=3)
+    keys = [cache.key(f"text {i}") for i in range(6)]
+    for start in range(4):
+        # Overlapping writes, as two processes embedding the same texts would make
+        cache.put_many(keys[start:start + 3], vectors(3, start))
+        cache.flush()
+
+    assert segment_count(cache) == 1
+    assert len(cache) == 6
+    assert len(EmbeddingCache(str(tmp_path), "m")) == 6
+    found = EmbeddingCache(str(tmp_path), "m").get_many(keys)
+    assert np.array_equal(np.stack(found), vectors(6))
+
+
+def test_compaction_keeps_other_instances_working(tmp_path):
+    first = EmbeddingCache(str(tmp_path), "m", memory_items=0)
+    second = EmbeddingCache(str(tmp_path), "m", memory_items=0)
+    first.put_many([1, 2], vectors(2))
+    first.flush()
+    second.put_many([3], vectors(1, 2))
+    second.flush()
+
+    first.compact()
+    second.put_many([4], vectors(1, 3))
+    second.compact()
+    assert segment_count(second) == 1
+    assert np.array_equal(np.stack(EmbeddingCache(str(tmp_path), "m").get_many([1, 2, 3, 4])), vectors(4))
+
+
+def test_cached_query_embeddings_run_the_model_only_on_new_texts(tmp_path, sbs_documents):
+    embeddings = CountingEmbeddings(size=8)
+    vectorstore = cache_query_embeddings(
+        FAISS.from_documents(sbs_documents, DeterministicFakeEmbedding(size=8)),
+        EmbeddingCache(str(tmp_path), "fake")
+    )
+    cached = vectorstore.embedding_function
+    assert isinstance(cached, CachedQueryEmbeddings)
+    cached.embeddings = embeddings
+    # Routing an already cached store again keeps its cache rather than wrapping it twice
+    assert cache_query_embeddings(vectorstore, None).embedding_function is cached
+
+    first = cached.embed_documents(["knee mri", "knee  mri", "chest x-ray"])
+    again = cached.embed_documents(["chest x-ray", "knee mri"])
+
+    assert embeddings.embedded == 2
+    assert first[0] == first[1]
+    assert again == [first[2], first[0]]
+    assert cached.embed_query("knee mri") == pytest.approx(DeterministicFakeEmbedding(size=8).embed_query("knee mri"))
@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+
+import excel_cache
+from excel_cache import decode_json_columns, encode_mixed_columns, read_excel_cached
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "services.xlsx")
+    pd.DataFrame({
+        "SERVICE_CODE": [1, "01", "A7"],  # ints mixed with text, as price lists have
+        "SERVICE_DESCRIPTION": ["x-ray", "mri", None],
+        "PRICE": [10.5, 20.0, 30.0],
+    }).to_excel(path, index=False)
+    return path
+
+
+@pytest.fixture
+def excel_reads(monkeypatch):
+    reads = []
+    read_excel = pd.read_excel
+
+    def counting_read_excel(*args, **kwargs):
+        reads.append(args[0])
+        return read_excel(*args, **kwargs)
+
+    monkeypatch.setattr(excel_cache.pd, "read_excel", counting_read_excel)
+    return reads
+
+
+def test_sidecar_round_trip_keeps_mixed_types(workbook):
+    direct = pd.read_excel(workbook)
+    read_excel_cached(workbook)
+    cached = read_excel_cached(workbook)
+
+    # Parquet gives None where Excel gives NaN for empty text cells; both read as missing
+    pd.testing.assert_frame_equal(cached.isna(), direct.isna())
+    pd.testing.assert_frame_equal(cached.fillna(""), direct.fillna(""))
+    assert cached["SERVICE_CODE"].tolist() == [1, "01", "A7"]
+
+
+def test_workbook_is_converted_once(workbook, excel_reads):
+    read_excel_cached(workbook)
+    read_excel_cached(workbook)
+    os.utime(workbook)  # touched, same content: the hash check keeps the sidecar
+    read_excel_cached(workbook)
+    assert len(excel_reads) == 1
+
+
+def test_changed_workbook_is_converted_again(workbook, excel_reads):
+    read_excel_cached(workbook)
+    pd.DataFrame({"SERVICE_CODE": [2], "SERVICE_DESCRIPTION": ["ct"]}).to_excel(workbook, index=False)
+    assert read_excel_cached(workbook)["SERVICE_CODE"].tolist() == [2]
+    assert len(excel_reads) == 2
+
+
+def test_column_projection_ignores_missing_columns(workbook, tmp_path):
+    df = read_excel_cached(workbook, columns=["PRICE", "SERVICE_CODE", "NOT_THERE"],
+                           cache_dir=str(tmp_path / "cache"))
+    assert df.columns.tolist() == ["PRICE", "SERVICE_CODE"]
+    assert os.listdir(tmp_path / "cache")
+
+
+def test_json_columns_encode_only_what_arrow_cannot_store():
+    df = pd.DataFrame({"mixed": [0, "0", None], "text": ["a", "b", None]})
+    encoded = df.copy()
+    assert encode_mixed_columns(encoded) == ["mixed"]
+    pd.testing.assert_frame_equal(decode_json_columns(encoded, ["mixed"]), df)
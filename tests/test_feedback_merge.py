@@ -0,0 +1,88 @@
+import os
+
+import pandas as pd
+import pytest
+
+from feedback_merge import FEEDBACK_COLUMNS, OUTPUT_COLUMNS, FeedbackMergeEngine, find_feedback_files
+
+
+def feedback_row(code, sbs, comment="Correct"):
+    row = {column: f"{column} {code}" for column in FEEDBACK_COLUMNS}
+    row.update({"SERVICE_CODE": code, "SBS Code": sbs, "SBS Code (Hyphenated)": f"{sbs}-00", "Comment": comment})
+    return row
+
+
+def write_workbook(path, rows, bump=0):
+    pd.DataFrame(rows, columns=FEEDBACK_COLUMNS).to_excel(path, index=False)
+    # Rewrites within the same second still have to look modified
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 1_000_000_000))
+    return str(path)
+
+
+@pytest.fixture
+def mappings(tmp_path):
+    path = tmp_path / "mappings.xlsx"
+    rows = [{"INSURANCE_COMPANY": "A", "SERVICE_CODE": code, "PRICE": 10.0, "SBS Code": 1}
+            for code in [1, 2, 3]]
+    pd.DataFrame(rows).reindex(columns=OUTPUT_COLUMNS).to_excel(path, index=False)
+    return str(path)
+
+
+def sbs_codes(frame):
+    return dict(zip(frame["SERVICE_CODE"].astype(str), frame["SBS Code"]))
+
+
+def test_later_workbook_wins_and_unchanged_workbooks_are_skipped(tmp_path):
+    a = write_workbook(tmp_path / "a.xlsx", [feedback_row(1, 111), feedback_row(2, 222, "In Correct")])
+    b = write_workbook(tmp_path / "b.xlsx", [feedback_row(1, 999)])
+    engine = FeedbackMergeEngine(str(tmp_path / "state"))
+
+    assert engine.ingest([a, b]) == 1
+    assert engine.corrections.loc["1", "SBS Code"] == 999
+    assert "2" not in engine.corrections.index
+    assert FeedbackMergeEngine(str(tmp_path / "state")).ingest([a, b]) == 0
+
+
+def test_withdrawal_keeps_the_code_while_another_workbook_marks_it(tmp_path):
+    a = write_workbook(tmp_path / "a.xlsx", [feedback_row(1, 111)])
+    b = write_workbook(tmp_path / "b.xlsx", [feedback_row(1, 111)])
+    engine = FeedbackMergeEngine(str(tmp_path / "state"))
+    engine.ingest([a, b])
+
+    write_workbook(a, [feedback_row(1, 111, "In Correct")], bump=1)
+    engine = FeedbackMergeEngine(str(tmp_path / "state"))
+    engine.ingest([a, b])
+    assert engine.corrections.loc["1", "SBS Code"] == 111
+
+    write_workbook(b, [feedback_row(9, 900)], bump=1)
+    engine.ingest([a, b])
+    assert "1" not in engine.corrections.index
+
+
+def test_incremental_apply_matches_a_full_rebuild(tmp_path, mappings):
+    a = write_workbook(tmp_path / "a.xlsx", [feedback_row(1, 111)])
+    engine = FeedbackMergeEngine(str(tmp_path / "state"))
+    engine.ingest([a])
+    output = str(tmp_path / "corrected.parquet")
+    assert sbs_codes(engine.apply(mappings, output)) == {"1": 111, "2": 1, "3": 1}
+
+    write_workbook(a, [feedback_row(1, 111), feedback_row(3, 333)], bump=1)
+    engine.ingest([a])
+    patched = engine.apply(mappings, output)
+    rebuilt = FeedbackMergeEngine(str(tmp_path / "fresh"))
+    rebuilt.ingest([a])
+    full = rebuilt.apply(mappings, str(tmp_path / "full.parquet"))
+
+    assert sbs_codes(patched) == sbs_codes(full) == {"1": 111, "2": 1, "3": 333}
+    assert sbs_codes(pd.read_parquet(output)) == sbs_codes(patched)
+
+
+def test_find_feedback_files_lists_workbooks_oldest_first(tmp_path):
+    folder = tmp_path / "feedback"
+    folder.mkdir()
+    new = write_workbook(folder / "new.xlsx", [], bump=10)
+    old = write_workbook(folder / "old.xlsx", [])
+    (folder / "~$old.xlsx").write_text("lock")
+    (folder / "notes.txt").write_text("x")
+    assert find_feedback_files([str(folder), "extra.xlsx"]) == [old, new, "extra.xlsx"]
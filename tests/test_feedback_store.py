@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from feedback_store import DebouncedCsvExport, FeedbackStore
+
+COLUMNS = ["INSURANCE_COMPANY", "SERVICE_CODE", "Validation (Correct / In Correct)", "Validated By"]
+
+
+def feedback(company, code, verdict="Correct", by="ann"):
+    return {"INSURANCE_COMPANY": company, "SERVICE_CODE": code,
+            "Validation (Correct / In Correct)": verdict, "Validated By": by}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeedbackStore(str(tmp_path / "feedback.sqlite"), COLUMNS)
+
+
+def test_upsert_replaces_the_row_for_company_and_code(store):
+    store.upsert(feedback("A", 1))
+    store.upsert(feedback("A", 1, verdict="In Correct", by="bob"))
+    store.upsert(feedback("B", 1))
+
+    assert store.get("A", 1)["Validated By"] == "bob"
+    assert len(store.load_frame()) == 2
+    assert store.get("A", "1") is None  # int and text codes stay distinct
+
+
+def test_legacy_csv_is_imported_once(tmp_path):
+    legacy = tmp_path / "validated.csv"
+    pd.DataFrame([feedback("A", 1), feedback("A", 2)]).to_csv(legacy, index=False)
+    db = str(tmp_path / "feedback.sqlite")
+    FeedbackStore(db, COLUMNS, legacy_csv=str(legacy))
+    pd.DataFrame([feedback("A", 3)]).to_csv(legacy, index=False)
+
+    assert len(FeedbackStore(db, COLUMNS, legacy_csv=str(legacy)).load_frame()) == 2
+
+
+def test_concurrent_saves_are_all_kept(store):
+    threads = [threading.Thread(target=store.upsert, args=(feedback("A", code),)) for code in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.load_frame()) == 20
+
+
+def test_debounced_export_writes_one_csv_per_burst(store, tmp_path, monkeypatch):
+    path = tmp_path / "validated.csv"
+    export = DebouncedCsvExport(store, str(path), delay=0.3)
+    exports = []
+    export_csv = store.export_csv
+    monkeypatch.setattr(store, "export_csv", lambda p: (exports.append(p), export_csv(p)))
+
+    for code in range(5):
+        store.upsert(feedback("A", code))
+    for _ in range(5):
+        export.schedule()
+    assert not path.exists()
+    time.sleep(0.6)
+
+    assert len(exports) == 1
+    assert len(pd.read_csv(path)) == 5
+
+
+def test_flush_exports_at_once(store, tmp_path):
+    path = tmp_path / "validated.csv"
+    export = DebouncedCsvExport(store, str(path), delay=60)
+    store.upsert(feedback("A", 1))
+    export.schedule()
+    export.flush()
+    assert pd.read_csv(path)["SERVICE_CODE"].tolist() == [1]
+    assert export._timer is None
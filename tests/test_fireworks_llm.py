@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from answer_parser import AnswerParser
+from fireworks_llm import SYSTEM_MESSAGE, FireworksLLM, TruncatedAnswerError
+from instrumentation import METRICS
+from llm_cache import LLMResponseCache
+from rate_limiting import TokenBucket
+from stub_llm_server import StubLLMServer
+
+PROMPT = "Service Code: 11-00\nService Short Description: chest x-ray\n\nQuestion: map it"
+
+
+@pytest.fixture
+def stub():
+    server = StubLLMServer().start()
+    yield server
+    server.stop()
+
+
+def make_llm(stub, **kwargs):
+    METRICS.reset()
+    return FireworksLLM(model="stub", api_key="test", base_url=stub.base_url, **kwargs)
+
+
+def test_clients_are_shared_per_connection_settings(stub):
+    llm = make_llm(stub)
+    assert llm._get_client() is make_llm(stub)._get_client()
+    assert llm._get_client() is not make_llm(stub, read_timeout=5)._get_client()
+
+
+def test_sdk_does_not_retry_on_its_own(stub):
+    # call_with_retry is the only retry loop, so its rate limiting and retry counts hold
+    assert make_llm(stub)._get_client().max_retries == 0
+
+
+def test_answer_and_usage(stub):
+    llm = make_llm(stub)
+    assert "Best SBS Code: 11-00" in llm.invoke(PROMPT)
+    counters = METRICS.snapshot()["counters"]
+    assert counters["llm_requests"] == 1 and counters["llm_completion_tokens"] > 0
+
+
+def test_cached_answer_skips_the_request(stub, tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    first = make_llm(stub, response_cache=cache).invoke(PROMPT)
+    assert make_llm(stub, response_cache=cache).invoke(PROMPT) == first
+    assert stub.requests == 1
+    assert METRICS.snapshot()["counters"]["llm_cache_hits"] == 1
+
+
+def test_async_call(stub):
+    assert "Best SBS Code: 11-00" in asyncio.run(make_llm(stub).ainvoke(PROMPT))
+
+
+@pytest.fixture
+def chatty():
+    server = StubLLMServer(tail_tokens=300, token_latency=0.002).start()
+    yield server
+    server.stop()
+
+
+def test_stream_stops_once_the_answer_is_complete(chatty):
+    answer = make_llm(chatty, streaming=True).invoke(PROMPT)
+
+    assert AnswerParser().parse_llm_answer(answer)[0] == "11-00"
+    assert "The candidate matches" not in answer
+    assert METRICS.snapshot()["counters"]["llm_streams_stopped_early"] == 1
+    assert chatty.output_tokens < 100
+
+
+def test_async_stream_stops_early(chatty):
+    answer = asyncio.run(make_llm(chatty, streaming=True).ainvoke(PROMPT))
+    assert AnswerParser().parse_llm_answer(answer)[0] == "11-00"
+    assert METRICS.snapshot()["counters"]["llm_streams_stopped_early"] == 1
+
+
+def test_truncated_answers_raise_and_are_not_cached(chatty, tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    llm = make_llm(chatty, response_cache=cache, max_tokens=5)
+    for _ in range(2):
+        with pytest.raises(TruncatedAnswerError):
+            llm.invoke(PROMPT)
+
+    assert chatty.requests == 2
+    assert METRICS.snapshot()["counters"]["llm_truncated"] == 2
+
+
+def test_max_tokens_scales_with_batch_items(stub):
+    llm = make_llm(stub, max_tokens=40)
+    assert llm._request(PROMPT, None, None)["max_tokens"] == 40
+    assert llm._request(PROMPT, None, ["1", "2", "3"])["max_tokens"] == 120
+    assert "max_tokens" not in make_llm(stub)._request(PROMPT, None, None)
+
+
+def test_cache_key_separates_caps_stops_and_streaming(stub, tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    keys = {
+        make_llm(stub, response_cache=cache, **kwargs)._cached(PROMPT, stop, None)[0]
+        for kwargs, stop in [({}, None), ({"max_tokens": 40}, None), ({"streaming": True}, None), ({}, ["\n\n"])]
+    }
+    assert len(keys) == 4
+    # Default settings keep the key entries were cached under before these options existed
+    plain = make_llm(stub, response_cache=cache)._cached(PROMPT, None, None)[0]
+    assert plain == LLMResponseCache.make_key(SYSTEM_MESSAGE, PROMPT, "stub", 0, 0)
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(rate=1000)
+        self.taken = 0
+
+    def acquire(self, tokens=1.0):
+        self.taken += 1
+        super().acquire(tokens)
+
+
+def test_only_requests_sent_take_a_rate_limiter_token(stub, tmp_path):
+    bucket = CountingBucket()
+    llm = make_llm(stub, response_cache=LLMResponseCache(str(tmp_path / "llm.sqlite")), rate_limiter=bucket)
+    for _ in range(3):
+        llm.invoke(PROMPT)
+    asyncio.run(llm.ainvoke(PROMPT))
+    assert bucket.taken == 1
+
+    asyncio.run(llm.ainvoke(PROMPT + " again"))
+    assert bucket.taken == 2
+    assert stub.requests == 2
@@ -0,0 +1,42 @@
+import faiss
+import numpy as np
+import pytest
+
+from index_report import index_report
+from vector_store import compact_index
+
+
+@pytest.fixture
+def flat_index():
+    vectors = np.random.default_rng(0).standard_normal((600, 32)).astype(np.float32)
+    index = faiss.IndexFlatL2(32)
+    index.add(vectors)
+    return index
+
+
+def test_compact_index_keeps_positions_and_metric(flat_index):
+    compact = compact_index(flat_index, "sq16")
+    query = flat_index.reconstruct_n(0, 5)
+
+    assert compact.ntotal == flat_index.ntotal
+    assert compact.metric_type == flat_index.metric_type
+    assert (compact.search(query, 1)[1].ravel() == np.arange(5)).all()
+
+
+def test_compact_index_rejects_unknown_types_and_small_pq():
+    small = faiss.IndexFlatL2(8)
+    small.add(np.ones((10, 8), dtype=np.float32))
+    with pytest.raises(ValueError):
+        compact_index(small, "lsh")
+    with pytest.raises(ValueError):
+        compact_index(small, "ivfpq")
+
+
+def test_report_measures_recall_against_the_flat_index(flat_index):
+    queries = np.random.default_rng(1).standard_normal((50, 32)).astype(np.float32)
+    report = index_report(flat_index, queries, ["sq16", "ivf"], k=3).set_index("Index_Type")
+
+    assert report.loc["flat", "Recall_at_3"] == 1.0
+    assert report.loc["sq16", "Recall_at_3"] > 0.9
+    assert report.loc["sq16", "Size_vs_Flat"] < 0.6
+    assert 0 < report.loc["ivf", "Recall_at_3"] <= 1.0
@@ -0,0 +1,75 @@
+import json
+import threading
+
+import pytest
+
+import instrumentation
+from instrumentation import Metrics, MetricsFlusher
+
+
+def test_spans_counters_and_gauges_are_snapshotted():
+    metrics = Metrics()
+    for seconds in [0.1, 0.2, 0.3, 0.4]:
+        metrics.observe("llm_request", seconds)
+    metrics.inc("retries")
+    metrics.inc("retries", 2)
+    metrics.set_gauge("queue_depth", 7)
+
+    snapshot = metrics.snapshot()
+    span = snapshot["spans"]["llm_request"]
+    assert span["count"] == 4
+    assert span["total_seconds"] == pytest.approx(1.0)
+    assert span["p50_seconds"] == pytest.approx(0.25)
+    assert span["max_seconds"] == 0.4
+    assert snapshot["counters"] == {"retries": 3}
+    assert snapshot["gauges"] == {"queue_depth": 7}
+
+
+def test_span_memory_is_bounded_while_totals_stay_exact(monkeypatch):
+    monkeypatch.setattr(instrumentation, "SPAN_WINDOW", 10)
+    metrics = Metrics()
+    for i in range(1000):
+        metrics.observe("request", 100.0 if i == 0 else 1.0)
+
+    span = metrics.snapshot()["spans"]["request"]
+    assert len(metrics.spans["request"].recent) == 10
+    assert span["count"] == 1000
+    assert span["total_seconds"] == pytest.approx(1099.0)
+    assert span["max_seconds"] == 100.0
+    assert span["p95_seconds"] == 1.0
+
+
+def test_concurrent_increments_are_not_lost():
+    metrics = Metrics()
+    threads = [threading.Thread(target=lambda: [metrics.inc("n") for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.snapshot()["counters"]["n"] == 8000
+
+
+def test_summary_estimates_tokens_per_service_and_cost():
+    metrics = Metrics()
+    metrics.inc("llm_requests", 2)
+    metrics.inc("llm_prompt_tokens", 3000)
+    metrics.inc("llm_completion_tokens", 1000)
+
+    summary = metrics.summary(n_services=4, prompt_price=1.0, completion_price=2.0)
+    assert summary["tokens_per_service"] == 1000
+    assert summary["estimated_cost_usd"] == pytest.approx(0.005)
+    assert summary["llm_requests"] == 2
+
+
+def test_prometheus_text_and_final_flush(tmp_path):
+    metrics = Metrics()
+    metrics.observe("retrieval", 0.5)
+    metrics.inc("llm_requests")
+    text = metrics.to_prometheus()
+    assert 'mapper_span_seconds_count{span="retrieval"} 1' in text
+    assert "mapper_llm_requests_total 1" in text
+
+    json_path, prom_path = tmp_path / "metrics.json", tmp_path / "metrics.prom"
+    MetricsFlusher(metrics, str(json_path), str(prom_path), interval=60).start().stop(extra={"run": "done"})
+    assert json.loads(json_path.read_text())["run"] == "done"
+    assert prom_path.read_text() == text
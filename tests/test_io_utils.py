@@ -0,0 +1,28 @@
+import os
+
+import numpy as np
+import pytest
+
+from io_utils import atomic_path, to_python, write_text_atomic
+
+
+def test_to_python_converts_numpy_scalars_and_nan():
+    assert to_python(np.int64(3)) == 3 and type(to_python(np.int64(3))) is int
+    assert to_python(np.float32(0.5)) == 0.5
+    assert to_python(np.float64("nan")) is None
+    assert to_python(float("nan")) is None
+    assert to_python("A1") == "A1"
+
+
+def test_atomic_write_replaces_only_on_success(tmp_path):
+    path = str(tmp_path / "out.txt")
+    write_text_atomic(path, "first")
+
+    with pytest.raises(RuntimeError):
+        with atomic_path(path) as tmp:
+            with open(tmp, "w") as f:
+                f.write("half")
+            raise RuntimeError("writer failed")
+
+    assert open(path).read() == "first"
+    assert os.listdir(tmp_path) == ["out.txt"]
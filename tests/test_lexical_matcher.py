@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from lexical_matcher import LexicalMatcher, normalize_for_matching
+
+
+@pytest.fixture
+def sbs():
+    return pd.DataFrame({
+        "SBS Code (Hyphenated)": ["11-00", "22-00", "33-00"],
+        "Short Description": ["X-Ray chest, two views", "Paracetamol tablet 500mg", "MRI knee"],
+        "Long Description": ["Radiograph of the chest", None, "Magnetic resonance imaging of the knee"],
+    }, index=[10, 20, 30])
+
+
+def test_normalization_ignores_case_punctuation_abbreviations_and_word_order():
+    normalized = normalize_for_matching(pd.Series(["Tab. Paracetamol 500mg", "paracetamol TABLET 500MG", None]))
+    assert normalized[0] == normalized[1]
+    assert normalized[2] == ""
+    assert normalize_for_matching(pd.Series(["Knee w/o contrast"]))[0] == "CONTRAST KNEE WITHOUT"
+
+
+def test_best_match_per_description(sbs):
+    matcher = LexicalMatcher(threshold=0.9).fit(sbs)
+    found = matcher.best_matches(pd.Series(["chest x-ray two views", "Paracetamol TAB 500mg", "appendectomy"],
+                                           index=["a", "b", "c"]))
+
+    assert found.loc["a", "sbs_row"] == 10 and found.loc["a", "LEXICAL_SCORE"] == pytest.approx(1.0)
+    assert found.loc["b", "sbs_row"] == 20 and found.loc["b", "LEXICAL_SCORE"] >= 0.9
+    assert found.loc["c", "LEXICAL_SCORE"] < 0.9
+
+
+def test_long_descriptions_are_matched_too(sbs):
+    found = LexicalMatcher().fit(sbs).best_matches(pd.Series(["magnetic resonance imaging of the knee"]))
+    assert found["sbs_row"].iloc[0] == 30
+
+
+def test_scores_do_not_depend_on_chunk_size(sbs):
+    descriptions = pd.Series(["chest x-ray", "mri knee", "tablet paracetamol", "knee"])
+    whole = LexicalMatcher(chunk_size=500).fit(sbs).best_matches(descriptions)
+    chunked = LexicalMatcher(chunk_size=1).fit(sbs).best_matches(descriptions)
+    pd.testing.assert_frame_equal(whole, chunked)
+
+
+def test_unfitted_matcher_raises():
+    with pytest.raises(ValueError):
+        LexicalMatcher().best_matches(pd.Series(["x"]))
+
+
+def test_numbers_must_match_exactly():
+    sbs = pd.DataFrame({
+        "Short Description": ["Paracetamol 1000mg tablet", "Paracetamol 500mg tablet", "Paracetamol 50mg tablet"],
+        "Long Description": [None, None, None],
+    }, index=[1, 2, 3])
+    queries = pd.Series(["PARACETAMOL 100MG TAB", "PARACETAMOL 5000MG TAB", "paracetamol tab 500 mg", "Paracetamol tab"])
+    found = LexicalMatcher().fit(sbs).best_matches(queries)
+
+    # Near-identical text with another strength would score above 0.9 without the number check
+    assert found["LEXICAL_SCORE"].iloc[0] == 0
+    assert found["LEXICAL_SCORE"].iloc[1] == 0
+    assert found["sbs_row"].iloc[2] == 2 and found["LEXICAL_SCORE"].iloc[2] >= 0.9
+    assert found["LEXICAL_SCORE"].iloc[3] == 0
@@ -0,0 +1,74 @@
+import itertools
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() advancing one second per call, so access order is unambiguous."""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(llm_cache.time, "time", lambda: float(next(ticks)))
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("evict_every", 10_000)
+    return LLMResponseCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_key_covers_every_request_parameter():
+    base = LLMResponseCache.make_key("system", "prompt", "model", 0, 0)
+    assert base == LLMResponseCache.make_key("system", "prompt", "model", 0, 0)
+    assert base != LLMResponseCache.make_key("system", "prompt!", "model", 0, 0)
+    assert base != LLMResponseCache.make_key("system", "prompt", "other", 0, 0)
+    assert base != LLMResponseCache.make_key("system", "prompt", "model", 0.5, 0)
+    assert base != LLMResponseCache.make_key("system", "prompt", "model", 0, 0, max_tokens=64)
+
+
+def test_put_get_and_hit_rate(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", "answer", model="m")
+    assert cache.get("k") == "answer"
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_persists_across_instances(tmp_path):
+    make_cache(tmp_path).put("k", "answer")
+    assert make_cache(tmp_path).get("k") == "answer"
+
+
+def test_evicts_least_recently_used_beyond_max_entries(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.evict() == 1
+    assert [cache.get(key) for key in "abc"] == ["1", None, "3"]
+
+
+def test_evicts_beyond_max_bytes(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=10)
+    for key in "abc":
+        cache.put(key, "x" * 4)
+    cache.evict()
+    assert cache.stats()["bytes"] <= 10
+    assert cache.get("a") is None and cache.get("c") == "xxxx"
+
+
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = make_cache(tmp_path, max_age_seconds=5)
+    cache.put("k", "answer")
+    for _ in range(10):
+        llm_cache.time.time()
+    assert cache.get("k") is None
+
+
+def test_eviction_runs_every_evict_every_puts(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=1, evict_every=3)
+    for key in "abc":
+        cache.put(key, "x")
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from mapping_index import MappingIndex
+
+
+def mappings():
+    return pd.DataFrame({
+        "INSURANCE_COMPANY": ["B", "A", "A", "A", "B"],
+        "SERVICE_DESCRIPTION": ["mri", "x-ray", "x-ray", "cbc", "mri"],
+        "SERVICE_CODE": [7, 10, "A1", 2, 8],
+    })
+
+
+def test_companies_and_options_are_sorted_numbers_first():
+    index = MappingIndex(mappings())
+    a = index.company("A")
+
+    assert index.companies == ["A", "B"]
+    assert a.descriptions == ["cbc", "x-ray"]
+    assert a.codes == [2, 10, "A1"]
+    assert index.company("C") is None
+
+
+def test_lookup_matches_a_boolean_mask_scan():
+    df = mappings()
+    a = MappingIndex(df).company("A")
+
+    for description, code in [(None, None), ("x-ray", None), (None, "A1"), ("x-ray", 10), ("cbc", 10)]:
+        mask = df["INSURANCE_COMPANY"] == "A"
+        if description is not None:
+            mask &= df["SERVICE_DESCRIPTION"] == description
+        if code is not None:
+            mask &= df["SERVICE_CODE"] == code
+        assert list(a.lookup(description, code)) == list(np.flatnonzero(mask))
+
+
+def test_lookup_of_unknown_option_is_empty():
+    a = MappingIndex(mappings()).company("A")
+    assert len(a.lookup(description="mri")) == 0
+    assert len(a.lookup(code=99)) == 0
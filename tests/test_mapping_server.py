@@ -0,0 +1,81 @@
+import threading
+
+import httpx
+import pytest
+from langchain.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from answer_parser import AnswerParser
+from mapping_server import MappingServer, MappingService, MicroBatcher
+from prompt import prompt_template
+from service_mapper import ServiceMapper
+from stub_llm_server import StubLLMServer
+
+
+def test_concurrent_submits_share_one_call():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or [item * 2 for item in items],
+                           max_batch=10, max_wait=60)
+    results = {}
+    threads = [threading.Thread(target=lambda n=n: results.update({n: batcher.submit([n, n + 10])}))
+               for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.stop()
+
+    assert results == {n: [2 * n, 2 * n + 20] for n in range(5)}
+    assert len(calls) == 1 and len(calls[0]) == 10
+
+
+def test_full_batch_goes_out_without_waiting_and_errors_reach_every_caller():
+    batcher = MicroBatcher(lambda items: [len(items)] * len(items), max_batch=2, max_wait=60)
+    assert batcher.submit([1, 2]) == [2, 2]
+    assert batcher.submit([]) == []
+    batcher.stop()
+
+    failing = MicroBatcher(lambda items: 1 / 0, max_wait=0)
+    with pytest.raises(ZeroDivisionError):
+        failing.submit(["x"])
+    failing.stop()
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, sbs_documents):
+    monkeypatch.setenv("FIREWORKS_NEW_API_KEY", "test")
+    stub = StubLLMServer().start()
+    mapper = ServiceMapper(
+        FAISS.from_documents(sbs_documents, DeterministicFakeEmbedding(size=8)), prompt_template, AnswerParser(),
+        results_file=str(tmp_path / "results.csv"), failures_file=str(tmp_path / "failures.csv"),
+        max_retries=0, llm_base_url=stub.base_url
+    )
+    server = MappingServer(MappingService(mapper, max_wait=0.05), port=0).start()
+    yield server, stub
+    server.stop()
+    stub.stop()
+
+
+def test_map_answers_single_and_batched_requests(server):
+    server, stub = server
+    single = httpx.post(f"{server.url}/map", json={"SERVICE_CODE": "A1", "SERVICE_DESCRIPTION": "Chest X-Ray"})
+    batched = httpx.post(f"{server.url}/map", json={"services": [
+        {"SERVICE_CODE": "A2", "SERVICE_DESCRIPTION": "Knee MRI"},
+        {"SERVICE_CODE": "A3", "SERVICE_DESCRIPTION": "knee  mri"},
+    ]})
+
+    assert single.status_code == batched.status_code == 200
+    assert single.json()["results"][0]["Internal_Service_Code"] == "A1"
+    rows = batched.json()["results"]
+    assert [row["Internal_Service_Code"] for row in rows] == ["A2", "A3"]
+    assert rows[0]["Matched_SBS_Code"] == rows[1]["Matched_SBS_Code"]
+    assert stub.requests == 2
+
+
+def test_bad_requests_and_health(server):
+    server, _ = server
+    assert httpx.post(f"{server.url}/map", json={"SERVICE_CODE": "A1"}).status_code == 400
+    assert httpx.post(f"{server.url}/other", json={}).status_code == 404
+    health = httpx.get(f"{server.url}/health").json()
+    assert health["status"] == "ok"
+    assert "counters" in health["metrics"]
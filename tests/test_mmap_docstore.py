@@ -0,0 +1,30 @@
+import pytest
+from langchain.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from mmap_docstore import MmapDocstore
+from vector_store import VectorstoreBuilder
+
+
+def test_written_documents_read_back_by_faiss_position(tmp_path, sbs_documents):
+    vectorstore = FAISS.from_documents(sbs_documents, DeterministicFakeEmbedding(size=8))
+    assert not MmapDocstore.exists(str(tmp_path))
+    MmapDocstore.write(str(tmp_path), vectorstore.docstore, vectorstore.index_to_docstore_id)
+
+    docstore, index_to_docstore_id = MmapDocstore.open(str(tmp_path))
+    assert index_to_docstore_id == vectorstore.index_to_docstore_id
+    for doc_id in index_to_docstore_id.values():
+        assert docstore.search(doc_id) == vectorstore.docstore.search(doc_id)
+    with pytest.raises(KeyError):
+        docstore.search("missing")
+
+
+def test_cached_index_is_served_from_the_mmap_docstore(tmp_path, sbs_documents):
+    builder = VectorstoreBuilder("fake-8", cache_dir=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=8))
+    built = builder.create_faiss_index(sbs_documents)
+    cached = builder.create_faiss_index(sbs_documents)
+
+    assert isinstance(cached.docstore, MmapDocstore)
+    query = "knee mri"
+    assert [doc for doc, _ in cached.similarity_search_with_score(query, k=3)] == \
+        [doc for doc, _ in built.similarity_search_with_score(query, k=3)]
@@ -0,0 +1,96 @@
+import time
+
+import httpx
+import openai
+import pytest
+
+import rate_limiting
+from instrumentation import METRICS
+from rate_limiting import TokenBucket, call_with_retry, is_retryable_error
+
+
+def status_error(status_code: int, headers=None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    response = httpx.Response(status_code, request=request, headers=headers or {})
+    return openai.APIStatusError("failed", response=response, body=None)
+
+
+class Flaky:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    slept = []
+    monkeypatch.setattr(rate_limiting.time, "sleep", slept.append)
+    METRICS.reset()
+    return slept
+
+
+def test_retryable_errors():
+    request = httpx.Request("POST", "http://llm.test")
+    assert is_retryable_error(openai.APIConnectionError(request=request))
+    assert is_retryable_error(status_error(429))
+    assert is_retryable_error(status_error(503))
+    assert not is_retryable_error(status_error(400))
+    assert not is_retryable_error(ValueError("bad answer"))
+
+
+def test_retries_until_success_and_counts_retries():
+    fn = Flaky([status_error(429), status_error(500)])
+    assert call_with_retry(fn, max_retries=5) == "ok"
+    assert fn.calls == 3
+    assert METRICS.snapshot()["counters"]["retries"] == 2
+
+
+def test_gives_up_after_max_retries():
+    fn = Flaky([status_error(500)] * 3)
+    with pytest.raises(openai.APIStatusError):
+        call_with_retry(fn, max_retries=2)
+    assert fn.calls == 3
+
+
+def test_non_retryable_error_is_raised_at_once():
+    fn = Flaky([status_error(400)])
+    with pytest.raises(openai.APIStatusError):
+        call_with_retry(fn)
+    assert fn.calls == 1
+
+
+def test_retry_after_header_sets_the_minimum_delay(no_sleep):
+    call_with_retry(Flaky([status_error(429, {"retry-after": "7"})]), base_delay=0.01)
+    assert no_sleep == [7.0]
+
+
+def test_every_attempt_takes_a_rate_limiter_token():
+    class CountingBucket:
+        acquired = 0
+
+        def acquire(self):
+            self.acquired += 1
+
+    bucket = CountingBucket()
+    call_with_retry(Flaky([status_error(429)]), rate_limiter=bucket)
+    assert bucket.acquired == 2
+
+
+def test_token_bucket_paces_requests(monkeypatch):
+    monkeypatch.undo()  # real sleeps
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from result_store import CsvResultSink, SQLiteResultSink
+
+RESULT_COLS = ["Internal_Service_Code", "Matched_SBS_Code"]
+FAILURE_COLS = ["SERVICE_CODE", "Error"]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "results.csv"), str(tmp_path / "failures.csv")
+
+
+def read(path) -> pd.DataFrame:
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def test_csv_sink_buffers_rows_until_flush_every(paths):
+    sink = CsvResultSink(*paths, flush_every=2)
+    sink.open(RESULT_COLS, FAILURE_COLS)
+    sink.add_result({"Internal_Service_Code": "01", "Matched_SBS_Code": "11-00"})
+    assert read(paths[0]).empty
+    sink.add_result({"Internal_Service_Code": "02", "Matched_SBS_Code": "22-00"})
+    sink.add_failure({"SERVICE_CODE": "03", "Error": "timeout"})
+    sink.close()
+
+    assert read(paths[0])["Internal_Service_Code"].tolist() == ["01", "02"]
+    assert read(paths[1]).to_dict("records") == [{"SERVICE_CODE": "03", "Error": "timeout"}]
+    assert CsvResultSink(*paths).done_codes() == {"01", "02"}
+
+
+def test_csv_sink_drops_a_half_written_row_and_extends_the_header(paths):
+    with open(paths[0], "w") as f:
+        f.write("Internal_Service_Code\n01\n02,partial")
+    sink = CsvResultSink(*paths)
+    sink.open(RESULT_COLS, FAILURE_COLS)
+    sink.add_result({"Internal_Service_Code": "03", "Matched_SBS_Code": "33-00"})
+    sink.close()
+
+    assert read(paths[0]).to_dict("records") == [
+        {"Internal_Service_Code": "01", "Matched_SBS_Code": ""},
+        {"Internal_Service_Code": "03", "Matched_SBS_Code": "33-00"},
+    ]
+
+
+def test_sqlite_sink_checkpoints_and_exports_csv(paths, tmp_path):
+    sink = SQLiteResultSink(str(tmp_path / "checkpoint.sqlite"), *paths, commit_every=1)
+    sink.open(RESULT_COLS, FAILURE_COLS)
+    sink.add_result({"Internal_Service_Code": "A1", "Matched_SBS_Code": "11-00"})
+    sink.add_failure({"SERVICE_CODE": "A2", "Error": "bad answer"})
+    assert sink.is_done("A1") and not sink.is_done("A2")
+    sink.close()
+
+    assert read(paths[0]).to_dict("records") == [{"Internal_Service_Code": "A1", "Matched_SBS_Code": "11-00"}]
+    assert read(paths[1])["SERVICE_CODE"].tolist() == ["A2"]
+
+
+def test_sqlite_sink_imports_legacy_csv_verbatim(paths, tmp_path):
+    pd.DataFrame({"Internal_Service_Code": ["01", "A7", "NA"], "Matched_SBS_Code": ["0012-00", "", "1"]}).to_csv(
+        paths[0], index=False
+    )
+    sink = SQLiteResultSink(str(tmp_path / "checkpoint.sqlite"), *paths)
+    assert sink.done_codes() == {"01", "A7", "NA"}
+    sink.open(RESULT_COLS, FAILURE_COLS)
+    sink.close()
+
+    exported = read(paths[0])
+    assert exported["Internal_Service_Code"].tolist() == ["01", "A7", "NA"]
+    assert exported["Matched_SBS_Code"].tolist() == ["0012-00", "", "1"]
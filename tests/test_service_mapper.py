@@ -0,0 +1,144 @@
+import pandas as pd
+import pytest
+from langchain.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from answer_parser import AnswerParser
+from prompt import prompt_template
+from service_mapper import ServiceMapper
+from stub_llm_server import StubLLMServer
+from verified_lookup import VerifiedLookup
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setenv("FIREWORKS_NEW_API_KEY", "test")
+    server = StubLLMServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def vectorstore(sbs_documents):
+    return FAISS.from_documents(sbs_documents, DeterministicFakeEmbedding(size=8))
+
+
+def services(*rows) -> pd.DataFrame:
+    return pd.DataFrame(
+        [{"SERVICE_CODE": code, "SERVICE_DESCRIPTION": description,
+          "SERVICE_CLASSIFICATION": "Radiology", "SERVICE_CATEGORY": "Imaging"}
+         for code, description in rows]
+    )
+
+
+def make_mapper(tmp_path, vectorstore, stub, **kwargs) -> ServiceMapper:
+    return ServiceMapper(
+        vectorstore, prompt_template, AnswerParser(),
+        results_file=str(tmp_path / "results.csv"), failures_file=str(tmp_path / "failures.csv"),
+        max_retries=0, llm_base_url=stub.base_url, **kwargs
+    )
+
+
+def read_results(tmp_path) -> pd.DataFrame:
+    return pd.read_csv(tmp_path / "results.csv", dtype=str)
+
+
+def test_identical_services_share_one_query(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"), ("A2", "  chest   x-ray "), ("A3", "Knee MRI"))
+    plan = make_mapper(tmp_path, vectorstore, stub)._plan_queries(df)
+
+    assert [members["SERVICE_CODE"].tolist() for _, members in plan] == [["A1", "A2"], ["A3"]]
+    assert all("Service Code" not in query for query, _ in plan)
+
+
+def test_without_dedupe_every_service_is_its_own_query(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"), ("A2", "chest x-ray"))
+    plan = make_mapper(tmp_path, vectorstore, stub, dedupe_queries=False)._plan_queries(df)
+    assert [query.splitlines()[0] for query, _ in plan] == ["Service Code: A1", "Service Code: A2"]
+
+
+def test_deduplicated_answer_is_written_for_every_member(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"), ("A2", "chest x-ray"), ("A3", "Knee MRI"))
+    make_mapper(tmp_path, vectorstore, stub).map_service_codes(df)
+
+    results = read_results(tmp_path)
+    assert sorted(results["Internal_Service_Code"]) == ["A1", "A2", "A3"]
+    assert stub.requests == 2
+    assert results["Match_Source"].eq("llm").all()
+
+
+def test_resumed_run_skips_mapped_codes(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"), ("A2", "Knee MRI"))
+    make_mapper(tmp_path, vectorstore, stub).map_service_codes(df.iloc[:1])
+    make_mapper(tmp_path, vectorstore, stub).map_service_codes(df)
+
+    assert stub.requests == 2
+    assert sorted(read_results(tmp_path)["Internal_Service_Code"]) == ["A1", "A2"]
+
+
+def test_capped_answers_are_failures_not_results(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"), ("A2", "Knee MRI"))
+    make_mapper(tmp_path, vectorstore, stub, llm_max_tokens=8).map_service_codes(df)
+
+    assert read_results(tmp_path).empty
+    failures = pd.read_csv(tmp_path / "failures.csv", dtype=str)
+    assert sorted(failures["SERVICE_CODE"]) == ["A1", "A2"]
+
+
+def test_batched_requests_map_every_query(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"), ("A2", "Blood Culture"), ("A3", "Knee MRI"))
+    make_mapper(tmp_path, vectorstore, stub, batch_size=2).map_service_codes(df)
+
+    results = read_results(tmp_path)
+    assert sorted(results["Internal_Service_Code"]) == ["A1", "A2", "A3"]
+    assert (results["Matched_SBS_Code"] == results["Retrieval_Top_Code"]).all()
+    assert stub.requests == 2
+
+
+def test_decisive_retrieval_skips_the_llm(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"), ("A2", "Knee MRI"))
+    make_mapper(tmp_path, vectorstore, stub, cascade_min_score=-1e9).map_service_codes(df)
+
+    results = read_results(tmp_path)
+    assert stub.requests == 0
+    assert results["Match_Source"].eq("retrieval").all()
+    assert (results["Matched_SBS_Code"] == results["Retrieval_Top_Code"]).all()
+
+
+def test_cascade_margin_sends_close_calls_to_the_llm(tmp_path, vectorstore, stub):
+    df = services(("A1", "Chest X-Ray"))
+    make_mapper(tmp_path, vectorstore, stub, cascade_min_score=-1e9, cascade_min_margin=1e9).map_service_codes(df)
+
+    assert stub.requests == 1
+    assert read_results(tmp_path)["Match_Source"].tolist() == ["llm"]
+
+
+def test_verified_services_skip_retrieval_and_the_llm(tmp_path, vectorstore, stub):
+    lookup = VerifiedLookup(pd.DataFrame([{
+        "SERVICE_DESCRIPTION": "Chest X-Ray", "SERVICE_CLASSIFICATION": "Radiology", "SERVICE_CATEGORY": "Imaging",
+        "SBS Code (Hyphenated)": "11-00", "SHORT_DESCRIPTION": "chest x-ray", "Source": "test"
+    }]))
+    df = services(("A1", "chest x-ray"), ("A2", "Knee MRI"))
+    make_mapper(tmp_path, vectorstore, stub, verified_lookup=lookup).map_service_codes(df)
+
+    results = read_results(tmp_path).set_index("Internal_Service_Code")
+    assert stub.requests == 1
+    assert results.loc["A1", "Match_Source"] == "verified"
+    assert results.loc["A1", "Matched_SBS_Code"] == "11-00"
+    assert results.loc["A2", "Match_Source"] == "llm"
+
+
+def test_streamed_batches_stop_after_the_last_item(tmp_path, vectorstore, monkeypatch):
+    monkeypatch.setenv("FIREWORKS_NEW_API_KEY", "test")
+    chatty = StubLLMServer(tail_tokens=300, token_latency=0.002).start()
+    try:
+        df = services(("A1", "Chest X-Ray"), ("A2", "Knee MRI"))
+        make_mapper(tmp_path, vectorstore, chatty, batch_size=2, llm_stream=True).map_service_codes(df)
+    finally:
+        chatty.stop()
+
+    results = read_results(tmp_path)
+    assert sorted(results["Internal_Service_Code"]) == ["A1", "A2"]
+    assert (results["Matched_SBS_Code"] == results["Retrieval_Top_Code"]).all()
+    assert chatty.requests == 1
+    assert chatty.output_tokens < 300
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from sharding import CODE_COLUMN, merge_shards, run_local_shards, select_shard, shard_of, shard_path
+
+
+def test_shard_of_is_stable_and_text_based():
+    codes = [f"C{i}" for i in range(200)]
+    shards = shard_of(codes, 4)
+    assert set(shards) == {0, 1, 2, 3}
+    assert (shard_of(codes, 4) == shards).all()
+    assert shard_of([123], 4)[0] == shard_of(["123"], 4)[0]
+
+
+def test_select_shard_partitions_rows_by_code():
+    df = pd.DataFrame({"SERVICE_CODE": [f"C{i % 50}" for i in range(100)], "row": range(100)})
+    parts = [select_shard(df, i, 3) for i in range(3)]
+
+    assert sorted(pd.concat(parts)["row"]) == list(range(100))
+    assert all(set(a["SERVICE_CODE"]).isdisjoint(b["SERVICE_CODE"]) for a in parts for b in parts if a is not b)
+    with pytest.raises(ValueError):
+        select_shard(df, 3, 3)
+
+
+def test_shard_path():
+    assert shard_path("out/mapping_results.csv", 2, 8) == "out/mapping_results.shard-02-of-08.csv"
+
+
+def write_shard(path, index, rows, columns):
+    pd.DataFrame(rows, columns=columns).to_csv(shard_path(str(path), index, 2), index=False)
+
+
+def test_merge_drops_duplicates_and_resolved_failures(tmp_path):
+    results, failures = tmp_path / "results.csv", tmp_path / "failures.csv"
+    result_columns = [CODE_COLUMN, "Internal_Description", "Matched_SBS_Code"]
+    codes = {shard: [c for c in ["007", "a", "b", "c", "d", "e"] if shard_of([c], 2)[0] == shard] for shard in (0, 1)}
+    first, second = codes[0][0], codes[1][0]
+
+    write_shard(results, 0, [(first, "x", "11-00"), (first, "x", "11-00")], result_columns)
+    write_shard(results, 1, [(second, "y", "22-00")], result_columns)
+    write_shard(failures, 0, [(second, "boom")], ["SERVICE_CODE", "Error"])
+    write_shard(failures, 1, [("zzz", "boom"), ("zzz", "boom again")], ["SERVICE_CODE", "Error"])
+
+    report = merge_shards(str(results), str(failures), 2, expected_codes=[first, second, "zzz", "missing"])
+
+    assert report["duplicate_result_rows"] == 1
+    assert report["failures_resolved_on_retry"] == 1
+    assert report["missing_codes"] == ["missing"]
+    assert report["unexpected_codes"] == []
+    merged = pd.read_csv(results, dtype=str)
+    assert sorted(merged[CODE_COLUMN]) == sorted([first, second])
+    assert pd.read_csv(failures)["Error"].tolist() == ["boom again"]
+
+
+def test_local_shards_report_exit_codes(tmp_path):
+    script = tmp_path / "shard.py"
+    script.write_text("import sys\nsys.exit(int(sys.argv[-1]) == 1)\n")
+    exit_codes = run_local_shards(3, str(script), [], log_file=str(tmp_path / "shard.log"))
+    assert exit_codes == [0, 1, 0]
+    assert (tmp_path / "shard.shard-01-of-03.log").exists()
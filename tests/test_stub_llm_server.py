@@ -0,0 +1,45 @@
+import httpx
+
+from answer_parser import AnswerParser
+from stub_llm_server import StubLLMServer, stub_answer
+
+PROMPT = (
+    "### Item 1\nService Code: 11-00\nService Short Description: chest x-ray\n"
+    "Service Code: 22-00\nService Short Description: blood culture\n"
+    "### Item 2\nService Code: 33-00\n**Service Short Description:** knee mri\n"
+)
+
+
+def chat(server, prompt):
+    return httpx.post(f"{server.base_url}/chat/completions",
+                      json={"model": "stub", "messages": [{"role": "user", "content": prompt}]})
+
+
+def test_stub_answer_picks_each_items_first_candidate():
+    assert AnswerParser().parse_batch_answer(stub_answer(PROMPT), ["1", "2"]) == {
+        "1": ("11-00", "chest x-ray", "Stub picked the top candidate."),
+        "2": ("33-00", "knee mri", "Stub picked the top candidate."),
+    }
+    single = stub_answer("Service Code: 11-00\nService Short Description: chest x-ray\n")
+    assert AnswerParser().parse_llm_answer(single)[:2] == ("11-00", "chest x-ray")
+
+
+def test_server_answers_chat_completions():
+    server = StubLLMServer().start()
+    try:
+        response = chat(server, PROMPT).json()
+    finally:
+        server.stop()
+    assert response["choices"][0]["message"]["content"] == stub_answer(PROMPT)
+    assert response["usage"]["completion_tokens"] > 0
+    assert server.requests == 1
+
+
+def test_server_fails_at_the_error_rate():
+    server = StubLLMServer(error_rate=1.0, seed=0).start()
+    try:
+        statuses = {chat(server, PROMPT).status_code for _ in range(10)}
+    finally:
+        server.stop()
+    assert statuses <= {429, 500}
+    assert server.errors == 10
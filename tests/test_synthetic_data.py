@@ -0,0 +1,22 @@
+import pandas as pd
+
+from synthetic_data import generate_ahj_price_list, generate_sbs_catalog
+
+
+def test_catalog_is_deterministic_and_unique():
+    sbs = generate_sbs_catalog(200, seed=3)
+    pd.testing.assert_frame_equal(sbs, generate_sbs_catalog(200, seed=3))
+    assert sbs["Short Description"].is_unique
+    assert sbs["SBS Code (Hyphenated)"].str.fullmatch(r"\d{4}-\d{2}-\d{2}").all()
+
+
+def test_price_list_mixes_exact_copies_and_cross_company_duplicates():
+    sbs = generate_sbs_catalog(200)
+    ahj = generate_ahj_price_list(1000, sbs, exact_share=0.5, near_share=0.0, duplicate_share=0.3)
+
+    assert ahj["SERVICE_CODE"].is_unique
+    exact = ahj["SERVICE_DESCRIPTION"].isin(sbs["Short Description"]).mean()
+    assert 0.35 < exact < 0.65
+    assert ahj["SERVICE_DESCRIPTION"].duplicated().mean() > 0.2
+    again = generate_ahj_price_list(1000, sbs, exact_share=0.5, near_share=0.0, duplicate_share=0.3)
+    pd.testing.assert_frame_equal(ahj, again)
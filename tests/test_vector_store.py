@@ -0,0 +1,112 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from vector_store import VectorstoreBuilder
+
+
+class NoEmbeddings(DeterministicFakeEmbedding):
+    """Fails if asked to embed documents, to prove a cached index was used."""
+
+    def embed_documents(self, texts):
+        raise AssertionError("documents were re-embedded")
+
+
+def make_builder(tmp_path, embeddings=None, **kwargs):
+    return VectorstoreBuilder("fake-8", cache_dir=str(tmp_path),
+                              embeddings=embeddings or DeterministicFakeEmbedding(size=8), **kwargs)
+
+
+def test_catalog_key_depends_on_content_and_model(tmp_path, sbs_documents):
+    builder = make_builder(tmp_path)
+    key = builder.catalog_key(sbs_documents)
+    assert key == builder.catalog_key(list(sbs_documents))
+
+    changed = [sbs_documents[0].model_copy(update={"page_content": "other"})] + sbs_documents[1:]
+    assert builder.catalog_key(changed) != key
+    other_model = VectorstoreBuilder("other-model", cache_dir=str(tmp_path))
+    assert other_model.catalog_key(sbs_documents) != key
+
+
+def test_unchanged_catalog_loads_cached_index(tmp_path, sbs_documents):
+    built = make_builder(tmp_path).create_faiss_index(sbs_documents)
+    cached = make_builder(tmp_path, NoEmbeddings(size=8)).create_faiss_index(sbs_documents)
+
+    assert cached.index.ntotal == built.index.ntotal == len(sbs_documents)
+    assert make_builder(tmp_path).latest_cache_key() == make_builder(tmp_path).catalog_key(sbs_documents)
+
+
+def test_no_documents_is_an_error(tmp_path):
+    with pytest.raises(ValueError):
+        VectorstoreBuilder("fake-8", embeddings=DeterministicFakeEmbedding(size=8)).create_faiss_index([])
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def codes_in(vectorstore):
+    return sorted(doc.metadata["Service Code"] for doc in vectorstore.docstore._dict.values())
+
+
+def test_incremental_update_re_embeds_only_changed_codes(tmp_path, sbs_documents):
+    make_builder(tmp_path).create_faiss_index(sbs_documents)
+
+    changed = sbs_documents[0].model_copy(update={"page_content": "Service Code: 11-00 chest x-ray, two views"})
+    added = sbs_documents[0].model_copy(
+        update={"page_content": "Service Code: 44-00", "metadata": {"Service Code": "44-00"}}
+    )
+    catalog = [changed, sbs_documents[1], added]  # 33-00 removed
+    embeddings = CountingEmbeddings(size=8)
+    updated = make_builder(tmp_path, embeddings).create_faiss_index(catalog, incremental=True)
+
+    assert embeddings.embedded == 2
+    assert codes_in(updated) == ["11-00", "22-00", "44-00"]
+    assert updated.index.ntotal == 3
+    rebuilt = make_builder(tmp_path / "fresh").create_faiss_index(catalog)
+    query = rebuilt.embedding_function.embed_query("chest")
+    assert ([doc.page_content for doc, _ in updated.similarity_search_with_score_by_vector(query, k=3)]
+            == [doc.page_content for doc, _ in rebuilt.similarity_search_with_score_by_vector(query, k=3)])
+
+
+def test_multi_process_pool_is_kept_to_the_build(monkeypatch, sbs_documents):
+    import sys
+    import types
+
+    import numpy as np
+    from langchain.embeddings import HuggingFaceEmbeddings
+
+    calls = []
+
+    class FakeSentenceTransformer:
+        def start_multi_process_pool(self):
+            calls.append("start")
+            return "pool"
+
+        def encode_multi_process(self, texts, pool, batch_size=32):
+            calls.append(("pool", len(texts)))
+            return np.ones((len(texts), 4))
+
+        def encode(self, texts, show_progress_bar=False, **kwargs):
+            calls.append(("single", len(texts)))
+            return np.ones((len(texts), 4))
+
+        @staticmethod
+        def stop_multi_process_pool(pool):
+            calls.append("stop")
+
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer))
+    embeddings = HuggingFaceEmbeddings.model_construct(
+        client=FakeSentenceTransformer(), encode_kwargs={}, multi_process=False, show_progress=False
+    )
+    builder = VectorstoreBuilder("fake", multi_process=True, embeddings=embeddings)
+    vectorstore = builder.create_faiss_index_from_batches([sbs_documents[:2], sbs_documents[2:]])
+    assert calls == ["start", ("pool", 2), ("pool", 1), "stop"]
+
+    calls.clear()
+    vectorstore.similarity_search("chest", k=1)
+    assert calls == [("single", 1)]
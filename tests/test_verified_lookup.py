@@ -0,0 +1,82 @@
+import pandas as pd
+
+from feedback_store import FeedbackStore
+from verified_lookup import (
+    VALIDATED_COLUMNS, VALIDATION_COLUMN, VerifiedLookup, build_verified_entries, entries_from_validated
+)
+
+
+def entry(description, code, classification="Radiology", source="test"):
+    return {"SERVICE_DESCRIPTION": description, "SERVICE_CLASSIFICATION": classification,
+            "SERVICE_CATEGORY": "Imaging", "SBS Code (Hyphenated)": code,
+            "SHORT_DESCRIPTION": f"sbs {code}", "Source": source}
+
+
+def services(*rows):
+    frame = pd.DataFrame([entry(description, None, classification) for description, classification in rows])
+    return frame.drop(columns=["SBS Code (Hyphenated)", "SHORT_DESCRIPTION", "Source"]).set_axis(
+        [10 + i for i in range(len(rows))]
+    )
+
+
+def test_lookup_ignores_case_and_spacing_and_keeps_the_index():
+    lookup = VerifiedLookup(pd.DataFrame([entry("Chest X-Ray", "11-00")]))
+    found = lookup.lookup(services(("  chest   x-ray ", "RADIOLOGY"), ("Knee MRI", "Radiology")))
+
+    assert list(found.index) == [10, 11]
+    assert found.loc[10, "SBS Code (Hyphenated)"] == "11-00"
+    assert found.loc[11].isna().all()
+
+
+def test_context_must_match_unless_disabled():
+    entries = pd.DataFrame([entry("Chest X-Ray", "11-00")])
+    query = services(("Chest X-Ray", "Laboratory"))
+    assert VerifiedLookup(entries).lookup(query).iloc[0].isna().all()
+    assert VerifiedLookup(entries, match_context=False).lookup(query).iloc[0]["SBS Code (Hyphenated)"] == "11-00"
+
+
+def test_ambiguous_descriptions_are_left_out_and_later_entries_win():
+    lookup = VerifiedLookup(pd.DataFrame([
+        entry("Chest X-Ray", "11-00"), entry("chest x-ray", "22-00"),
+        entry("Knee MRI", "33-00", source="old"), entry("Knee MRI", " 33-00", source="new"),
+    ]))
+    assert len(lookup) == 1
+    assert lookup.ambiguous == 1
+    assert lookup.lookup(services(("Knee MRI", "Radiology"))).iloc[0]["Source"] == "new"
+
+
+def test_save_and_load_round_trip(tmp_path):
+    lookup = VerifiedLookup(pd.DataFrame([entry("Chest X-Ray", "11-00")]))
+    path = str(tmp_path / "verified.parquet")
+    lookup.save(path)
+    found = VerifiedLookup.load(path).lookup(services(("Chest X-Ray", "Radiology")))
+    assert found.iloc[0]["SBS Code (Hyphenated)"] == "11-00"
+
+
+def validation(description, code, verdict, correct_code=None, by="ann"):
+    return {"SERVICE_DESCRIPTION": description, "SERVICE_CLASSIFICATION": "Radiology",
+            "SERVICE_CATEGORY": "Imaging", "SBS Code (Hyphenated)": code, "SHORT_DESCRIPTION": "model pick",
+            VALIDATION_COLUMN: verdict, "Correct SBS Code": correct_code,
+            "Correct SBS Short / Long Description": "reviewer pick", "Validated By": by}
+
+
+def test_validations_verify_approved_and_corrected_codes():
+    entries = entries_from_validated(pd.DataFrame([
+        validation("Chest X-Ray", "11-00", "Correct"),
+        validation("Knee MRI", "22-00", "In Correct", correct_code="33-00", by="bob"),
+        validation("Blood Culture", "44-00", "In Correct"),
+    ]))
+    assert entries["SBS Code (Hyphenated)"].tolist() == ["11-00", "33-00"]
+    assert entries["SHORT_DESCRIPTION"].tolist() == ["model pick", "reviewer pick"]
+    assert entries["Source"].tolist() == ["validated:ann", "validated:bob"]
+
+
+def test_build_reads_the_validations_database_before_the_csv(tmp_path):
+    db, csv = str(tmp_path / "validated.sqlite"), str(tmp_path / "validated.csv")
+    store = FeedbackStore(db, ["INSURANCE_COMPANY", "SERVICE_CODE"] + VALIDATED_COLUMNS)
+    store.upsert({"INSURANCE_COMPANY": "A", "SERVICE_CODE": 1, **validation("Chest X-Ray", "11-00", "Correct")})
+    pd.DataFrame([validation("Knee MRI", "33-00", "Correct")]).to_csv(csv, index=False)
+
+    assert build_verified_entries(validated_db=db, validated_csv=csv)["SBS Code (Hyphenated)"].tolist() == ["11-00"]
+    assert build_verified_entries(validated_csv=csv)["SBS Code (Hyphenated)"].tolist() == ["33-00"]
+    assert build_verified_entries().empty